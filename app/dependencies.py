@@ -5,15 +5,16 @@ from typing import Annotated
 from fastapi.security import APIKeyCookie
 from sqlmodel import Session
 
-from .internal.database import database, engine
+from .internal.database import database, LazySession
+from .internal.constants import DBReturnCodes
 from .models.common import UserInfo
 
 auth_cookie = APIKeyCookie(name='x_auth_cookie', auto_error=False)
 
 
-def get_session():
-    with Session(engine) as session:
-        yield session
+def get_session() -> LazySession:
+    # Database calls open their Session when they run, see `LazySession`
+    return LazySession()
 
 
 async def get_session_info(
@@ -23,11 +24,10 @@ async def get_session_info(
     if not authorization:
         raise HTTPException(status_code=401, detail="Authorization cookie missing")
 
-    session_expired: bool = await database.users.check_session_expired(session, authorization)
-    if session_expired:
+    session_info: dict[str, str | bool] | str = await database.users.get_session_info(session, authorization)
+    if session_info == DBReturnCodes.INVALID_SESSION or session_info['expired']:
         raise HTTPException(status_code=401, detail="Session token invalid")
-    
-    session_info: dict[str, str | bool] = await database.users.get_session_info(session, authorization)
+
     return UserInfo(**session_info)
 
 
@@ -38,11 +38,10 @@ async def get_session_info_ws(
     if not x_auth_cookie:
         raise WebSocketException(code=1008, reason="Authorization cookie missing")
 
-    session_expired: bool = await database.users.check_session_expired(session, x_auth_cookie)
-    if session_expired:
-        raise WebSocketException(status_code=1008, reason="Session token invalid")
-    
-    session_info: dict[str, str | bool] = await database.users.get_session_info(session, x_auth_cookie)
+    session_info: dict[str, str | bool] | str = await database.users.get_session_info(session, x_auth_cookie)
+    if session_info == DBReturnCodes.INVALID_SESSION or session_info['expired']:
+        raise WebSocketException(code=1008, reason="Session token invalid")
+
     return UserInfo(**session_info)
 
 
@@ -50,15 +49,14 @@ async def login_required(session: 'SessionDep', authorization: str | None = Secu
     if not authorization:
         return RedirectResponse(url='/frontend/login', status_code=307)
     
-    session_expired: bool = await database.users.check_session_expired(session, authorization)
-    if session_expired:
+    session_info: dict[str, str | bool] | str = await database.users.get_session_info(session, authorization)
+    if session_info == DBReturnCodes.INVALID_SESSION or session_info['expired']:
         return RedirectResponse(url='/frontend/login', status_code=307)
 
-    session_info: dict[str, str | bool] = await database.users.get_session_info(session, authorization)
     return UserInfo(**session_info)
 
 
 HttpAuthDep = Annotated[UserInfo, Depends(get_session_info)]
 AuthOrRedirectDep = Annotated[UserInfo | RedirectResponse, Depends(login_required)]
 
-SessionDep = Annotated[Session, Depends(get_session)]
+SessionDep = Annotated[Session | LazySession, Depends(get_session)]
@@ -0,0 +1,190 @@
+import threading
+import uuid
+
+from collections import OrderedDict, deque
+
+from ..models.chats import MessagesGetPublic
+
+# Rough per-message overhead of the model and deque slot, on top of the message text
+MESSAGE_OVERHEAD_BYTES: int = 400
+VERSION_STRIPES: int = 1024
+
+
+def conversation_key(user_a: str, user_b: str) -> tuple[str, str]:
+    return (user_a, user_b) if user_a <= user_b else (user_b, user_a)
+
+
+def _message_size(message: MessagesGetPublic) -> int:
+    return len(message.message_data) + MESSAGE_OVERHEAD_BYTES
+
+
+class ConversationEntry:
+    def __init__(self, messages: list[MessagesGetPublic], size: int, exhaustive: bool) -> None:
+        # Newest message first
+        self.messages: deque[MessagesGetPublic] = deque(messages, maxlen=size)
+        self.size_bytes: int = sum(_message_size(message) for message in messages)
+
+        # True if the buffer holds every message of the conversation
+        self.exhaustive: bool = exhaustive
+
+
+class ConversationCache:
+    """In-memory ring buffer of the newest messages per conversation.
+
+    Serves the first page of `ChatMethods.get_messages()` without SQL. Writers
+    update it after committing, and conversations are evicted least recently
+    used first once `max_bytes` is reached.
+
+    Fills from the database are dropped if a write to the same conversation
+    happened while the query was running, so a slow reader can never put a
+    stale page back into the cache.
+    """
+
+    def __init__(self, size: int, max_bytes: int) -> None:
+        self.size: int = size
+        self.max_bytes: int = max_bytes
+
+        self.entries: OrderedDict[tuple[str, str], ConversationEntry] = OrderedDict()
+        self.total_bytes: int = 0
+
+        # Striped write versions, bounded no matter how many conversations exist
+        self.versions: list[int] = [0] * VERSION_STRIPES
+        self.lock: threading.Lock = threading.Lock()
+
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+    def _stripe(self, key: tuple[str, str]) -> int:
+        return hash(key) % VERSION_STRIPES
+
+    def get(self, user_a: str, user_b: str, amount: int) -> list[MessagesGetPublic] | None:
+        key: tuple[str, str] = conversation_key(user_a, user_b)
+
+        with self.lock:
+            entry: ConversationEntry | None = self.entries.get(key)
+            if entry is None or (amount > len(entry.messages) and not entry.exhaustive):
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+
+            return list(entry.messages)[:amount]
+
+    def begin_fill(self, user_a: str, user_b: str) -> int:
+        key: tuple[str, str] = conversation_key(user_a, user_b)
+        with self.lock:
+            return self.versions[self._stripe(key)]
+
+    def fill(
+        self, user_a: str, user_b: str, 
+        version: int, messages: list[MessagesGetPublic],
+        exhaustive: bool
+    ) -> None:
+        key: tuple[str, str] = conversation_key(user_a, user_b)
+        entry: ConversationEntry = ConversationEntry(messages[:self.size], self.size, exhaustive)
+
+        with self.lock:
+            if self.versions[self._stripe(key)] != version:
+                return
+
+            self._remove_entry(key)
+            self.entries[key] = entry
+            self.total_bytes += entry.size_bytes
+
+            self._evict()
+
+    def add(self, message: MessagesGetPublic) -> None:
+        key: tuple[str, str] = conversation_key(message.sender_name, message.recipient_name)
+
+        with self.lock:
+            self.versions[self._stripe(key)] += 1
+            entry: ConversationEntry | None = self.entries.get(key)
+
+            if entry is None:
+                return
+
+            if len(entry.messages) == self.size:
+                dropped: MessagesGetPublic = entry.messages.pop()
+                entry.size_bytes -= _message_size(dropped)
+                self.total_bytes -= _message_size(dropped)
+
+                entry.exhaustive = False
+
+            entry.messages.appendleft(message)
+            entry.size_bytes += _message_size(message)
+            self.total_bytes += _message_size(message)
+
+            self._evict()
+
+    def update(self, user_a: str, user_b: str, message_id: uuid.UUID, message_data: str) -> None:
+        key: tuple[str, str] = conversation_key(user_a, user_b)
+
+        with self.lock:
+            self.versions[self._stripe(key)] += 1
+            entry: ConversationEntry | None = self.entries.get(key)
+
+            if entry is None:
+                return
+
+            for index, message in enumerate(entry.messages):
+                if message.message_id != message_id:
+                    continue
+
+                edited: MessagesGetPublic = message.model_copy(update={'message_data': message_data})
+                entry.messages[index] = edited
+
+                size_delta: int = _message_size(edited) - _message_size(message)
+                entry.size_bytes += size_delta
+                self.total_bytes += size_delta
+                break
+
+    def remove(self, user_a: str, user_b: str, message_id: uuid.UUID) -> None:
+        key: tuple[str, str] = conversation_key(user_a, user_b)
+
+        with self.lock:
+            self.versions[self._stripe(key)] += 1
+            entry: ConversationEntry | None = self.entries.get(key)
+
+            if entry is None:
+                return
+
+            for message in entry.messages:
+                if message.message_id != message_id:
+                    continue
+
+                # The next older message is not known, so the buffer just gets shorter
+                entry.messages.remove(message)
+                entry.size_bytes -= _message_size(message)
+                self.total_bytes -= _message_size(message)
+                break
+
+    def invalidate_user(self, username: str) -> None:
+        with self.lock:
+            for key in [key for key in self.entries if username in key]:
+                self.versions[self._stripe(key)] += 1
+                self._remove_entry(key)
+
+    def _remove_entry(self, key: tuple[str, str]) -> None:
+        entry: ConversationEntry | None = self.entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry.size_bytes
+
+    def _evict(self) -> None:
+        while self.total_bytes > self.max_bytes and self.entries:
+            _, entry = self.entries.popitem(last=False)
+            self.total_bytes -= entry.size_bytes
+            self.evictions += 1
+
+    def stats(self) -> dict[str, int | float]:
+        with self.lock:
+            lookups: int = self.hits + self.misses
+            return {
+                'conversations': len(self.entries),
+                'bytes': self.total_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / lookups if lookups else 0.0
+            }
@@ -1,17 +1,20 @@
 import os
 import json
 import logging.config
+import logging.handlers
 import warnings
 
 from typing import Literal
 from pathlib import Path
 
-from pydantic import computed_field, MariaDBDsn, DirectoryPath, model_validator
+from pydantic import computed_field, MariaDBDsn, DirectoryPath, PositiveInt, PositiveFloat, NonNegativeInt, model_validator
 from pydantic_core import MultiHostUrl
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 from typing import Self
 from ..version import __version__
+from .hashing import calibrate_argon2
+from .logqueue import DEFAULT_QUEUE_SIZE, install_queue_logging
 
 APP_NAME: str = "chatinterface-server"
 DEFAULT_APP_DIR: str = os.path.join(".", f"{APP_NAME}_config")
@@ -24,6 +27,8 @@ class AppSettings(BaseSettings):
     )
 
     ENVIRONMENT: Literal['local', 'development', 'production'] = 'local'
+    DATABASE_BACKEND: Literal['mariadb', 'sqlite'] = 'mariadb'
+
     MARIADB_HOST: str = '127.0.0.1'
     MARIADB_PORT: int = 3306
 
@@ -32,9 +37,19 @@ class AppSettings(BaseSettings):
 
     MARIADB_PASSWORD: str = 'helloworld'
 
+    # Embedded backend for single node deployments, used when DATABASE_BACKEND is 'sqlite'
+    SQLITE_PATH: Path = Path('./chatinterface_server.db')
+    SQLITE_SYNCHRONOUS: Literal['OFF', 'NORMAL', 'FULL'] = 'NORMAL'
+    SQLITE_CACHE_SIZE: PositiveInt = 65536  # KiB
+    SQLITE_MMAP_SIZE: NonNegativeInt = 256 * 1024 * 1024
+    SQLITE_BUSY_TIMEOUT_MS: PositiveInt = 5000
+
     @computed_field
     @property
-    def SQLALCHEMY_ENGINE_URI(self) -> MariaDBDsn:
+    def SQLALCHEMY_ENGINE_URI(self) -> MariaDBDsn | str:
+        if self.DATABASE_BACKEND == 'sqlite':
+            return f"sqlite:///{self.SQLITE_PATH.resolve()}"
+
         return MultiHostUrl.build(
             scheme='mariadb+mariadbconnector',
             username=self.MARIADB_USER,
@@ -50,6 +65,74 @@ class AppSettings(BaseSettings):
     FIRST_USER_NAME: str = 'admin'
     FIRST_USER_PASSWORD: str = 'helloworld'
 
+    # Time cost is calibrated on startup to hit this verify latency.
+    # Setting ARGON2_TIME_COST skips calibration and uses these parameters as they are,
+    # so every host of a fleet hashes the same way
+    ARGON2_TARGET_MS: PositiveInt = 100
+    ARGON2_MEMORY_COST: PositiveInt = 65536  # KiB
+    ARGON2_PARALLELISM: PositiveInt = 4
+    ARGON2_TIME_COST: PositiveInt | None = None
+
+    # Group commit for stored messages, off by default
+    MESSAGE_BATCH_ENABLED: bool = False
+    MESSAGE_BATCH_WINDOW_MS: PositiveInt = 5
+    MESSAGE_BATCH_MAX_ROWS: PositiveInt = 100
+
+    # Newest messages per conversation kept in memory for the first page of history.
+    # Only writes from the same process update it, so only turn it on with a single worker
+    MESSAGE_CACHE_ENABLED: bool = False
+    MESSAGE_CACHE_SIZE: PositiveInt = 100
+    MESSAGE_CACHE_MAX_BYTES: PositiveInt = 64 * 1024 * 1024
+
+    # Read markers are written at most once per conversation in this interval
+    READ_MARKER_FLUSH_MS: PositiveInt = 1000
+
+    # Deleted users lose their messages in batches of this size, one short transaction each
+    USER_DELETE_BATCH_SIZE: PositiveInt = 1000
+    USER_DELETE_BATCH_INTERVAL_MS: NonNegativeInt = 50
+
+    # 'auto' searches with the database full-text index when it exists, 'memory' forces the in-process index
+    SEARCH_BACKEND: Literal['auto', 'memory'] = 'auto'
+
+    # Database calls queued or running past this limit get a 503, 0 disables it
+    DB_EXECUTOR_WORKERS: PositiveInt | None = None
+    DB_EXECUTOR_MAX_PENDING: NonNegativeInt = 256
+    DB_OVERLOAD_RETRY_AFTER: PositiveInt = 1
+
+    # Pool size defaults to the executor thread count, so every thread can hold a connection
+    DB_POOL_SIZE: PositiveInt | None = None
+    DB_POOL_MAX_OVERFLOW: NonNegativeInt = 10
+    DB_POOL_TIMEOUT: PositiveFloat = 30
+    DB_POOL_RECYCLE: int = 3600  # seconds, -1 disables it
+    DB_POOL_PRE_PING: bool = True
+
+    # Read-only calls go to these, users that wrote recently read from the primary
+    DB_REPLICA_URIS: list[str] = []
+    DB_REPLICA_STICKY_SECONDS: PositiveFloat = 5
+    DB_REPLICA_RETRY_SECONDS: PositiveFloat = 30
+
+    # Adds X-Query-Count and Server-Timing headers, always on for local environments
+    QUERY_DEBUG_HEADERS: bool = False
+
+    # Logs a stack sample when the event loop is blocked longer than the threshold
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL_MS: PositiveInt = 100
+    LOOP_MONITOR_THRESHOLD_MS: PositiveInt = 250
+
+    # Statements slower than this go to base_dir/slow_queries.log, 0 disables it.
+    # EXPLAIN runs an extra query on the same connection, only turn it on while investigating
+    SLOW_QUERY_MS: NonNegativeInt = 200
+    SLOW_QUERY_EXPLAIN: bool = False
+
+    # Requests from the first user with "X-Profile: 1" are sampled into base_dir/profiles
+    PROFILE_SAMPLE_INTERVAL_MS: PositiveInt = 5
+
+    # JSON lines access log with request latency, written to base_dir/access.log
+    ACCESS_LOG_ENABLED: bool = False
+
+    # Prometheus text format on /metrics, always on for local environments.
+    # The endpoint is not authenticated, only enable it behind a private listener
+    METRICS_ENABLED: bool = False
 
     def _check_value_default(self, key_name: str, value: str):
         if value == 'helloworld':
@@ -63,7 +146,9 @@ class AppSettings(BaseSettings):
 
     @model_validator(mode="after")
     def _check_values_okay(self) -> Self:
-        self._check_value_default('MARIADB_PASSWORD', self.MARIADB_PASSWORD)
+        if self.DATABASE_BACKEND == 'mariadb':
+            self._check_value_default('MARIADB_PASSWORD', self.MARIADB_PASSWORD)
+
         self._check_value_default('FIRST_USER_PASSWORD', self.FIRST_USER_PASSWORD)
 
         return self
@@ -92,6 +177,7 @@ class ConfigManager:
         self.base_dir: str = os.path.join(abs_base_dir, __version__)
 
         os.makedirs(self.base_dir, mode=0o700, exist_ok=True)
+        self.log_listeners: list[logging.handlers.QueueListener] = []
 
     def make_logging_config(self):
         return {
@@ -107,6 +193,9 @@ class ConfigManager:
                         ' - [%(asctime)s]: %(message)s'
                     ),
                     'datefmt': '%Y-%m-%d %H:%M:%S'
+                },
+                'json': {
+                    '()': 'app.internal.logqueue.JsonFormatter'
                 }
             },
             'handlers': {
@@ -121,6 +210,13 @@ class ConfigManager:
                     "maxBytes": 5 * 1024 * 1024,  # 5 MB
                     "backupCount": 3,
                     "filename": os.path.join(self.base_dir, 'chatinterface_server.log')
+                },
+                "access": {
+                    "class": "logging.handlers.RotatingFileHandler",
+                    "formatter": "json",
+                    "maxBytes": 5 * 1024 * 1024,  # 5 MB
+                    "backupCount": 3,
+                    "filename": os.path.join(self.base_dir, 'access.log')
                 }
             },
             'loggers': {
@@ -131,9 +227,26 @@ class ConfigManager:
                     ],
                     "level": "INFO",
                     "propagate": True
+                },
+                "chatinterface_server.access": {
+                    "handlers": [
+                        "access"
+                    ],
+                    "level": "INFO",
+                    "propagate": False
                 }
             },
-            'disable_existing_loggers': False
+            'disable_existing_loggers': False,
+
+            # Not a dictConfig key, handlers of these loggers are moved behind a bounded queue
+            'queue': {
+                'enabled': True,
+                'maxsize': DEFAULT_QUEUE_SIZE,
+                'loggers': [
+                    "chatinterface_server",
+                    "chatinterface_server.access"
+                ]
+            }
         }
 
     def setup_logging(self) -> None:
@@ -142,5 +255,56 @@ class ConfigManager:
         log_config: dict = load_or_create_config(log_config_file, self.make_logging_config())
         logging.config.dictConfig(log_config)
 
+        # Older logging.json files have no queue section, they still get the default queue
+        queue_config: dict = log_config.get('queue', {})
+        if queue_config.get('enabled', True):
+            self.log_listeners = install_queue_logging(
+                queue_config.get('loggers', ["chatinterface_server"]),
+                queue_config.get('maxsize', DEFAULT_QUEUE_SIZE)
+            )
+
+    def stop_logging(self) -> None:
+        """Flushes queued log records and stops the listener threads."""
+        for listener in self.log_listeners:
+            listener.stop()
+
+        self.log_listeners = []
+
+    def load_argon2_params(self) -> dict[str, int | float]:
+        """Loads the calibrated argon2 parameters, calibrating again if the settings changed.
+
+        Pinned parameters are returned without calibrating.
+        """
+        if settings.ARGON2_TIME_COST is not None:
+            return {
+                'time_cost': settings.ARGON2_TIME_COST,
+                'memory_cost': settings.ARGON2_MEMORY_COST,
+                'parallelism': settings.ARGON2_PARALLELISM
+            }
+
+        params_file: str = os.path.join(self.base_dir, 'argon2.json')
+        wanted: dict[str, int] = {
+            'target_ms': settings.ARGON2_TARGET_MS,
+            'max_memory_cost': settings.ARGON2_MEMORY_COST,
+            'parallelism': settings.ARGON2_PARALLELISM
+        }
+
+        if os.path.isfile(params_file):
+            with open(params_file, 'r') as file:
+                argon2_params: dict = json.load(file)
+
+            if all(argon2_params.get(key) == value for key, value in wanted.items()):
+                return argon2_params
+
+        argon2_params = calibrate_argon2(
+            settings.ARGON2_TARGET_MS,
+            settings.ARGON2_MEMORY_COST,
+            settings.ARGON2_PARALLELISM
+        )
+        with open(params_file, 'w') as file:
+            json.dump(argon2_params, file, indent=4)
+
+        return argon2_params
+
 
 settings: AppSettings = AppSettings()
@@ -17,4 +17,5 @@ class WebsocketMessages(StrEnum):
     MESSAGE_UPDATE = 'message.update'
     MESSAGE_DELETE = 'message.delete'
     MESSAGE_COMPOSE = 'message.compose'
+    READ_UPDATE = 'read.update'
     AUTH_REVOKED = 'auth.revoked'
@@ -0,0 +1,207 @@
+import uuid
+
+import sqlalchemy as sa
+from sqlalchemy import delete, func, update
+from sqlalchemy.dialects import mysql, sqlite
+from sqlmodel import Session, and_, or_, select
+
+from ..models.dbtables import Conversations, Messages
+
+MessageRow = tuple[uuid.UUID, uuid.UUID, uuid.UUID]  # message_id, sender_id, recipient_id
+
+
+def _upsert_statement(dialect_name: str, rows: list[dict]):
+    table: sa.Table = Conversations.__table__
+
+    if dialect_name == 'sqlite':
+        statement = sqlite.insert(table).values(rows)
+        new = statement.excluded
+    elif dialect_name in ('mysql', 'mariadb'):
+        statement = mysql.insert(table).values(rows)
+        new = statement.inserted
+    else:
+        raise NotImplementedError(f"conversation upserts are not supported on '{dialect_name}'")
+
+    # Rows from concurrent writers can commit out of order, the newest message always wins.
+    # An unread_count of 0 resets the counter, anything else is added to it
+    values: dict = {
+        'last_message_id': sa.case(
+            (new.last_message_id > table.c.last_message_id, new.last_message_id),
+            else_=table.c.last_message_id
+        ),
+        'unread_count': sa.case(
+            (new.unread_count == 0, 0),
+            else_=table.c.unread_count + new.unread_count
+        ),
+        'last_read_message_id': sa.case(
+            (new.last_read_message_id.is_(None), table.c.last_read_message_id),
+            (table.c.last_read_message_id.is_(None), new.last_read_message_id),
+            (new.last_read_message_id > table.c.last_read_message_id, new.last_read_message_id),
+            else_=table.c.last_read_message_id
+        )
+    }
+
+    if dialect_name == 'sqlite':
+        return statement.on_conflict_do_update(index_elements=['user_id', 'peer_id'], set_=values)
+
+    return statement.on_duplicate_key_update(values)
+
+
+def record_messages(session: Session, messages: list[MessageRow]) -> None:
+    """Moves the conversations of new messages to their newest message, in one statement.
+
+    The recipient's unread count goes up by one per message. Sending a
+    message resets the sender's count and moves their read marker to it,
+    replying counts as having read the conversation.
+    """
+    rows: dict[tuple[uuid.UUID, uuid.UUID], dict] = {}
+
+    for message_id, sender_id, recipient_id in messages:
+        sent: dict = rows.setdefault((sender_id, recipient_id), {
+            'user_id': sender_id, 'peer_id': recipient_id,
+            'last_message_id': message_id, 'unread_count': 0,
+            'last_read_message_id': None
+        })
+        sent['last_message_id'] = max(sent['last_message_id'], message_id)
+        sent['last_read_message_id'] = max(sent['last_read_message_id'] or message_id, message_id)
+        sent['unread_count'] = 0
+
+        received: dict = rows.setdefault((recipient_id, sender_id), {
+            'user_id': recipient_id, 'peer_id': sender_id,
+            'last_message_id': message_id, 'unread_count': 0,
+            'last_read_message_id': None
+        })
+        received['last_message_id'] = max(received['last_message_id'], message_id)
+        received['unread_count'] += 1
+
+    if rows:
+        session.execute(_upsert_statement(session.get_bind().dialect.name, list(rows.values())))
+
+
+def remove_message(session: Session, sender_id: uuid.UUID, recipient_id: uuid.UUID, message_id: uuid.UUID) -> None:
+    """Points both sides of a conversation at the message before `message_id`, after it was deleted.
+
+    If the recipient had not read the message yet, their unread count goes down by one.
+    """
+    pair = or_(
+        and_(Conversations.user_id == sender_id, Conversations.peer_id == recipient_id),
+        and_(Conversations.user_id == recipient_id, Conversations.peer_id == sender_id)
+    )
+    previous_id: uuid.UUID | None = session.exec(
+        select(func.max(Messages.message_id)).where(or_(
+            and_(Messages.sender_id == sender_id, Messages.recipient_id == recipient_id),
+            and_(Messages.sender_id == recipient_id, Messages.recipient_id == sender_id)
+        ))
+    ).one()
+
+    if previous_id is None:
+        session.execute(delete(Conversations).where(pair))
+        return
+
+    session.execute(
+        update(Conversations)
+        .where(pair, Conversations.last_message_id == message_id)
+        .values(last_message_id=previous_id)
+    )
+    session.execute(
+        update(Conversations)
+        .where(
+            Conversations.user_id == recipient_id,
+            Conversations.peer_id == sender_id,
+            Conversations.unread_count > 0,
+            or_(
+                Conversations.last_read_message_id.is_(None),
+                Conversations.last_read_message_id < message_id
+            )
+        )
+        .values(unread_count=Conversations.unread_count - 1)
+    )
+
+
+def apply_read_marker(
+        session: Session, user_id: uuid.UUID, peer_id: uuid.UUID, 
+        marker: uuid.UUID
+) -> int | None:
+    """Moves a read marker forward and returns the new unread count, None if it was already past `marker`.
+
+    Only messages after the marker are counted, through the conversation
+    index, so the cost is bounded by what is still unread. Listing
+    conversations reads the stored count and never counts messages.
+    """
+    unread_after = (
+        select(func.count())
+        .select_from(Messages)
+        .where(
+            Messages.sender_id == peer_id,
+            Messages.recipient_id == user_id,
+            Messages.message_id > marker
+        )
+        .scalar_subquery()
+    )
+    result = session.execute(
+        update(Conversations)
+        .where(
+            Conversations.user_id == user_id,
+            Conversations.peer_id == peer_id,
+            or_(
+                Conversations.last_read_message_id.is_(None),
+                Conversations.last_read_message_id < marker
+            )
+        )
+        .values(last_read_message_id=marker, unread_count=unread_after)
+    )
+    if result.rowcount == 0:
+        return None
+
+    return session.exec(
+        select(Conversations.unread_count).where(
+            Conversations.user_id == user_id,
+            Conversations.peer_id == peer_id
+        )
+    ).one()
+
+
+def rebuild(connection: sa.Connection, batch_size: int) -> int:
+    """Creates the summary rows of every conversation from the messages table, with nothing unread.
+
+    Used after bulk loads that insert messages directly. Directed pairs are
+    read in keyset pages through ix_messages_conversation and upserted from
+    both sides, so memory is bounded by `batch_size` instead of the number
+    of conversations. Returns the number of directed pairs read.
+    """
+    statement = (
+        select(Messages.sender_id, Messages.recipient_id, func.max(Messages.message_id))
+        .group_by(Messages.sender_id, Messages.recipient_id)
+        .order_by(Messages.sender_id, Messages.recipient_id)
+        .limit(batch_size)
+    )
+    last: tuple[uuid.UUID, uuid.UUID] | None = None
+    pairs: int = 0
+
+    while True:
+        page_statement = statement
+        if last is not None:
+            page_statement = statement.where(or_(
+                Messages.sender_id > last[0],
+                and_(Messages.sender_id == last[0], Messages.recipient_id > last[1])
+            ))
+
+        groups = connection.execute(page_statement).all()
+        if not groups:
+            return pairs
+
+        rows: dict[tuple[uuid.UUID, uuid.UUID], dict] = {}
+        for sender_id, recipient_id, message_id in groups:
+            for user_id, peer_id in ((sender_id, recipient_id), (recipient_id, sender_id)):
+                row: dict = rows.setdefault((user_id, peer_id), {
+                    'user_id': user_id, 'peer_id': peer_id,
+                    'last_message_id': message_id, 'unread_count': 0,
+                    'last_read_message_id': None
+                })
+                row['last_message_id'] = max(row['last_message_id'], message_id)
+
+        # The other direction of a pair can be on a later page, the upsert keeps the newest message
+        connection.execute(_upsert_statement(connection.dialect.name, list(rows.values())))
+
+        pairs += len(groups)
+        last = groups[-1][0], groups[-1][1]
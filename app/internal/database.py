@@ -1,37 +1,162 @@
 import asyncio
+import contextvars
 import secrets
 import logging
+import os
+import time
 import uuid
 
 import argon2  # argon2-cffi
 
 from datetime import datetime
 from functools import wraps, partial
-from concurrent.futures import ThreadPoolExecutor
-from sqlmodel import Session, and_, desc, or_, select, create_engine
-from sqlalchemy import Engine
+from sqlmodel import Session, and_, desc, or_, select, create_engine, union_all
+from sqlalchemy.orm import aliased
+from sqlalchemy import Engine, delete, func, insert, update
+from sqlalchemy.exc import OperationalError
 
 from .constants import DBReturnCodes
-from .config import settings
+from .config import settings, ConfigManager
+from .hashing import make_password_hasher
+from .uuids import uuid7
+from .executor import BoundedExecutor, ExecutorOverloaded, default_max_workers
+from .pool import TimedQueuePool
+from .replicas import ReplicaRouter, call_writers, read_only, record_replica_read, writes_as
+from .profiler import profiled_thread
+from .logqueue import DEFAULT_QUEUE_SIZE
+from .slowlog import SlowQueryLog
+from .sqlite import create_sqlite_engine
+from .cache import ConversationCache
+from .search import InvertedIndex, SearchHit
+from .readmarkers import ReadMarkerBuffer
+from .deletions import UserDeletionQueue
+from . import querystats
+from . import search
+from . import conversations
+from . import versions
+from . import metrics
 from ..models.dbtables import (
-    Users, UserSessions, Messages
+    Users, UserSessions, Messages, Conversations, UserDeletions
 )
-from ..models.chats import MessagesGetPublic
+from ..models.chats import (
+    ConversationPublic, MessageContext, MessagesGetPublic, MessageSearchPage,
+    MessageSearchResult, MessageWriteResult, ReadState
+)
+from ..models.users import UserDeletionStatus
 
 logger: logging.Logger = logging.getLogger("chatinterface_server")
-engine = create_engine(str(settings.SQLALCHEMY_ENGINE_URI))
+executor_workers: int = settings.DB_EXECUTOR_WORKERS or default_max_workers()
+
+CONVERSATION_PREVIEW_LENGTH: int = 100
+
+
+def make_engine(uri: str) -> Engine:
+    pool_options: dict = {
+        'poolclass': TimedQueuePool,
+        'pool_size': settings.DB_POOL_SIZE or executor_workers,
+        'max_overflow': settings.DB_POOL_MAX_OVERFLOW,
+        'pool_timeout': settings.DB_POOL_TIMEOUT,
+        'pool_recycle': settings.DB_POOL_RECYCLE,
+        'pool_pre_ping': settings.DB_POOL_PRE_PING
+    }
+
+    if settings.DATABASE_BACKEND == 'sqlite':
+        return create_sqlite_engine(
+            uri,
+            synchronous=settings.SQLITE_SYNCHRONOUS,
+            cache_size_kib=settings.SQLITE_CACHE_SIZE,
+            mmap_size=settings.SQLITE_MMAP_SIZE,
+            busy_timeout_ms=settings.SQLITE_BUSY_TIMEOUT_MS,
+            **pool_options
+        )
+
+    return create_engine(uri, **pool_options)
+
+
+engine = make_engine(str(settings.SQLALCHEMY_ENGINE_URI))
+
+
+class LazySession:
+    """Placeholder passed instead of a Session by request handlers.
+
+    The database call opens its own Session on the executor thread that runs it,
+    so a request that never queries never checks out a connection, and a Session
+    is never shared between threads.
+    """
+
+    __slots__ = ()
+
+
+def call_in_session(func, self, *args, **kwargs):
+    if args and isinstance(args[0], LazySession):
+        with Session(self.engine) as session:
+            return call_with_replicas(func, self, session, *args[1:], **kwargs)
+
+    return call_with_replicas(func, self, *args, **kwargs)
+
+
+def call_with_replicas(func, self, *args, **kwargs):
+    """Runs read-only calls on a replica session, and records writers for read-your-writes."""
+    replicas: ReplicaRouter | None = getattr(self, 'replicas', None)
+    if replicas is None or not args or not isinstance(args[0], Session):
+        return func(self, *args, **kwargs)
+
+    if not getattr(func, 'read_only', False):
+        result = func(self, *args, **kwargs)
+        for writer in call_writers(func, args, kwargs):
+            replicas.mark_write(writer)
+
+        return result
+
+    # Read-only methods take the reading user after the session
+    username: str | None = args[1] if len(args) > 1 and isinstance(args[1], str) else None
+    picked: tuple[int, Engine] | None = replicas.pick(username)
+    if picked is None:
+        metrics.db_replica_reads.inc(target='primary')
+        return func(self, *args, **kwargs)
+
+    index, replica_engine = picked
+    try:
+        with Session(replica_engine, info={'replica': True}) as replica_session:
+            result = func(self, replica_session, *args[1:], **kwargs)
+    except OperationalError:
+        logger.warning("Read replica %d failed, falling back to the primary:", index, exc_info=True)
+        replicas.mark_down(index)
+
+        metrics.db_replica_reads.inc(target='fallback')
+        return func(self, *args, **kwargs)
+
+    metrics.db_replica_reads.inc(target='replica')
+    record_replica_read()
+    return result
 
 
 def async_threaded(func):
+    func_name: str = func.__name__
+
+    def timed_call(submitted_at: float, *args, **kwargs):
+        started_at: float = time.perf_counter()
+        metrics.db_executor_wait.observe(started_at - submitted_at, function=func_name)
+
+        try:
+            with profiled_thread(f'executor:{func_name}'):
+                return call_in_session(func, *args, **kwargs)
+        finally:
+            metrics.db_executor_run.observe(time.perf_counter() - started_at, function=func_name)
+
     @wraps(func)
     async def wrapper(self, *args, **kwargs):
         loop: asyncio.AbstractEventLoop = asyncio.get_event_loop()
-        partial_func: partial = partial(func, self, *args, **kwargs)
+        partial_func: partial = partial(timed_call, time.perf_counter(), self, *args, **kwargs)
+
+        # run_in_executor does not carry context variables over, the query counter needs them
+        context: contextvars.Context = contextvars.copy_context()
         
         try:
-            return await loop.run_in_executor(self.executor, partial_func) 
+            return await loop.run_in_executor(self.executor, context.run, partial_func) 
+        except ExecutorOverloaded:
+            raise
         except Exception:
-            func_name: str = func.__name__
             logger.exception("Database call failed on function [%s]:", func_name)
             raise
     
@@ -43,14 +168,61 @@ class MainDatabase:
         self.engine: Engine = engine
         self.pw_hasher: argon2.PasswordHasher = argon2.PasswordHasher()
 
-        self.executor: ThreadPoolExecutor = ThreadPoolExecutor()
+        self.executor: BoundedExecutor = BoundedExecutor(
+            executor_workers,
+            settings.DB_EXECUTOR_MAX_PENDING
+        )
+
+        self.replicas: ReplicaRouter | None = None
+        if settings.DB_REPLICA_URIS:
+            self.replicas = ReplicaRouter(
+                [make_engine(uri) for uri in settings.DB_REPLICA_URIS],
+                settings.DB_REPLICA_STICKY_SECONDS,
+                settings.DB_REPLICA_RETRY_SECONDS
+            )
+
+        self.message_cache: ConversationCache | None = None
+        if settings.MESSAGE_CACHE_ENABLED:
+            self.message_cache = ConversationCache(
+                settings.MESSAGE_CACHE_SIZE, 
+                settings.MESSAGE_CACHE_MAX_BYTES
+            )
+
+        # Set up once the schema can be inspected
+        self.search_index: InvertedIndex | None = None
 
     def override_engine(self, engine: Engine):
         """Override SQLAlchemy engine for tests."""
         self.engine = engine
     
     @async_threaded
-    def setup(self):
+    def setup(self, config: ConfigManager):
+        # Calibration benchmarks argon2, so it runs here instead of blocking the event loop
+        argon2_params: dict = config.load_argon2_params()
+        self.pw_hasher = make_password_hasher(argon2_params)
+
+        if settings.SLOW_QUERY_MS:
+            querystats.set_slow_query_log(SlowQueryLog(
+                os.path.join(config.base_dir, 'slow_queries.log'),
+                settings.SLOW_QUERY_MS / 1000,
+                settings.SLOW_QUERY_EXPLAIN,
+                # Queued like the application logs, unless logging.json turned the queue off
+                DEFAULT_QUEUE_SIZE if config.log_listeners else None
+            ))
+
+        with self.engine.connect() as connection:
+            use_database_index: bool = (
+                settings.SEARCH_BACKEND == 'auto' and search.has_fulltext_index(connection)
+            )
+
+            if use_database_index and connection.dialect.name == 'sqlite' and search.repair_sqlite_index(connection):
+                connection.commit()
+                logger.warning("Search index triggers were missing, recreated them and rebuilt the index")
+
+        if not use_database_index:
+            logger.info("No full-text index found, message search uses an in-memory index")
+            self.search_index = InvertedIndex()
+
         # Let the schema creation be handled by alembic
         # SQLModel.metadata.create_all(self.engine)
         statement = select(Users).where(Users.username == settings.FIRST_USER_NAME)
@@ -74,7 +246,8 @@ class MainDatabase:
         self.users = UserMethods(self)
 
     def get_user(self, session: Session, username: str) -> Users | None:
-        statement = select(Users).where(Users.username == username)
+        # Users being deleted are gone for every caller
+        statement = select(Users).where(Users.username == username, Users.disabled.is_(False))
         
         result = session.exec(statement)
         user: Users | None = result.one_or_none()
@@ -85,7 +258,12 @@ class MainDatabase:
         return user
     
     def close(self):
+        querystats.set_slow_query_log(None)
         self.executor.shutdown()
+
+        if self.replicas is not None:
+            self.replicas.close()
+
         self.engine.dispose()
 
 
@@ -98,8 +276,15 @@ class UserMethods:
 
         self.get_user = parent.get_user
         self.executor = parent.executor
+        self.replicas: ReplicaRouter | None = parent.replicas
+
+        self.deletions: UserDeletionQueue = UserDeletionQueue(
+            partial(self.delete_user_batch, LazySession()),
+            settings.USER_DELETE_BATCH_INTERVAL_MS / 1000
+        )
 
     @async_threaded
+    @writes_as('username')
     def add_user(self, session: Session, username: str, password: str) -> str | bool:
         if not isinstance(username, str):
             raise TypeError("username is not a string")
@@ -110,8 +295,11 @@ class UserMethods:
         if len(username) > 20:
             raise ValueError("username is too long (over 20 characters)")
         
-        user: Users | None = self.get_user(session, username)
-        if user:
+        # Users still being deleted keep their name until the row is gone
+        existing: uuid.UUID | None = session.exec(
+            select(Users.user_id).where(Users.username == username)
+        ).first()
+        if existing:
             return DBReturnCodes.USER_EXISTS
 
         hashed_pw: str = self.pw_hasher.hash(password)
@@ -122,8 +310,18 @@ class UserMethods:
 
         return True
 
+    async def delete_user(self, session: Session, username: str) -> str | bool:
+        """Disables the user and revokes their sessions, the rest is deleted in the background."""
+        user_id: uuid.UUID | str = await self.disable_user(session, username)
+        if not isinstance(user_id, uuid.UUID):
+            return user_id
+
+        self.deletions.submit(user_id)
+        return True
+
     @async_threaded
-    def delete_user(self, session: Session, username: str) -> str | bool:
+    @writes_as('username')
+    def disable_user(self, session: Session, username: str) -> str | uuid.UUID:
         if not isinstance(username, str):
             raise TypeError("username is not a string")
 
@@ -134,18 +332,126 @@ class UserMethods:
         if not user:
             return DBReturnCodes.NO_USER
 
-        user: Users = session.exec(
-            select(Users).where(Users.user_id == user.user_id)
-        ).one()
+        session.execute(update(Users).where(Users.user_id == user.user_id).values(disabled=True))
+        session.execute(delete(UserSessions).where(UserSessions.user_id == user.user_id))
 
-        session.delete(user)
+        # Peers stop seeing the conversations now, the user's own rows are the work list of the batches
+        versions.bump_peers(session, user.user_id)
+        session.execute(delete(Conversations).where(Conversations.peer_id == user.user_id))
+        session.add(UserDeletions(user_id=user.user_id, username=username))
         session.commit()
 
-        return True
+        # The messages are still stored, but every lookup of the user fails from here on
+        if self.parent.message_cache is not None:
+            self.parent.message_cache.invalidate_user(username)
+
+        if self.parent.search_index is not None:
+            self.parent.search_index.remove_user(username)
+
+        return user.user_id
 
     @async_threaded
+    def delete_user_batch(self, session: Session, user_id: uuid.UUID) -> bool:
+        """Deletes up to `USER_DELETE_BATCH_SIZE` messages of a disabled user, True once the user is gone."""
+        if not isinstance(user_id, uuid.UUID):
+            raise TypeError("user_id is not a uuid")
+
+        batch_size: int = settings.USER_DELETE_BATCH_SIZE
+        peer_id: uuid.UUID | None = session.exec(
+            select(Conversations.peer_id).where(Conversations.user_id == user_id).limit(1)
+        ).first()
+
+        # One conversation at a time, both directions are range scans on ix_messages_conversation.
+        # Messages without a summary row (bulk loaded ones) are found by sender and recipient directly
+        if peer_id is not None:
+            directions: list = [
+                and_(Messages.sender_id == user_id, Messages.recipient_id == peer_id),
+                and_(Messages.sender_id == peer_id, Messages.recipient_id == user_id)
+            ]
+        else:
+            directions: list = [Messages.sender_id == user_id, Messages.recipient_id == user_id]
+
+        message_ids: list[uuid.UUID] = []
+        for direction in directions:
+            remaining: int = batch_size - len(message_ids)
+            if remaining == 0:
+                break
+
+            message_ids.extend(session.exec(
+                select(Messages.message_id).where(direction).limit(remaining)
+            ).all())
+
+        if peer_id is None and not message_ids:
+            # No messages are left, the cascade from the user row has nothing large to remove
+            session.execute(delete(Users).where(Users.user_id == user_id, Users.disabled.is_(True)))
+            session.execute(
+                update(UserDeletions)
+                .where(UserDeletions.user_id == user_id)
+                .values(finished_at=datetime.now())
+            )
+            session.commit()
+            return True
+
+        if message_ids:
+            session.execute(delete(Messages).where(Messages.message_id.in_(message_ids)))
+
+        if peer_id is not None and len(message_ids) < batch_size:
+            session.execute(
+                delete(Conversations)
+                .where(Conversations.user_id == user_id, Conversations.peer_id == peer_id)
+            )
+
+        session.execute(
+            update(UserDeletions)
+            .where(UserDeletions.user_id == user_id)
+            .values(messages_deleted=UserDeletions.messages_deleted + len(message_ids))
+        )
+        session.commit()
+
+        return False
+
+    @async_threaded
+    @read_only
+    def get_pending_deletions(self, session: Session) -> list[uuid.UUID]:
+        statement = select(UserDeletions.user_id).where(UserDeletions.finished_at.is_(None))
+        return list(session.exec(statement).all())
+
+    @async_threaded
+    @read_only
+    def get_deletion_status(self, session: Session, username: str) -> str | UserDeletionStatus:
+        if not isinstance(username, str):
+            raise TypeError("username is not a string")
+
+        job: UserDeletions | None = session.exec(
+            select(UserDeletions)
+            .where(UserDeletions.username == username)
+            .order_by(desc(UserDeletions.requested_at))
+            .limit(1)
+        ).first()
+
+        if not job:
+            return DBReturnCodes.NO_USER
+
+        conversations_remaining: int = session.exec(
+            select(func.count()).select_from(Conversations).where(Conversations.user_id == job.user_id)
+        ).one()
+
+        finished_at: str | None = None
+        if job.finished_at is not None:
+            finished_at = datetime.strftime(job.finished_at, "%Y-%m-%d %H:%M:%S")
+
+        return UserDeletionStatus(
+            username=job.username,
+            requested_at=datetime.strftime(job.requested_at, "%Y-%m-%d %H:%M:%S"),
+            finished_at=finished_at,
+            messages_deleted=job.messages_deleted,
+            conversations_remaining=conversations_remaining
+        )
+
+    @async_threaded
+    @read_only
     def get_users(self, session: Session) -> list:
-        result = session.exec(select(Users))
+        result = session.exec(select(Users).where(Users.disabled.is_(False)))
         users = result.all()
 
         user_list: list[str] = []
@@ -162,7 +468,7 @@ class UserMethods:
         if not isinstance(password, str):
             raise TypeError("password is not a string")
         
-        statement = select(Users).where(Users.username == username)
+        statement = select(Users).where(Users.username == username, Users.disabled.is_(False))
 
         result = session.exec(statement)
         user: Users | None = result.one_or_none()
@@ -170,6 +476,7 @@ class UserMethods:
         if not user:
             return DBReturnCodes.NO_USER
         
+        verify_start: float = time.perf_counter()
         try:
             self.pw_hasher.verify(user.hashed_password, password)
         except (argon2.exceptions.VerificationError, argon2.exceptions.VerifyMismatchError):
@@ -177,6 +484,15 @@ class UserMethods:
         except Exception:
             logger.exception("Failed to verify password:")
             raise
+        finally:
+            metrics.argon2_verify_duration.observe(time.perf_counter() - verify_start)
+
+        # Stored hash was made with different parameters, upgrade it while the password is known
+        if self.pw_hasher.check_needs_rehash(user.hashed_password):
+            user.hashed_password = self.pw_hasher.hash(password)
+
+            session.add(user)
+            session.commit()
         
         return 0
 
@@ -211,6 +527,7 @@ class UserMethods:
         return session_token
 
     @async_threaded
+    @read_only
     def check_user_exists(self, session: Session, username: str) -> bool:
         if not isinstance(username, str):
             raise TypeError("username is not a string")
@@ -246,18 +563,18 @@ class UserMethods:
         if not isinstance(session_id, str):
             raise TypeError("session id is not a string")
 
-        session_statement = select(UserSessions).where(UserSessions.session_id == session_id)
-
-        usersession_result = session.exec(session_statement)
-        user_session: UserSessions | None = usersession_result.one_or_none()
+        statement = (
+            select(
+                UserSessions.created_at, UserSessions.expires_on, 
+                Users.user_id, Users.username, Users.change_version
+            )
+            .join(Users, Users.user_id == UserSessions.user_id)
+            .where(UserSessions.session_id == session_id)
+        )
+        user_session = session.exec(statement).one_or_none()
 
         if not user_session:
-            raise ValueError("current provided session is invalid")
-
-        user_statement = select(Users).where(Users.user_id == user_session.user_id)
-        users_result = session.exec(user_statement)
-
-        user: Users = users_result.one()
+            return DBReturnCodes.INVALID_SESSION
 
         current_date: datetime = datetime.now()
         expired: bool = user_session.expires_on < current_date
@@ -265,7 +582,9 @@ class UserMethods:
         return {
             'created_at': datetime.strftime(user_session.created_at, "%Y-%m-%d %H:%M:%S"),
             'expired': expired,
-            'username': user.username,
+            'user_id': user_session.user_id,
+            'username': user_session.username,
+            'change_version': user_session.change_version,
             'token': session_id
         }
 
@@ -288,6 +607,156 @@ class UserMethods:
         return expired
 
 
+def check_message_args(sender: str, recipient: str, message_data: str) -> None:
+    if not isinstance(sender, str):
+        raise TypeError("sender username is not a string")
+    
+    if not isinstance(recipient, str):
+        raise TypeError("recipient username is not a string")
+    
+    if not isinstance(message_data, str):
+        raise TypeError("message data must be string")
+
+    if len(message_data) < 1:
+        raise ValueError("message data must not be empty")
+
+
+class MessageBatchWriter:
+    """Group commit for `ChatMethods.store_message`.
+
+    Messages stored within `window_ms` of each other (or until `max_rows` are
+    queued) are inserted in one multi-row transaction, and each caller gets
+    its own message ID back.
+    """
+
+    def __init__(self, parent: MainDatabase, window_ms: int, max_rows: int) -> None:
+        self.parent: MainDatabase = parent
+        self.window: float = window_ms / 1000
+        self.max_rows: int = max_rows
+
+        self.pending: list[tuple[str, str, str, asyncio.Future]] = []
+        self.flush_handle: asyncio.TimerHandle | None = None
+
+        # Keep references so running flushes are not garbage collected
+        self.flush_tasks: set[asyncio.Task] = set()
+
+    async def submit(self, sender: str, recipient: str, message_data: str) -> uuid.UUID:
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+
+        self.pending.append((sender, recipient, message_data, future))
+        if len(self.pending) >= self.max_rows:
+            self.flush()
+        elif self.flush_handle is None:
+            self.flush_handle = loop.call_later(self.window, self.flush)
+
+        return await future
+
+    def flush(self) -> None:
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+
+        if not self.pending:
+            return
+
+        batch, self.pending = self.pending, []
+
+        task: asyncio.Task = asyncio.ensure_future(self._write_batch(batch))
+        self.flush_tasks.add(task)
+        task.add_done_callback(self.flush_tasks.discard)
+
+    async def _write_batch(self, batch: list[tuple[str, str, str, asyncio.Future]]) -> None:
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        rows: list[tuple[str, str, str]] = [(sender, recipient, data) for sender, recipient, data, _ in batch]
+
+        try:
+            results: list[uuid.UUID | Exception] = await loop.run_in_executor(
+                self.parent.executor, self._insert_rows, rows
+            )
+        except Exception as exc:
+            logger.exception("Batched message insert of %d rows failed:", len(rows))
+            results = [exc] * len(rows)
+
+        for (*_, future), result in zip(batch, results):
+            if future.done():  # caller was cancelled
+                continue
+
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def _insert_rows(self, rows: list[tuple[str, str, str]]) -> list[uuid.UUID | Exception]:
+        usernames: set[str] = set()
+        for sender, recipient, _ in rows:
+            usernames.update((sender, recipient))
+
+        with Session(self.parent.engine) as session:
+            user_ids: dict[str, uuid.UUID] = dict(session.exec(
+                select(Users.username, Users.user_id).where(
+                    Users.username.in_(usernames), Users.disabled.is_(False)
+                )
+            ).all())
+
+            results: list[uuid.UUID | Exception] = []
+            values: list[dict] = []
+            stored: list[MessagesGetPublic] = []
+
+            for sender, recipient, message_data in rows:
+                if sender not in user_ids:
+                    results.append(ValueError('sender provided is invalid'))
+                    continue
+
+                if recipient not in user_ids:
+                    results.append(ValueError('recipient provided is invalid'))
+                    continue
+
+                message_id: uuid.UUID = uuid7()
+                send_date: datetime = datetime.now()
+
+                values.append({
+                    'message_id': message_id,
+                    'sender_id': user_ids[sender],
+                    'recipient_id': user_ids[recipient],
+                    'send_date': send_date,
+                    'message_data': message_data
+                })
+                stored.append(MessagesGetPublic(
+                    sender_name=sender,
+                    recipient_name=recipient,
+                    message_data=message_data,
+                    send_date=datetime.strftime(send_date, "%Y-%m-%d %H:%M:%S"),
+                    message_id=message_id
+                ))
+                results.append(message_id)
+
+            if values:
+                session.execute(insert(Messages), values)
+                conversations.record_messages(session, [
+                    (row['message_id'], row['sender_id'], row['recipient_id']) for row in values
+                ])
+                versions.bump_users(session, [
+                    user_id for row in values for user_id in (row['sender_id'], row['recipient_id'])
+                ])
+                session.commit()
+
+        for message in stored:
+            if self.parent.replicas is not None:
+                self.parent.replicas.mark_write(message.sender_name)
+
+            if self.parent.message_cache is not None:
+                self.parent.message_cache.add(message)
+
+            if self.parent.search_index is not None:
+                self.parent.search_index.add(
+                    message.message_id, message.sender_name,
+                    message.recipient_name, message.message_data
+                )
+
+        return results
+
+
 class ChatMethods:
     def __init__(self, parent: MainDatabase) -> None:
         self.parent: MainDatabase = parent
@@ -295,28 +764,151 @@ class ChatMethods:
 
         self.executor = parent.executor
         self.get_user = parent.get_user
+        self.replicas: ReplicaRouter | None = parent.replicas
+
+        self.cache: ConversationCache | None = parent.message_cache
+        self.search_index: InvertedIndex | None = parent.search_index
+        self.batch_writer: MessageBatchWriter | None = None
+        if settings.MESSAGE_BATCH_ENABLED:
+            self.batch_writer = MessageBatchWriter(
+                parent, settings.MESSAGE_BATCH_WINDOW_MS, 
+                settings.MESSAGE_BATCH_MAX_ROWS
+            )
+
+        self.read_markers: ReadMarkerBuffer = ReadMarkerBuffer(
+            partial(self.apply_read_markers, LazySession()),
+            settings.READ_MARKER_FLUSH_MS / 1000
+        )
 
     @async_threaded
+    @read_only
     def get_chat_relations(self, session: Session, username: str) -> str | set[str]:
         if not isinstance(username, str):
             raise TypeError("username is not a string")
 
-        sender_names: set = set()
-        recipient_names: set = set()
-
         user: Users = self.get_user(session, username)
         if not user:
             raise ValueError("current provided username is invalid")
-        
-        for sender in user.sender_messages:
-            sender_names.add(sender.recipient.username)
-        
-        for recipient in user.recipient_messages:
-            recipient_names.add(recipient.sender.username)
 
-        return sender_names | recipient_names
+        # One query instead of walking every message the user ever sent or received
+        sent_to = select(Messages.recipient_id).where(Messages.sender_id == user.user_id)
+        received_from = select(Messages.sender_id).where(Messages.recipient_id == user.user_id)
+
+        statement = select(Users.username).where(
+            or_(
+                Users.user_id.in_(sent_to),
+                Users.user_id.in_(received_from)
+            ),
+            Users.disabled.is_(False)
+        )
+        return set(session.exec(statement).all())
+
+    @async_threaded
+    @read_only
+    def get_conversations(
+        self, session: Session, 
+        username: str, amount: int = 50,
+        before: uuid.UUID | None = None
+    ) -> list[ConversationPublic]:
+        if not isinstance(username, str):
+            raise TypeError("username is not a string")
+
+        if before is not None and not isinstance(before, uuid.UUID):
+            raise TypeError("before is not a uuid")
+
+        owner = aliased(Users)
+        peer = aliased(Users)
+
+        # Range scan on ix_conversations_recent, the last message is joined by primary key
+        statement = (
+            select(
+                peer.username, Conversations.last_message_id, 
+                Conversations.unread_count, Conversations.last_read_message_id,
+                Messages.sender_id == Conversations.user_id, Messages.send_date,
+                func.substr(Messages.message_data, 1, CONVERSATION_PREVIEW_LENGTH)
+            )
+            .join(owner, owner.user_id == Conversations.user_id)
+            .join(peer, peer.user_id == Conversations.peer_id)
+            .join(Messages, Messages.message_id == Conversations.last_message_id)
+            .where(owner.username == username)
+        )
+        if before is not None:
+            statement = statement.where(Conversations.last_message_id < before)
+
+        statement = statement.order_by(desc(Conversations.last_message_id)).limit(amount)
+
+        return [
+            ConversationPublic(
+                peer_name=peer_name,
+                last_message_id=last_message_id,
+                last_sender_name=username if sent_by_user else peer_name,
+                last_message_preview=preview,
+                last_message_date=datetime.strftime(send_date, "%Y-%m-%d %H:%M:%S"),
+                unread_count=unread_count,
+                last_read_message_id=last_read_message_id
+            )
+            for peer_name, last_message_id, unread_count, last_read_message_id, sent_by_user, send_date, preview
+            in session.exec(statement).all()
+        ]
+
+    def mark_read(self, username: str, peer_name: str, message_id: uuid.UUID) -> None:
+        """Queues a read marker, it is written on the next flush of `read_markers`."""
+        if not isinstance(username, str):
+            raise TypeError("username is not a string")
+
+        if not isinstance(peer_name, str):
+            raise TypeError("peer username is not a string")
+
+        if not isinstance(message_id, uuid.UUID):
+            raise TypeError("message_id is not a uuid")
+
+        self.read_markers.submit(username, peer_name, message_id)
+
+    @async_threaded
+    def apply_read_markers(
+        self, session: Session, 
+        markers: list[tuple[str, str, uuid.UUID]]
+    ) -> list[tuple[str, ReadState]]:
+        owner = aliased(Users)
+        peer = aliased(Users)
+        states: list[tuple[str, ReadState]] = []
+        changed_ids: list[uuid.UUID] = []
+
+        for username, peer_name, message_id in markers:
+            conversation = session.exec(
+                select(Conversations.user_id, Conversations.peer_id, Conversations.last_message_id)
+                .join(owner, owner.user_id == Conversations.user_id)
+                .join(peer, peer.user_id == Conversations.peer_id)
+                .where(owner.username == username, peer.username == peer_name)
+            ).one_or_none()
+
+            # Unknown peers and conversations are dropped
+            if conversation is None:
+                continue
+
+            # A marker past the newest message means everything was read
+            user_id, peer_id, last_message_id = conversation
+            marker: uuid.UUID = min(message_id, last_message_id)
+
+            unread_count: int | None = conversations.apply_read_marker(session, user_id, peer_id, marker)
+            if unread_count is None:
+                continue
+
+            changed_ids.append(user_id)
+            states.append((username, ReadState(
+                peer_name=peer_name,
+                last_read_message_id=marker,
+                unread_count=unread_count
+            )))
+
+        if changed_ids:
+            versions.bump_users(session, changed_ids)
+
+        session.commit()
+        return states
 
     @async_threaded
+    @read_only
     def has_chat_relation(self, session: Session, sender: str, recipient: str) -> bool | str:
         if not isinstance(sender, str):
             raise TypeError("sender username is not a string")
@@ -333,45 +925,41 @@ class ChatMethods:
         if not recipient_model:
             return DBReturnCodes.NO_RECIPIENT
         
-        has_sender_relation = session.exec(
-            select(Messages)
+        # Existence check only, loading full rows also pulled their sender and recipient
+        relation = session.exec(
+            select(Messages.message_id)
             .where(
-                Messages.sender_id == sender_model.user_id,
-                Messages.recipient_id == recipient_model.user_id
-            )
-            .limit(1)
-            .order_by(desc(Messages.send_date))
-        ).one_or_none()
-
-        has_recipient_relation = session.exec(
-            select(Messages)
-            .where(
-                Messages.sender_id == recipient_model.user_id,
-                Messages.recipient_id == sender_model.user_id
+                or_(
+                    and_(
+                        Messages.sender_id == sender_model.user_id,
+                        Messages.recipient_id == recipient_model.user_id
+                    ),
+                    and_(
+                        Messages.sender_id == recipient_model.user_id,
+                        Messages.recipient_id == sender_model.user_id
+                    )
+                )
             )
             .limit(1)
-            .order_by(desc(Messages.send_date))
-        ).one_or_none()
+        ).first()
 
-        if has_sender_relation or has_recipient_relation:
+        if relation:
             return True
         
         return False
 
-    @async_threaded
-    def store_message(self, session: Session, sender: str, recipient: str, message_data: str) -> uuid.UUID | str:
-        if not isinstance(sender, str):
-            raise TypeError("sender username is not a string")
-        
-        if not isinstance(recipient, str):
-            raise TypeError("recipient username is not a string")
-        
-        if not isinstance(message_data, str):
-            raise TypeError("message data must be string")
+    async def store_message(self, session: Session, sender: str, recipient: str, message_data: str) -> uuid.UUID | str:
+        check_message_args(sender, recipient, message_data)
 
-        if len(message_data) < 1:
-            raise ValueError("message data must not be empty")
+        # Group commit is opt-in, the batch writer uses its own session
+        if self.batch_writer is not None:
+            return await self.batch_writer.submit(sender, recipient, message_data)
+
+        return await self._store_message(session, sender, recipient, message_data)
 
+    @async_threaded
+    @writes_as('sender')
+    def _store_message(self, session: Session, sender: str, recipient: str, message_data: str) -> uuid.UUID | str:
         sender_model: Users = self.get_user(session, sender)
         recipient_model: Users = self.get_user(session, recipient)
 
@@ -382,25 +970,47 @@ class ChatMethods:
         if not recipient_model:
             raise ValueError('recipient provided is invalid')
 
-        message_id: uuid.UUID = uuid.uuid4()
+        # Read before commit expires them, avoids refreshing both users and the new row
+        sender_name: str = sender_model.username
+        recipient_name: str = recipient_model.username
+
+        message_id: uuid.UUID = uuid7()
+        send_date: datetime = datetime.now()
+
         new_message: Messages = Messages(
             message_id=message_id,
             sender_id=sender_model.user_id, 
             recipient_id=recipient_model.user_id,
+            send_date=send_date,
             message_data=message_data
         )
 
         session.add(new_message)
+        conversations.record_messages(session, [(message_id, sender_model.user_id, recipient_model.user_id)])
+        versions.bump_users(session, (sender_model.user_id, recipient_model.user_id))
         session.commit()
 
+        if self.cache is not None:
+            self.cache.add(MessagesGetPublic(
+                sender_name=sender_name,
+                recipient_name=recipient_name,
+                message_data=message_data,
+                send_date=datetime.strftime(send_date, "%Y-%m-%d %H:%M:%S"),
+                message_id=message_id
+            ))
+
+        if self.search_index is not None:
+            self.search_index.add(message_id, sender_name, recipient_name, message_data)
+
         return message_id
 
-    @async_threaded
-    def get_messages(
+    async def get_messages(
         self, session: Session, 
         sender: str, recipient: str, 
         amount: int = 100,
-        offset: int = 0
+        offset: int = 0,
+        before: uuid.UUID | None = None,
+        after: uuid.UUID | None = None
     ) -> str | list[MessagesGetPublic]:
         if not isinstance(sender, str):
             raise TypeError("sender username is not a string")
@@ -411,6 +1021,41 @@ class ChatMethods:
         if not isinstance(amount, int):
             raise TypeError("amount must be an int")
 
+        if before is not None and not isinstance(before, uuid.UUID):
+            raise TypeError("before is not a uuid")
+
+        if after is not None and not isinstance(after, uuid.UUID):
+            raise TypeError("after is not a uuid")
+
+        # Latest page of an active conversation, served without SQL or an executor hop
+        first_page: bool = offset == 0 and before is None and after is None
+        if self.cache is not None and first_page:
+            cached: list[MessagesGetPublic] | None = self.cache.get(sender, recipient, amount)
+            if cached is not None:
+                return cached
+
+        return await self._get_messages(session, sender, recipient, amount, offset, before, after)
+
+    @async_threaded
+    @read_only
+    def _get_messages(
+        self, session: Session, 
+        sender: str, recipient: str, 
+        amount: int, offset: int,
+        before: uuid.UUID | None,
+        after: uuid.UUID | None
+    ) -> str | list[MessagesGetPublic]:
+        # Replica pages can lag behind the primary, they are served but never cached
+        fill_cache: bool = (
+            self.cache is not None and offset == 0 and before is None and after is None
+            and not session.info.get('replica')
+        )
+        if fill_cache:
+            cache_version: int = self.cache.begin_fill(sender, recipient)
+            query_amount: int = max(amount, self.cache.size)
+        else:
+            query_amount: int = amount
+
         sender_model: Users = self.get_user(session, sender)
         recipient_model: Users = self.get_user(session, recipient)
 
@@ -430,8 +1075,13 @@ class ChatMethods:
         # FROM messages WHERE (sender_id = %s AND recipient_id = %s)
         # OR (sender_id = %s AND recipient_id = %s)
 
-        # ORDER BY send_date DESC;
-        statement = select(Messages).where(
+        # ORDER BY message_id DESC;
+        # Message IDs are time-ordered, so they double as the pagination cursor.
+        # Columns only, loading the entity would also run the selectin loads of both users
+        statement = select(
+            Messages.message_id, Messages.sender_id, 
+            Messages.message_data, Messages.send_date
+        ).where(
             or_(
                 and_(
                     Messages.sender_id == sender_model.user_id, 
@@ -442,8 +1092,19 @@ class ChatMethods:
                     Messages.recipient_id == sender_model.user_id
                 )
             )
-        ).order_by(desc(Messages.send_date)).limit(amount).offset(offset)
-        result = session.exec(statement)
+        )
+        if before is not None:
+            statement = statement.where(Messages.message_id < before)
+
+        # Pages after a cursor are read oldest first from it, then flipped to newest first
+        if after is not None:
+            statement = statement.where(Messages.message_id > after).order_by(Messages.message_id)
+        else:
+            statement = statement.order_by(desc(Messages.message_id))
+
+        result = session.exec(statement.limit(query_amount).offset(offset)).all()
+        if after is not None:
+            result.reverse()
 
         message_list: list[MessagesGetPublic] = []
         for message in result:
@@ -465,9 +1126,83 @@ class ChatMethods:
             )
             message_list.append(message_public)
 
-        return message_list
+        if fill_cache:
+            exhaustive: bool = len(message_list) < query_amount
+            self.cache.fill(sender, recipient, cache_version, message_list, exhaustive)
+
+        return message_list[:amount]
+
+    @async_threaded
+    @read_only
+    def search_messages(
+        self, session: Session,
+        username: str, terms: list[str],
+        amount: int = 20,
+        cursor: tuple[float, uuid.UUID] | None = None
+    ) -> MessageSearchPage:
+        if not isinstance(username, str):
+            raise TypeError("username is not a string")
+
+        if not terms:
+            raise ValueError("search needs at least one term")
+
+        # One extra row tells whether there is a next page
+        if self.search_index is None:
+            hits: list[SearchHit] = search.search_fulltext(session, username, terms, amount + 1, cursor)
+        else:
+            hits: list[SearchHit] = self._search_in_memory(session, username, terms, amount + 1, cursor)
+
+        results: list[MessageSearchResult] = []
+        for hit in hits[:amount]:
+            snippet, highlights = search.make_snippet(hit.message_data, terms)
+            results.append(MessageSearchResult(
+                sender_name=hit.sender_name,
+                recipient_name=hit.recipient_name,
+                message_data=hit.message_data,
+                send_date=datetime.strftime(hit.send_date, "%Y-%m-%d %H:%M:%S"),
+                message_id=hit.message_id,
+                snippet=snippet,
+                highlights=highlights,
+                score=hit.score
+            ))
+
+        next_cursor: str | None = None
+        if len(hits) > amount:
+            next_cursor = search.encode_cursor(hits[amount - 1].score, hits[amount - 1].message_id)
+
+        return MessageSearchPage(results=results, next_cursor=next_cursor)
+
+    def _search_in_memory(
+        self, session: Session,
+        username: str, terms: list[str],
+        amount: int, cursor: tuple[float, uuid.UUID] | None
+    ) -> list[SearchHit]:
+        # Built once, from the primary, a lagging replica would leave its missing messages out for good
+        if not self.search_index.ready:
+            with Session(self.engine) as primary_session:
+                self.search_index.build(primary_session)
+
+        ranked = self.search_index.search(username, terms, amount, cursor)
+        if not ranked:
+            return []
+
+        # The index only holds terms, the page of message rows comes from the database
+        rows: dict[uuid.UUID, tuple] = {
+            message_id: (message_data, send_date)
+            for message_id, message_data, send_date in session.exec(
+                select(Messages.message_id, Messages.message_data, Messages.send_date)
+                .where(Messages.message_id.in_([message_id for message_id, _, _ in ranked]))
+            ).all()
+        }
+
+        return [
+            SearchHit(message_id, *rows[message_id], document.sender_name, document.recipient_name, score)
+            for message_id, score, document in ranked
+            if message_id in rows
+        ]
 
     @async_threaded
+    @read_only
     def get_message(self, session: Session, sender: str, message_id: uuid.UUID):
         if not isinstance(sender, str):
             raise TypeError("sender username is not a string")
@@ -505,8 +1240,114 @@ class ChatMethods:
             message_id=str(message.message_id)
         )
 
+    def _find_own_message(
+        self, session: Session, 
+        sender_model: Users, message_id: uuid.UUID
+    ) -> tuple[MessageWriteResult, uuid.UUID] | None:
+        row = session.exec(
+            select(Users.username, Users.user_id)
+            .join(Messages, Messages.recipient_id == Users.user_id)
+            .where(
+                Messages.message_id == message_id,
+                Messages.sender_id == sender_model.user_id
+            )
+        ).one_or_none()
+
+        if row is None:
+            return None
+
+        recipient_name, recipient_id = row
+        result: MessageWriteResult = MessageWriteResult(
+            message_id=message_id,
+            sender_name=sender_model.username,
+            recipient_name=recipient_name
+        )
+        return result, recipient_id
+
     @async_threaded
-    def delete_message(self, session: Session, sender: str, message_id: uuid.UUID) -> str | Users:
+    @read_only
+    def get_message_context(
+        self, session: Session, 
+        username: str, message_id: uuid.UUID, 
+        amount: int = 25
+    ) -> str | MessageContext:
+        if not isinstance(username, str):
+            raise TypeError("username is not a string")
+
+        if not isinstance(message_id, uuid.UUID):
+            raise TypeError("message_id is not a uuid")
+
+        sender_user = aliased(Users)
+        recipient_user = aliased(Users)
+
+        # Any message of a conversation the caller is part of, while both sides are still enabled.
+        # A disabled user's messages stay stored until the deletion batches reach them
+        target = session.exec(
+            select(
+                Messages.sender_id, Messages.recipient_id, Messages.message_data, Messages.send_date,
+                sender_user.username, recipient_user.username
+            )
+            .join(sender_user, sender_user.user_id == Messages.sender_id)
+            .join(recipient_user, recipient_user.user_id == Messages.recipient_id)
+            .where(
+                Messages.message_id == message_id,
+                or_(sender_user.username == username, recipient_user.username == username),
+                sender_user.disabled.is_(False),
+                recipient_user.disabled.is_(False)
+            )
+        ).one_or_none()
+
+        if not target:
+            return DBReturnCodes.INVALID_MESSAGE
+
+        sender_id, recipient_id, message_data, send_date, sender_name, recipient_name = target
+        names: dict[uuid.UUID, str] = {sender_id: sender_name, recipient_id: recipient_name}
+
+        # ix_messages_conversation is per direction, so each side is one bounded
+        # range scan per direction, all four in a single statement
+        scans = []
+        for from_id, to_id in ((sender_id, recipient_id), (recipient_id, sender_id)):
+            direction = select(
+                Messages.message_id, Messages.sender_id, 
+                Messages.message_data, Messages.send_date
+            ).where(Messages.sender_id == from_id, Messages.recipient_id == to_id)
+
+            older = direction.where(Messages.message_id < message_id).order_by(desc(Messages.message_id))
+            newer = direction.where(Messages.message_id > message_id).order_by(Messages.message_id)
+
+            # One extra row per side tells whether there is more to load
+            scans.append(select(older.limit(amount + 1).subquery()))
+            scans.append(select(newer.limit(amount + 1).subquery()))
+
+        rows = session.exec(union_all(*scans)).all()
+
+        older_rows = sorted((row for row in rows if row[0] < message_id), reverse=True)
+        newer_rows = sorted(row for row in rows if row[0] > message_id)
+
+        window = list(reversed(newer_rows[:amount]))
+        window.append((message_id, sender_id, message_data, send_date))
+        window.extend(older_rows[:amount])
+
+        messages: list[MessagesGetPublic] = [
+            MessagesGetPublic(
+                sender_name=names[row_sender_id],
+                recipient_name=names[recipient_id if row_sender_id == sender_id else sender_id],
+                message_data=row_data,
+                send_date=datetime.strftime(row_date, "%Y-%m-%d %H:%M:%S"),
+                message_id=row_id
+            )
+            for row_id, row_sender_id, row_data, row_date in window
+        ]
+
+        return MessageContext(
+            messages=messages,
+            older_cursor=messages[-1].message_id if len(older_rows) > amount else None,
+            newer_cursor=messages[0].message_id if len(newer_rows) > amount else None
+        )
+
+    @async_threaded
+    @writes_as('sender')
+    def delete_message(self, session: Session, sender: str, message_id: uuid.UUID) -> str | MessageWriteResult:
         if not isinstance(sender, str):
             raise TypeError("sender username is not a string")
 
@@ -517,23 +1358,27 @@ class ChatMethods:
         if not sender_model:
             raise ValueError('sender provided is invalid')
 
-        message: Messages = session.exec(
-            select(Messages).where(
-                Messages.message_id == message_id,
-                Messages.sender_id == sender_model.user_id
-            )
-        ).one_or_none()
-
-        if not message:
+        found: tuple[MessageWriteResult, uuid.UUID] | None = self._find_own_message(session, sender_model, message_id)
+        if found is None:
             return DBReturnCodes.INVALID_MESSAGE
 
-        session.delete(message)
+        result, recipient_id = found
+        session.execute(delete(Messages).where(Messages.message_id == message_id))
+        conversations.remove_message(session, sender_model.user_id, recipient_id, message_id)
+        versions.bump_users(session, (sender_model.user_id, recipient_id))
         session.commit()
 
-        return message.recipient
+        if self.cache is not None:
+            self.cache.remove(result.sender_name, result.recipient_name, message_id)
+
+        if self.search_index is not None:
+            self.search_index.remove(message_id)
+
+        return result
 
     @async_threaded
-    def edit_message(self, session: Session, sender: str, message_id: uuid.UUID, message_data: str) -> str | Users:
+    @writes_as('sender')
+    def edit_message(self, session: Session, sender: str, message_id: uuid.UUID, message_data: str) -> str | MessageWriteResult:
         if not isinstance(sender, str):
             raise TypeError("sender username is not a string")
 
@@ -546,26 +1391,30 @@ class ChatMethods:
         if len(message_data) < 1:
             raise ValueError("message data must not be empty")
 
-        sender_model: uuid.UUID = self.get_user(session, sender)
+        sender_model: Users = self.get_user(session, sender)
         if not sender_model:
             raise ValueError('sender provided is invalid')
 
-        message: Messages = session.exec(
-            select(Messages).where(
-                Messages.message_id == message_id,
-                Messages.sender_id == sender_model.user_id
-            )
-        ).one_or_none()
-
-        if not message:
+        found: tuple[MessageWriteResult, uuid.UUID] | None = self._find_own_message(session, sender_model, message_id)
+        if found is None:
             return DBReturnCodes.INVALID_MESSAGE
 
-        message.message_data = message_data
-        
-        session.add(message)
+        result, recipient_id = found
+        session.execute(
+            update(Messages)
+            .where(Messages.message_id == message_id)
+            .values(message_data=message_data)
+        )
+        versions.bump_users(session, (sender_model.user_id, recipient_id))
         session.commit()
 
-        return message.recipient
+        if self.cache is not None:
+            self.cache.update(result.sender_name, result.recipient_name, message_id, message_data)
+
+        if self.search_index is not None:
+            self.search_index.add(message_id, result.sender_name, result.recipient_name, message_data)
+
+        return result
 
 
 database = MainDatabase(engine)
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+import uuid
+
+from collections.abc import Awaitable, Callable
+
+logger: logging.Logger = logging.getLogger("chatinterface_server")
+
+RunBatch = Callable[[uuid.UUID], Awaitable[bool]]
+
+# Pause after a failed batch, so a database outage does not turn into a log flood
+FAILURE_DELAY: float = 5.0
+
+
+class UserDeletionQueue:
+    """Deletes disabled users one bounded batch at a time, in the background.
+
+    `run_batch` deletes one batch of a user's data in its own transaction and
+    returns True once the user is gone. Batches are spaced by `interval` so
+    other writers get the tables in between. Jobs are stored in the database,
+    anything unfinished at shutdown is submitted again on the next start.
+    """
+
+    def __init__(self, run_batch: RunBatch, interval: float) -> None:
+        self.run_batch: RunBatch = run_batch
+        self.interval: float = interval
+
+        self.pending: dict[uuid.UUID, None] = {}
+        self.task: asyncio.Task | None = None
+
+        self.batches: int = 0
+        self.finished: int = 0
+
+    def submit(self, user_id: uuid.UUID) -> None:
+        self.pending[user_id] = None
+
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self._run())
+
+    async def _run(self) -> None:
+        while self.pending:
+            user_id: uuid.UUID = next(iter(self.pending))
+
+            try:
+                finished: bool = await self.run_batch(user_id)
+            except Exception:
+                logger.exception("Deletion batch for user ID [%s] failed, retrying:", user_id)
+                await asyncio.sleep(max(self.interval, FAILURE_DELAY))
+                continue
+
+            self.batches += 1
+            if finished:
+                del self.pending[user_id]
+                self.finished += 1
+                logger.info("Finished deleting user ID [%s]", user_id)
+
+            await asyncio.sleep(self.interval)
+
+    async def close(self) -> None:
+        if self.task is None or self.task.done():
+            return
+
+        # A batch already running in the executor still commits, the rest resumes on the next start
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
@@ -0,0 +1,92 @@
+import os
+import threading
+
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from . import metrics
+
+
+def default_max_workers() -> int:
+    """Same default as ThreadPoolExecutor, known up front so the pool can match it."""
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+class ExecutorOverloaded(Exception):
+    """Raised instead of queueing work when the executor is at its limit."""
+
+    def __init__(self, pending: int, max_pending: int) -> None:
+        super().__init__(f"database executor has {pending} pending calls, limit is {max_pending}")
+
+        self.pending: int = pending
+        self.max_pending: int = max_pending
+
+
+class BoundedExecutor(ThreadPoolExecutor):
+    """Thread pool that rejects work once too many calls are queued or running.
+
+    An unbounded queue hides a slow database until every request is slow,
+    rejecting early keeps latency flat for the work that is accepted.
+    A `max_pending` of 0 disables the limit.
+    """
+
+    def __init__(self, max_workers: int | None = None, max_pending: int = 0) -> None:
+        super().__init__(max_workers=max_workers, thread_name_prefix='database')
+
+        self.max_pending: int = max_pending
+        self.stats_lock: threading.Lock = threading.Lock()
+
+        self.pending: int = 0
+        self.running: int = 0
+
+        self.submitted: int = 0
+        self.completed: int = 0
+        self.rejected: int = 0
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        with self.stats_lock:
+            if self.max_pending and self.pending >= self.max_pending:
+                self.rejected += 1
+                metrics.db_executor_rejected.inc()
+                raise ExecutorOverloaded(self.pending, self.max_pending)
+
+            self.pending += 1
+            self.submitted += 1
+
+        try:
+            future: Future = super().submit(self._run, fn, *args, **kwargs)
+        except BaseException:
+            with self.stats_lock:
+                self.pending -= 1
+
+            raise
+
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _run(self, fn, *args, **kwargs):
+        with self.stats_lock:
+            self.running += 1
+
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self.stats_lock:
+                self.running -= 1
+
+    def _on_done(self, future: Future) -> None:
+        with self.stats_lock:
+            self.pending -= 1
+            self.completed += 1
+
+    def stats(self) -> dict[str, int]:
+        with self.stats_lock:
+            return {
+                'max_workers': self._max_workers,
+                'max_pending': self.max_pending,
+                'pending': self.pending,
+                'running': self.running,
+                'queued': self.pending - self.running,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'rejected': self.rejected
+            }
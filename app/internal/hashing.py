@@ -0,0 +1,82 @@
+import logging
+import secrets
+import time
+
+import argon2  # argon2-cffi
+
+logger: logging.Logger = logging.getLogger("chatinterface_server")
+
+# OWASP minimum for argon2id, calibration will not go lower than this
+MIN_MEMORY_COST: int = 19456  # 19 MiB
+MAX_TIME_COST: int = 16
+
+
+def _measure_verify(hasher: argon2.PasswordHasher, rounds: int = 3) -> float:
+    password: str = secrets.token_urlsafe(16)
+    hashed_pw: str = hasher.hash(password)
+
+    timings: list[float] = []
+    for _ in range(rounds):
+        start: float = time.perf_counter()
+        hasher.verify(hashed_pw, password)
+
+        timings.append((time.perf_counter() - start) * 1000)
+
+    # Best of N, other timings are mostly scheduler noise
+    return min(timings)
+
+
+def calibrate_argon2(target_ms: int, max_memory_cost: int, parallelism: int) -> dict[str, int | float]:
+    """Benchmarks this host and picks the argon2 parameters closest to `target_ms` per verify.
+
+    Memory cost is kept as configured unless a single pass is already too slow,
+    then it is halved down to `MIN_MEMORY_COST`. Time cost is raised until the
+    target latency is passed, then whichever of the last two lands closer wins.
+    """
+    time_cost: int = 1
+    memory_cost: int = max_memory_cost
+    previous: tuple[int, float] | None = None
+
+    while True:
+        hasher = argon2.PasswordHasher(
+            time_cost=time_cost,
+            memory_cost=memory_cost,
+            parallelism=parallelism
+        )
+        elapsed_ms: float = _measure_verify(hasher)
+
+        if time_cost == 1 and elapsed_ms > target_ms and memory_cost > MIN_MEMORY_COST:
+            memory_cost = max(memory_cost // 2, MIN_MEMORY_COST)
+            continue
+
+        if elapsed_ms >= target_ms:
+            if previous is not None and target_ms - previous[1] < elapsed_ms - target_ms:
+                time_cost, elapsed_ms = previous
+            break
+
+        if time_cost >= MAX_TIME_COST:
+            break
+
+        previous = (time_cost, elapsed_ms)
+        time_cost += 1
+
+    logger.info(
+        "Calibrated argon2 parameters: time_cost=%d, memory_cost=%d KiB, parallelism=%d (%.1f ms per verify)",
+        time_cost, memory_cost, parallelism, elapsed_ms
+    )
+    return {
+        'time_cost': time_cost,
+        'memory_cost': memory_cost,
+        'parallelism': parallelism,
+        'target_ms': target_ms,
+        'max_memory_cost': max_memory_cost,
+        'measured_ms': round(elapsed_ms, 2)
+    }
+
+
+def make_password_hasher(argon2_params: dict) -> argon2.PasswordHasher:
+    return argon2.PasswordHasher(
+        time_cost=argon2_params['time_cost'],
+        memory_cost=argon2_params['memory_cost'],
+        parallelism=argon2_params['parallelism']
+    )
@@ -0,0 +1,73 @@
+import json
+import logging
+import logging.handlers
+import queue
+
+from datetime import datetime
+
+from . import metrics
+
+DEFAULT_QUEUE_SIZE: int = 10000
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops records when the queue is full instead of blocking."""
+
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped: int = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            metrics.log_records_dropped.inc()
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as JSON lines, fields passed in `extra={'fields': {...}}` are merged in."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict = {
+            'time': datetime.fromtimestamp(record.created).strftime("%Y-%m-%d %H:%M:%S.%f"),
+            'level': record.levelname,
+            'message': record.getMessage()
+        }
+        entry.update(getattr(record, 'fields', {}))
+
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, default=str)
+
+
+def install_queue_logging(logger_names: list[str], maxsize: int) -> list[logging.handlers.QueueListener]:
+    """Moves the handlers of each logger behind a bounded queue and a listener thread.
+
+    Formatting and file I/O (including rotation) then run on the listener
+    thread, logging calls on the event loop only enqueue the record.
+    """
+    listeners: list[logging.handlers.QueueListener] = []
+
+    for name in logger_names:
+        logger: logging.Logger = logging.getLogger(name)
+        handlers: list[logging.Handler] = [
+            handler for handler in logger.handlers
+            if not isinstance(handler, logging.handlers.QueueHandler)
+        ]
+        if not handlers:
+            continue
+
+        log_queue: queue.Queue = queue.Queue(maxsize)
+        listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+
+        for handler in handlers:
+            logger.removeHandler(handler)
+
+        logger.addHandler(DroppingQueueHandler(log_queue))
+        listener.start()
+
+        listeners.append(listener)
+
+    return listeners
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from . import metrics
+
+logger: logging.Logger = logging.getLogger("chatinterface_server")
+
+
+class LoopLagMonitor:
+    """Measures event loop scheduling lag and reports what blocked the loop.
+
+    A task on the loop sleeps for `interval` and records how late it woke up.
+    A watchdog thread checks the task's heartbeat, when it is older than
+    `threshold` the loop is stuck, so the thread samples the loop thread's
+    stack and logs it together with the running task. Each stall is
+    reported once.
+    """
+
+    def __init__(self, interval: float, threshold: float) -> None:
+        self.interval: float = interval
+        self.threshold: float = threshold
+
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.loop_thread_id: int | None = None
+
+        self.heartbeat: float = time.monotonic()
+        self.stalls: int = 0
+
+        self.task: asyncio.Task | None = None
+        self.watchdog: threading.Thread | None = None
+        self.stop_event: threading.Event = threading.Event()
+
+    def start(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+
+        self.heartbeat = time.monotonic()
+        self.stop_event.clear()
+
+        self.task = asyncio.ensure_future(self._measure_lag())
+        self.watchdog = threading.Thread(target=self._watch, name='loop-lag-watchdog', daemon=True)
+        self.watchdog.start()
+
+    async def stop(self) -> None:
+        self.stop_event.set()
+
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+        if self.watchdog is not None:
+            self.watchdog.join(timeout=self.interval * 2)
+
+    async def _measure_lag(self) -> None:
+        while True:
+            expected: float = self.loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+
+            lag: float = max(self.loop.time() - expected, 0.0)
+            metrics.event_loop_lag.observe(lag)
+
+            self.heartbeat = time.monotonic()
+
+    def _watch(self) -> None:
+        reported_heartbeat: float | None = None
+
+        while not self.stop_event.wait(self.interval):
+            heartbeat: float = self.heartbeat
+            stalled_for: float = time.monotonic() - heartbeat - self.interval
+
+            if stalled_for < self.threshold or heartbeat == reported_heartbeat:
+                continue
+
+            reported_heartbeat = heartbeat
+            self.stalls += 1
+            metrics.event_loop_stalls.inc()
+
+            self._report_stall(stalled_for)
+
+    def _report_stall(self, stalled_for: float) -> None:
+        frame = sys._current_frames().get(self.loop_thread_id)
+        stack: str = ''.join(traceback.format_stack(frame)) if frame else '<no frame>'
+
+        # Read from another thread, good enough for a diagnostic
+        task: asyncio.Task | None = asyncio.current_task(self.loop)
+        running: str = repr(task.get_coro()) if task else '<callback>'
+
+        logger.warning(
+            "Event loop blocked for %.0f ms while running %s, sampled stack:\n%s",
+            stalled_for * 1000, running, stack
+        )
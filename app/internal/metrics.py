@@ -0,0 +1,294 @@
+import math
+import threading
+
+from collections.abc import Sequence
+
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+
+CONTENT_TYPE: str = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS: tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+FANOUT_BUCKETS: tuple[float, ...] = (0, 1, 2, 5, 10, 25, 50, 100)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+
+    if float(value).is_integer():
+        return str(int(value))
+
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+
+    pairs: str = ','.join(f'{name}="{_escape_label(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class _Metric:
+    metric_type: str = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name: str = name
+        self.documentation: str = documentation
+        self.labelnames: tuple[str, ...] = tuple(labelnames)
+
+        self.values: dict[tuple[str, ...], float] = {}
+        self.lock: threading.Lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"metric {self.name} expects labels {self.labelnames}")
+
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> list[str]:
+        with self.lock:
+            items: list = sorted(self.values.items())
+
+        return [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+            for key, value in items
+        ]
+
+    def render(self) -> list[str]:
+        return [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.metric_type}',
+            *self._samples()
+        ]
+
+
+class Counter(_Metric):
+    metric_type: str = 'counter'
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        if amount < 0:
+            raise ValueError("counters can only increase")
+
+        key: tuple[str, ...] = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def set_total(self, value: float, **labels: str) -> None:
+        """Copies a running total kept elsewhere, like the statistics of the conversation cache."""
+        key: tuple[str, ...] = self._key(labels)
+        with self.lock:
+            self.values[key] = max(self.values.get(key, 0), value)
+
+
+class Gauge(_Metric):
+    metric_type: str = 'gauge'
+
+    def set(self, value: float, **labels: str) -> None:
+        key: tuple[str, ...] = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key: tuple[str, ...] = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    metric_type: str = 'histogram'
+
+    def __init__(
+            self, name: str, documentation: str,
+            labelnames: Sequence[str] = (),
+            buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets: tuple[float, ...] = tuple(sorted(buckets)) + (math.inf,)
+
+        # Per label set: bucket counts (not cumulative), sum, count
+        self.series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key: tuple[str, ...] = self._key(labels)
+
+        with self.lock:
+            series: list | None = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * len(self.buckets), 0.0, 0]
+
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+                    break
+
+            series[1] += value
+            series[2] += 1
+
+    def totals(self) -> dict[tuple[str, ...], tuple[int, float]]:
+        """Observation count and sum per label set."""
+        with self.lock:
+            return {key: (series[2], series[1]) for key, series in self.series.items()}
+
+    def _samples(self) -> list[str]:
+        with self.lock:
+            items: list = sorted((key, [list(s[0]), s[1], s[2]]) for key, s in self.series.items())
+
+        lines: list[str] = []
+        names: tuple[str, ...] = self.labelnames + ('le',)
+
+        for key, (bucket_counts, total, count) in items:
+            cumulative: int = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                labels: str = _format_labels(names, key + (_format_value(bound),))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+
+            labels: str = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+
+        return lines
+
+
+class Registry:
+    """Holds metrics and writes them in the Prometheus text exposition format."""
+
+    def __init__(self) -> None:
+        self.metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"metric {metric.name} already registered")
+
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+
+        return '\n'.join(lines) + '\n'
+
+
+registry: Registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    'http_request_duration_seconds', "HTTP request latency by route.",
+    ('method', 'route', 'status')
+))
+db_executor_wait = registry.register(Histogram(
+    'db_executor_wait_seconds', "Time database calls waited for a free executor thread.",
+    ('function',)
+))
+db_executor_run = registry.register(Histogram(
+    'db_executor_run_seconds', "Time database calls spent running on the executor.",
+    ('function',)
+))
+db_executor_pending = registry.register(Gauge(
+    'db_executor_pending', "Database calls queued or running on the executor."
+))
+db_executor_rejected = registry.register(Counter(
+    'db_executor_rejected_total', "Database calls rejected because the executor was at its limit."
+))
+db_pool_checkouts = registry.register(Counter(
+    'db_pool_checkouts_total', "Connections checked out from the pool."
+))
+db_pool_checkout_wait = registry.register(Histogram(
+    'db_pool_checkout_wait_seconds', "Time spent waiting for a pooled connection."
+))
+db_pool_timeouts = registry.register(Counter(
+    'db_pool_timeouts_total', "Checkouts that gave up after the pool timeout."
+))
+db_pool_size = registry.register(Gauge(
+    'db_pool_size', "Connections kept open by the pool."
+))
+db_replica_reads = registry.register(Counter(
+    'db_replica_reads_total', "Read-only calls by where they ran: replica, primary or fallback.",
+    ('target',)
+))
+db_pool_checked_out = registry.register(Gauge(
+    'db_pool_checked_out', "Connections currently checked out from the pool."
+))
+db_pool_overflow = registry.register(Gauge(
+    'db_pool_overflow', "Connections opened past the pool size."
+))
+websocket_connections = registry.register(Gauge(
+    'websocket_connections', "Open WebSocket connections in this process."
+))
+broadcast_fanout = registry.register(Histogram(
+    'websocket_broadcast_fanout', "Sockets a single broadcast was sent to.",
+    buckets=FANOUT_BUCKETS
+))
+broadcast_duration = registry.register(Histogram(
+    'websocket_broadcast_duration_seconds', "Time taken to send a broadcast to every socket."
+))
+event_loop_lag = registry.register(Histogram(
+    'event_loop_lag_seconds', "How late the event loop ran a scheduled wakeup."
+))
+event_loop_stalls = registry.register(Counter(
+    'event_loop_stalls_total', "Times the event loop was blocked past the report threshold."
+))
+log_records_dropped = registry.register(Counter(
+    'log_records_dropped_total', "Log records dropped because the logging queue was full."
+))
+argon2_verify_duration = registry.register(Histogram(
+    'argon2_verify_duration_seconds', "Password verification time."
+))
+cache_hits = registry.register(Counter(
+    'conversation_cache_hits_total', "First pages of messages served from the conversation cache."
+))
+cache_misses = registry.register(Counter(
+    'conversation_cache_misses_total', "First pages of messages the conversation cache could not serve."
+))
+cache_evictions = registry.register(Counter(
+    'conversation_cache_evictions_total', "Conversations evicted from the cache to stay under its size limit."
+))
+cache_conversations = registry.register(Gauge(
+    'conversation_cache_conversations', "Conversations held by the conversation cache."
+))
+cache_bytes = registry.register(Gauge(
+    'conversation_cache_bytes', "Estimated memory used by the conversation cache."
+))
+
+
+@event.listens_for(Pool, 'checkout')
+def _on_pool_checkout(dbapi_connection, connection_record, connection_proxy):
+    db_pool_checkouts.inc()
+
+
+def update_pool_metrics(pool: Pool) -> None:
+    # Only QueuePool style pools report these
+    checked_out = getattr(pool, 'checkedout', None)
+    overflow = getattr(pool, 'overflow', None)
+    size = getattr(pool, 'size', None)
+
+    if size is not None:
+        db_pool_size.set(size())
+
+    if checked_out is not None:
+        db_pool_checked_out.set(checked_out())
+
+    if overflow is not None:
+        db_pool_overflow.set(max(overflow(), 0))
+
+
+def update_cache_metrics(stats: dict[str, int | float]) -> None:
+    cache_hits.set_total(stats['hits'])
+    cache_misses.set_total(stats['misses'])
+    cache_evictions.set_total(stats['evictions'])
+
+    cache_conversations.set(stats['conversations'])
+    cache_bytes.set(stats['bytes'])
@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import os
+import secrets
+import time
+
+from collections.abc import Awaitable, Callable
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import metrics
+from .config import ConfigManager, settings
+from .executor import ExecutorOverloaded
+from .profiler import SamplingProfiler, current_profile
+from .querystats import QueryStats, count_queries
+
+logger: logging.Logger = logging.getLogger("chatinterface_server")
+access_logger: logging.Logger = logging.getLogger("chatinterface_server.access")
+
+
+def route_path(scope: Scope) -> str:
+    # Route templates keep the label count bounded, unmatched paths share one label
+    return getattr(scope.get('route'), 'path', '<unmatched>')
+
+
+class RequestInstrumentation:
+    """Request metrics, the access log, query debug headers and profiling, in one ASGI layer.
+
+    Headers are added when the response starts, the metrics and the access
+    log are written once the body was sent. Requests with `X-Profile: 1`
+    that `can_profile` accepts are sampled until the response starts, and
+    the profile is written on the default executor instead of the event loop.
+    """
+
+    def __init__(
+            self, app: ASGIApp, config: ConfigManager,
+            can_profile: Callable[[Request], Awaitable[bool]],
+            query_headers: bool = False
+    ) -> None:
+        self.app: ASGIApp = app
+        self.config: ConfigManager = config
+
+        self.can_profile: Callable[[Request], Awaitable[bool]] = can_profile
+        self.query_headers: bool = query_headers
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        request: Request = Request(scope)
+        profile: SamplingProfiler | None = None
+
+        if request.headers.get('x-profile') == '1' and await self._profiling_allowed(request):
+            profile = SamplingProfiler(settings.PROFILE_SAMPLE_INTERVAL_MS / 1000)
+
+        start: float = time.perf_counter()
+        status: int = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                headers: MutableHeaders = MutableHeaders(scope=message)
+
+                if stats is not None:
+                    duration_ms: float = stats.duration * 1000
+                    headers['X-Query-Count'] = str(stats.count)
+                    headers['Server-Timing'] = f'db;dur={duration_ms:.2f};desc="{stats.count} queries"'
+
+                if profile is not None:
+                    headers['X-Profile-File'] = await self._write_profile(scope, profile)
+
+            await send(message)
+
+        stats: QueryStats | None = None
+        token = current_profile.set(profile) if profile is not None else None
+
+        try:
+            if profile is not None:
+                profile.start()
+
+            if self.query_headers:
+                with count_queries() as stats:
+                    await self.app(scope, receive, send_wrapper)
+            else:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            # Stopping twice is harmless, this covers responses that never started
+            if profile is not None:
+                profile.stop()
+                current_profile.reset(token)
+
+            self._record(scope, status, time.perf_counter() - start)
+
+    async def _profiling_allowed(self, request: Request) -> bool:
+        # Runs outside the exception handlers, an overloaded executor would turn into a 500 here.
+        # The request goes on unprofiled and the route gets the usual 503
+        try:
+            return await self.can_profile(request)
+        except ExecutorOverloaded:
+            return False
+
+    async def _write_profile(self, scope: Scope, profile: SamplingProfiler) -> str:
+        profile.stop()
+
+        path_template: str = getattr(scope.get('route'), 'path', 'unmatched')
+        route_name: str = path_template.strip('/').replace('/', '_').replace('{', '').replace('}', '') or 'root'
+        file_name: str = f"{time.strftime('%Y%m%d-%H%M%S')}-{route_name}-{secrets.token_hex(3)}.folded"
+
+        path: str = os.path.join(self.config.base_dir, 'profiles', file_name)
+        await asyncio.get_running_loop().run_in_executor(None, profile.write, path)
+
+        logger.info("Profiled %s %s to %s", scope['method'], scope['path'], file_name)
+        return file_name
+
+    def _record(self, scope: Scope, status: int, duration: float) -> None:
+        route: str = route_path(scope)
+        metrics.http_request_duration.observe(
+            duration,
+            method=scope['method'], route=route,
+            status=str(status)
+        )
+
+        if not settings.ACCESS_LOG_ENABLED:
+            return
+
+        client: tuple[str, int] | None = scope.get('client')
+        access_logger.info("%s %s", scope['method'], scope['path'], extra={'fields': {
+            'method': scope['method'],
+            'path': scope['path'],
+            'route': route,
+            'status': status,
+            'duration_ms': round(duration * 1000, 3),
+            'client': client[0] if client else None
+        }})
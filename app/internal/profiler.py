@@ -0,0 +1,97 @@
+import os
+import sys
+import threading
+
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections.abc import Iterator
+from types import FrameType
+
+current_profile: ContextVar['SamplingProfiler | None'] = ContextVar('current_profile', default=None)
+
+
+def collapse_stack(frame: FrameType | None) -> str:
+    """Formats a frame and its callers as one line of a collapsed stack, root first."""
+    names: list[str] = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+
+        frame = frame.f_back
+
+    return ';'.join(reversed(names))
+
+
+class SamplingProfiler:
+    """Samples the stacks of registered threads at a fixed interval.
+
+    The thread that starts the profiler is registered as the event loop,
+    executor threads register themselves with `profiled_thread()` while they
+    run a call for the profiled request. Output is the collapsed stack format
+    read by flamegraph tools, one `stack count` line per unique stack.
+    """
+
+    def __init__(self, interval: float) -> None:
+        self.interval: float = interval
+
+        self.threads: dict[int, str] = {}
+        self.samples: Counter[str] = Counter()
+
+        self.stop_event: threading.Event = threading.Event()
+        self.sampler: threading.Thread | None = None
+
+    def add_thread(self, thread_id: int, label: str) -> None:
+        self.threads[thread_id] = label
+
+    def remove_thread(self, thread_id: int) -> None:
+        self.threads.pop(thread_id, None)
+
+    def start(self) -> None:
+        self.add_thread(threading.get_ident(), 'event-loop')
+
+        self.sampler = threading.Thread(target=self._sample, name='request-profiler', daemon=True)
+        self.sampler.start()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        if self.sampler is not None:
+            self.sampler.join()
+
+    def _sample(self) -> None:
+        sampler_id: int = threading.get_ident()
+
+        while not self.stop_event.wait(self.interval):
+            frames: dict[int, FrameType] = sys._current_frames()
+
+            for thread_id, label in list(self.threads.items()):
+                frame: FrameType | None = frames.get(thread_id)
+                if frame is None or thread_id == sampler_id:
+                    continue
+
+                self.samples[f"{label};{collapse_stack(frame)}"] += 1
+
+    def collapsed(self) -> str:
+        return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def write(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        with open(path, 'w') as file:
+            file.write(self.collapsed())
+
+
+@contextmanager
+def profiled_thread(label: str) -> Iterator[None]:
+    """Registers the current thread with the active profiler, if any."""
+    profile: SamplingProfiler | None = current_profile.get()
+    if profile is None:
+        yield
+        return
+
+    thread_id: int = threading.get_ident()
+    profile.add_thread(thread_id, label)
+
+    try:
+        yield
+    finally:
+        profile.remove_thread(thread_id)
@@ -0,0 +1,78 @@
+import time
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections.abc import Iterator
+
+from sqlalchemy import Engine, event
+
+from .slowlog import SlowQueryLog
+
+_current_stats: ContextVar['QueryStats | None'] = ContextVar('query_stats', default=None)
+_slow_query_log: SlowQueryLog | None = None
+
+
+class QueryStats:
+    """Statements ran while this is the active counter, including nested counters."""
+
+    def __init__(self, parent: 'QueryStats | None' = None) -> None:
+        self.parent: QueryStats | None = parent
+
+        self.count: int = 0
+        self.duration: float = 0.0
+        self.statements: list[str] = []
+
+    def record(self, statement: str, duration: float) -> None:
+        stats: QueryStats | None = self
+        while stats is not None:
+            stats.count += 1
+            stats.duration += duration
+            stats.statements.append(statement)
+
+            stats = stats.parent
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryStats]:
+    """Counts statements ran in this context, executor calls from `async_threaded` included."""
+    stats: QueryStats = QueryStats(_current_stats.get())
+    token = _current_stats.set(stats)
+
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def set_slow_query_log(slow_query_log: SlowQueryLog | None) -> None:
+    global _slow_query_log
+
+    if _slow_query_log is not None:
+        _slow_query_log.close()
+
+    _slow_query_log = slow_query_log
+
+
+# Listening on the Engine class covers engines swapped in with `override_engine()`
+# The start time lives on the execution context, a statement that raises never reaches
+# after_cursor_execute and would leave a stale entry on anything shared by the connection
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.query_start_time = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_time: float | None = getattr(context, 'query_start_time', None)
+    if start_time is None:
+        return
+
+    duration: float = time.perf_counter() - start_time
+    stats: QueryStats | None = _current_stats.get()
+
+    if stats is not None:
+        stats.record(statement, duration)
+
+    if _slow_query_log is not None:
+        _slow_query_log.record(conn, statement, parameters, duration, executemany)
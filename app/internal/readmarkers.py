@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import uuid
+
+from collections.abc import Awaitable, Callable
+
+from ..models.chats import ReadState
+
+logger: logging.Logger = logging.getLogger("chatinterface_server")
+
+MarkerKey = tuple[str, str]  # username, peer name
+ApplyMarkers = Callable[[list[tuple[str, str, uuid.UUID]]], Awaitable[list[tuple[str, ReadState]]]]
+ReadStateListener = Callable[[list[tuple[str, ReadState]]], Awaitable[None]]
+
+
+class ReadMarkerBuffer:
+    """Coalesces read markers into at most one write per conversation per `interval`.
+
+    Clients move the marker on every scroll. Only the newest marker of each
+    conversation is kept until the next flush, which applies all of them in
+    one database call and hands the resulting read states to the listeners.
+    """
+
+    def __init__(self, apply: ApplyMarkers, interval: float) -> None:
+        self.apply: ApplyMarkers = apply
+        self.interval: float = interval
+
+        self.pending: dict[MarkerKey, uuid.UUID] = {}
+        self.listeners: list[ReadStateListener] = []
+
+        self.flush_handle: asyncio.TimerHandle | None = None
+        self.flush_tasks: set[asyncio.Task] = set()
+
+        self.submitted: int = 0
+        self.written: int = 0
+
+    def submit(self, username: str, peer_name: str, message_id: uuid.UUID) -> None:
+        key: MarkerKey = (username, peer_name)
+        current: uuid.UUID | None = self.pending.get(key)
+
+        self.submitted += 1
+        if current is None or message_id > current:
+            self.pending[key] = message_id
+
+        if self.flush_handle is None:
+            loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+            self.flush_handle = loop.call_later(self.interval, self._start_flush)
+
+    def _start_flush(self) -> None:
+        self.flush_handle = None
+
+        task: asyncio.Task = asyncio.ensure_future(self.flush())
+        self.flush_tasks.add(task)
+        task.add_done_callback(self.flush_tasks.discard)
+
+    async def flush(self) -> None:
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+
+        if not self.pending:
+            return
+
+        batch, self.pending = self.pending, {}
+        markers: list[tuple[str, str, uuid.UUID]] = [
+            (username, peer_name, message_id)
+            for (username, peer_name), message_id in batch.items()
+        ]
+
+        try:
+            states: list[tuple[str, ReadState]] = await self.apply(markers)
+        except Exception:
+            # Dropped, the next scroll sends a newer marker anyway
+            logger.exception("Applying %d read markers failed:", len(markers))
+            return
+
+        self.written += len(states)
+        for listener in self.listeners:
+            try:
+                await listener(states)
+            except Exception:
+                logger.exception("Read state listener failed:")
+
+    async def close(self) -> None:
+        await self.flush()
+        if self.flush_tasks:
+            await asyncio.gather(*self.flush_tasks, return_exceptions=True)
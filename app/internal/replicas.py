@@ -0,0 +1,138 @@
+import inspect
+import itertools
+import threading
+import time
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections.abc import Iterator
+
+from sqlalchemy import Engine
+
+# Past this many tracked writers, expired entries are pruned on the next write
+MAX_TRACKED_WRITERS: int = 10000
+
+
+def read_only(func):
+    """Marks an `async_threaded` method as safe to run on a read replica.
+
+    The argument after the session is the reading user, the one checked
+    for read-your-writes stickiness.
+    """
+    func.read_only = True
+    return func
+
+
+def writes_as(*param_names: str):
+    """Names the parameters of an `async_threaded` method that hold the users it writes for.
+
+    Those users read from the primary for a while after the call, methods
+    without it never make anyone sticky.
+    """
+    def decorator(func):
+        names: list[str] = list(inspect.signature(func).parameters)
+
+        # Positions in the call arguments, which start after `self`
+        func.writer_params = tuple((name, names.index(name) - 1) for name in param_names)
+        return func
+
+    return decorator
+
+
+def call_writers(func, args: tuple, kwargs: dict) -> list[str]:
+    """Usernames a `writes_as` method wrote for, taken from its call arguments."""
+    writers: list[str] = []
+
+    for name, position in getattr(func, 'writer_params', ()):
+        value = kwargs[name] if name in kwargs else args[position] if position < len(args) else None
+        if isinstance(value, str):
+            writers.append(value)
+
+    return writers
+
+
+class ReadSources:
+    """Where the read-only calls made while this is active were served from."""
+
+    def __init__(self) -> None:
+        self.replica: bool = False
+
+
+_current_sources: ContextVar[ReadSources | None] = ContextVar('read_sources', default=None)
+
+
+@contextmanager
+def track_reads() -> Iterator[ReadSources]:
+    """Records whether any call in this context read from a replica, executor calls included."""
+    sources: ReadSources = ReadSources()
+    token = _current_sources.set(sources)
+
+    try:
+        yield sources
+    finally:
+        _current_sources.reset(token)
+
+
+def record_replica_read() -> None:
+    sources: ReadSources | None = _current_sources.get()
+    if sources is not None:
+        sources.replica = True
+
+
+class ReplicaRouter:
+    """Picks a replica engine for read-only calls.
+
+    A user that wrote within `sticky_seconds` reads from the primary, so
+    they always see their own writes through replication lag. A replica
+    that fails is skipped for `retry_seconds` and the call falls back to
+    the primary.
+    """
+
+    def __init__(self, engines: list[Engine], sticky_seconds: float, retry_seconds: float) -> None:
+        self.engines: list[Engine] = engines
+        self.sticky_seconds: float = sticky_seconds
+        self.retry_seconds: float = retry_seconds
+
+        self.recent_writes: dict[str, float] = {}
+        self.down_until: dict[int, float] = {}
+
+        self.counter: itertools.count = itertools.count()
+        self.lock: threading.Lock = threading.Lock()
+
+    def mark_write(self, username: str) -> None:
+        now: float = time.monotonic()
+
+        with self.lock:
+            self.recent_writes[username] = now + self.sticky_seconds
+
+            if len(self.recent_writes) > MAX_TRACKED_WRITERS:
+                self.recent_writes = {
+                    key: until for key, until in self.recent_writes.items()
+                    if until > now
+                }
+
+    def pick(self, username: str | None) -> tuple[int, Engine] | None:
+        """Replica to read from, None when the call should go to the primary."""
+        now: float = time.monotonic()
+
+        with self.lock:
+            if username is not None and self.recent_writes.get(username, 0) > now:
+                return None
+
+            healthy: list[int] = [
+                index for index in range(len(self.engines))
+                if self.down_until.get(index, 0) <= now
+            ]
+            if not healthy:
+                return None
+
+            index: int = healthy[next(self.counter) % len(healthy)]
+            return index, self.engines[index]
+
+    def mark_down(self, index: int) -> None:
+        with self.lock:
+            self.down_until[index] = time.monotonic() + self.retry_seconds
+
+    def close(self) -> None:
+        for engine in self.engines:
+            engine.dispose()
@@ -0,0 +1,429 @@
+import base64
+import binascii
+import json
+import math
+import re
+import threading
+import uuid
+
+from collections import defaultdict
+from datetime import datetime
+from typing import NamedTuple
+
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, and_, or_, select
+
+from ..models.dbtables import Messages, Users
+
+# Letters and digits only, the same split as the FTS5 unicode61 tokenizer and MariaDB
+TOKEN_PATTERN: re.Pattern = re.compile(r'[^\W_]+')
+MAX_QUERY_TERMS: int = 8
+SNIPPET_WIDTH: int = 160
+
+BUILD_BATCH_SIZE: int = 5000
+BM25_K1: float = 1.2
+BM25_B: float = 0.75
+
+# Created by the migration on existing databases and by `create_all` on new ones.
+# The FTS5 table is contentless and keyed on `messages_fts_ids.fts_rowid`, an INTEGER
+# PRIMARY KEY mapped to the message ID. The implicit rowid of `messages` is not used,
+# since VACUUM and batch migrations renumber it.
+SQLITE_FTS_DDL: list[str] = [
+    "CREATE TABLE IF NOT EXISTS messages_fts_ids ("
+    "fts_rowid INTEGER PRIMARY KEY, message_id CHAR(32) NOT NULL UNIQUE)",
+
+    "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(message_data, content='')",
+
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN "
+    "INSERT INTO messages_fts_ids(message_id) VALUES (new.message_id); "
+    "INSERT INTO messages_fts(rowid, message_data) "
+    "SELECT fts_rowid, new.message_data FROM messages_fts_ids WHERE message_id = new.message_id; END",
+
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN "
+    "INSERT INTO messages_fts(messages_fts, rowid, message_data) "
+    "SELECT 'delete', fts_rowid, old.message_data FROM messages_fts_ids WHERE message_id = old.message_id; "
+    "DELETE FROM messages_fts_ids WHERE message_id = old.message_id; END",
+
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF message_data ON messages BEGIN "
+    "INSERT INTO messages_fts(messages_fts, rowid, message_data) "
+    "SELECT 'delete', fts_rowid, old.message_data FROM messages_fts_ids WHERE message_id = old.message_id; "
+    "INSERT INTO messages_fts(rowid, message_data) "
+    "SELECT fts_rowid, new.message_data FROM messages_fts_ids WHERE message_id = new.message_id; END"
+]
+SQLITE_FTS_TRIGGERS: tuple[str, ...] = ('messages_fts_insert', 'messages_fts_delete', 'messages_fts_update')
+
+# Contentless tables have no 'rebuild' command, the index is refilled from `messages`
+SQLITE_FTS_REBUILD: list[str] = [
+    "INSERT INTO messages_fts(messages_fts) VALUES ('delete-all')",
+    "DELETE FROM messages_fts_ids",
+    "INSERT INTO messages_fts_ids(message_id) SELECT message_id FROM messages ORDER BY message_id",
+
+    "INSERT INTO messages_fts(rowid, message_data) "
+    "SELECT messages_fts_ids.fts_rowid, messages.message_data FROM messages_fts_ids "
+    "JOIN messages ON messages.message_id = messages_fts_ids.message_id"
+]
+MARIADB_FULLTEXT_DDL: str = "ALTER TABLE messages ADD FULLTEXT INDEX ix_messages_message_data_fulltext (message_data)"
+
+
+class SearchHit(NamedTuple):
+    message_id: uuid.UUID
+    message_data: str
+    send_date: datetime
+    sender_name: str
+    recipient_name: str
+    score: float
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def query_terms(query: str) -> list[str]:
+    """Unique terms of a search query in order, every term has to match."""
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+
+def encode_cursor(score: float, message_id: uuid.UUID) -> str:
+    raw: bytes = json.dumps([score, message_id.hex]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple[float, uuid.UUID]:
+    """Raises ValueError on anything that was not made by `encode_cursor`."""
+    try:
+        raw: bytes = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        score, message_hex = json.loads(raw)
+
+        return float(score), uuid.UUID(hex=message_hex)
+    except (binascii.Error, TypeError, ValueError) as exc:
+        raise ValueError("invalid search cursor") from exc
+
+
+def make_snippet(text: str, terms: list[str], width: int = SNIPPET_WIDTH) -> tuple[str, list[tuple[int, int]]]:
+    """Window of `text` around the first matched term, with offsets of every match inside it."""
+    term_set: set[str] = set(terms)
+    matches: list[tuple[int, int]] = [
+        found.span() for found in TOKEN_PATTERN.finditer(text)
+        if found.group().lower() in term_set
+    ]
+
+    start: int = 0
+    if matches and len(text) > width:
+        start = max(0, min(matches[0][0] - width // 4, len(text) - width))
+
+    end: int = min(len(text), start + width)
+    highlights: list[tuple[int, int]] = [
+        (match_start - start, match_end - start) for match_start, match_end in matches
+        if match_start >= start and match_end <= end
+    ]
+    return text[start:end], highlights
+
+
+def sqlite_has_fts5(connection: sa.Connection) -> bool:
+    options: list[str] = connection.exec_driver_sql("PRAGMA compile_options").scalars().all()
+    return 'ENABLE_FTS5' in options
+
+
+def has_fulltext_index(connection: sa.Connection) -> bool:
+    dialect_name: str = connection.dialect.name
+
+    if dialect_name == 'sqlite':
+        return sa.inspect(connection).has_table('messages_fts_ids')
+
+    if dialect_name in ('mysql', 'mariadb'):
+        return connection.exec_driver_sql(
+            "SELECT 1 FROM information_schema.statistics WHERE table_schema = DATABASE() "
+            "AND table_name = 'messages' AND index_type = 'FULLTEXT' LIMIT 1"
+        ).first() is not None
+
+    return False
+
+
+def repair_sqlite_index(connection: sa.Connection) -> bool:
+    """Recreates missing FTS5 triggers and refills the index, True if it had to.
+
+    Batch migrations copy `messages` into a new table, which drops its
+    triggers, and every write after that is missing from the index.
+    """
+    existing: set[str] = set(connection.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'messages'"
+    ).scalars().all())
+    if existing.issuperset(SQLITE_FTS_TRIGGERS):
+        return False
+
+    for statement in SQLITE_FTS_DDL + SQLITE_FTS_REBUILD:
+        connection.exec_driver_sql(statement)
+
+    return True
+
+
+def _create_sqlite_index(ddl, target, bind, **kwargs) -> bool:
+    return sqlite_has_fts5(bind)
+
+
+for _statement in SQLITE_FTS_DDL:
+    event.listen(
+        Messages.__table__, 'after_create',
+        sa.DDL(_statement).execute_if(dialect='sqlite', callable_=_create_sqlite_index)
+    )
+
+event.listen(
+    Messages.__table__, 'after_create',
+    sa.DDL(MARIADB_FULLTEXT_DDL).execute_if(dialect=('mysql', 'mariadb'))
+)
+for _table_name in ('messages_fts', 'messages_fts_ids'):
+    event.listen(
+        Messages.__table__, 'after_drop',
+        sa.DDL(f"DROP TABLE IF EXISTS {_table_name}").execute_if(dialect='sqlite')
+    )
+
+
+def _fulltext_statement(dialect_name: str, username: str, terms: list[str]):
+    sender_user = aliased(Users)
+    recipient_user = aliased(Users)
+
+    if dialect_name == 'sqlite':
+        fts_table = sa.literal_column('messages_fts')
+        fts_ids = sa.table('messages_fts_ids', sa.column('fts_rowid'), sa.column('message_id'))
+
+        # bm25 is lower for better matches
+        score = (-sa.func.bm25(fts_table)).label('score')
+        statement = (
+            select(Messages.message_id, score)
+            .select_from(sa.table('messages_fts'))
+            .join(fts_ids, fts_ids.c.fts_rowid == sa.literal_column('messages_fts.rowid'))
+            .join(Messages, Messages.message_id == fts_ids.c.message_id)
+            .where(fts_table.op('MATCH')(' '.join(f'"{term}"' for term in terms)))
+        )
+    else:
+        relevance = match(Messages.message_data, against=' '.join(f'+{term}' for term in terms)).in_boolean_mode()
+        score = relevance.label('score')
+        statement = select(Messages.message_id, score).where(relevance)
+
+    # Only conversations the caller is part of, messages of users being deleted are gone
+    statement = (
+        statement
+        .add_columns(
+            Messages.message_data, Messages.send_date,
+            sender_user.username.label('sender_name'),
+            recipient_user.username.label('recipient_name')
+        )
+        .join(sender_user, sender_user.user_id == Messages.sender_id)
+        .join(recipient_user, recipient_user.user_id == Messages.recipient_id)
+        .where(
+            or_(sender_user.username == username, recipient_user.username == username),
+            sender_user.disabled.is_(False),
+            recipient_user.disabled.is_(False)
+        )
+    )
+    return statement.subquery('ranked')
+
+
+def search_fulltext(
+        session: Session, username: str, terms: list[str],
+        amount: int, cursor: tuple[float, uuid.UUID] | None
+) -> list[SearchHit]:
+    """Ranked matches from FTS5 on SQLite or the FULLTEXT index on MariaDB, best first."""
+    ranked = _fulltext_statement(session.get_bind().dialect.name, username, terms)
+    statement = select(
+        ranked.c.message_id, ranked.c.message_data, ranked.c.send_date,
+        ranked.c.sender_name, ranked.c.recipient_name, ranked.c.score
+    )
+
+    if cursor is not None:
+        score, message_id = cursor
+        statement = statement.where(or_(
+            ranked.c.score < score,
+            and_(ranked.c.score == score, ranked.c.message_id < message_id)
+        ))
+
+    statement = statement.order_by(ranked.c.score.desc(), ranked.c.message_id.desc()).limit(amount)
+    return [SearchHit(*row) for row in session.exec(statement).all()]
+
+
+class IndexedMessage(NamedTuple):
+    sender_name: str
+    recipient_name: str
+    length: int
+    terms: tuple[str, ...]
+
+
+class InvertedIndex:
+    """In-memory index for databases without a full-text index.
+
+    Built from the messages table on the first search, then kept current by
+    the write methods. Updates are per process, so with several workers
+    sharing a database each one only sees its own writes until restarted.
+
+    Pages of the build are read from the database without holding `lock`,
+    so writes and searches only wait while a page is applied. Messages
+    written while the build runs are applied right away and skipped by the
+    pages, which may have been read before the write.
+    """
+
+    def __init__(self) -> None:
+        self.postings: defaultdict[str, dict[uuid.UUID, int]] = defaultdict(dict)
+        self.documents: dict[uuid.UUID, IndexedMessage] = {}
+        self.total_length: int = 0
+
+        self.ready: bool = False
+        self.building: bool = False
+
+        self.written: set[uuid.UUID] = set()
+        self.removed_users: set[str] = set()
+
+        self.lock: threading.Lock = threading.Lock()
+        self.build_lock: threading.Lock = threading.Lock()
+
+    def _add(self, message_id: uuid.UUID, sender_name: str, recipient_name: str, message_data: str) -> None:
+        self._remove(message_id)
+
+        tokens: list[str] = tokenize(message_data)
+        counts: dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+
+        for token, count in counts.items():
+            self.postings[token][message_id] = count
+
+        self.documents[message_id] = IndexedMessage(sender_name, recipient_name, len(tokens), tuple(counts))
+        self.total_length += len(tokens)
+
+    def _remove(self, message_id: uuid.UUID) -> None:
+        document: IndexedMessage | None = self.documents.pop(message_id, None)
+        if document is None:
+            return
+
+        for token in document.terms:
+            posting: dict[uuid.UUID, int] = self.postings[token]
+            posting.pop(message_id, None)
+            if not posting:
+                del self.postings[token]
+
+        self.total_length -= document.length
+
+    def add(self, message_id: uuid.UUID, sender_name: str, recipient_name: str, message_data: str) -> None:
+        # Writes before the first build are picked up by the build itself
+        with self.lock:
+            if self.building:
+                self.written.add(message_id)
+
+            if self.ready or self.building:
+                self._add(message_id, sender_name, recipient_name, message_data)
+
+    def remove(self, message_id: uuid.UUID) -> None:
+        with self.lock:
+            if self.building:
+                self.written.add(message_id)
+
+            self._remove(message_id)
+
+    def remove_user(self, username: str) -> None:
+        with self.lock:
+            if self.building:
+                self.removed_users.add(username)
+
+            removed: list[uuid.UUID] = [
+                message_id for message_id, document in self.documents.items()
+                if username in (document.sender_name, document.recipient_name)
+            ]
+            for message_id in removed:
+                self._remove(message_id)
+
+    def _apply_page(self, rows: list[tuple[uuid.UUID, str, str, str]]) -> None:
+        with self.lock:
+            for message_id, sender_name, recipient_name, message_data in rows:
+                if message_id in self.written:
+                    continue
+
+                if sender_name in self.removed_users or recipient_name in self.removed_users:
+                    continue
+
+                self._add(message_id, sender_name, recipient_name, message_data)
+
+    def build(self, session: Session) -> None:
+        sender_user = aliased(Users)
+        recipient_user = aliased(Users)
+
+        statement = (
+            select(Messages.message_id, sender_user.username, recipient_user.username, Messages.message_data)
+            .join(sender_user, sender_user.user_id == Messages.sender_id)
+            .join(recipient_user, recipient_user.user_id == Messages.recipient_id)
+            .where(sender_user.disabled.is_(False), recipient_user.disabled.is_(False))
+            .order_by(Messages.message_id)
+            .limit(BUILD_BATCH_SIZE)
+        )
+
+        # Other searches wait for the build, writes only wait for one page at a time
+        with self.build_lock:
+            if self.ready:
+                return
+
+            with self.lock:
+                self.building = True
+
+            try:
+                last_id: uuid.UUID | None = None
+                while True:
+                    batch_statement = statement if last_id is None else statement.where(Messages.message_id > last_id)
+                    rows = session.exec(batch_statement).all()
+
+                    self._apply_page(rows)
+                    if len(rows) < BUILD_BATCH_SIZE:
+                        break
+
+                    last_id = rows[-1][0]
+
+                with self.lock:
+                    self.ready = True
+            finally:
+                with self.lock:
+                    self.building = False
+                    self.written.clear()
+                    self.removed_users.clear()
+
+                    # A failed build starts over on the next search
+                    if not self.ready:
+                        self.postings.clear()
+                        self.documents.clear()
+                        self.total_length = 0
+
+    def search(
+            self, username: str, terms: list[str],
+            amount: int, cursor: tuple[float, uuid.UUID] | None
+    ) -> list[tuple[uuid.UUID, float, IndexedMessage]]:
+        """BM25 ranked message IDs that contain every term, best first."""
+        with self.lock:
+            postings: list[dict[uuid.UUID, int]] = [self.postings.get(term, {}) for term in terms]
+            if not postings or not all(postings):
+                return []
+
+            document_count: int = len(self.documents)
+            average_length: float = self.total_length / document_count
+
+            postings.sort(key=len)
+            candidates: set[uuid.UUID] = set(postings[0]).intersection(*postings[1:])
+
+            scored: list[tuple[uuid.UUID, float, IndexedMessage]] = []
+            for message_id in candidates:
+                document: IndexedMessage = self.documents[message_id]
+                if username not in (document.sender_name, document.recipient_name):
+                    continue
+
+                score: float = 0.0
+                for posting in postings:
+                    frequency: int = posting[message_id]
+                    idf: float = math.log(1 + (document_count - len(posting) + 0.5) / (len(posting) + 0.5))
+                    norm: float = BM25_K1 * (1 - BM25_B + BM25_B * document.length / average_length)
+                    score += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+                if cursor is not None and (score, message_id) >= cursor:
+                    continue
+
+                scored.append((message_id, score, document))
+
+        scored.sort(key=lambda item: (item[1], item[0]), reverse=True)
+        return scored[:amount]
@@ -0,0 +1,139 @@
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+from collections import OrderedDict
+from collections.abc import Sequence
+from datetime import datetime
+
+from .logqueue import DroppingQueueHandler
+
+# Plans are captured once per statement in this many seconds, so a slow hot query
+# does not get an extra EXPLAIN on every execution
+EXPLAIN_INTERVAL: float = 60.0
+
+# Statements remembered for EXPLAIN_INTERVAL, the least recently explained are forgotten first.
+# Statements with inlined literals are all distinct, so the memory must stay bounded
+EXPLAINED_STATEMENTS_LIMIT: int = 1000
+
+EXPLAIN_PREFIXES: dict[str, str] = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'mysql': 'EXPLAIN ',
+    'mariadb': 'EXPLAIN '
+}
+
+
+def redact_parameters(parameters) -> list[str] | dict[str, str] | None:
+    """Replaces bound values with their type names, message contents and hashes never reach the log."""
+    if parameters is None:
+        return None
+
+    if isinstance(parameters, dict):
+        return {key: f"<{type(value).__name__}>" for key, value in parameters.items()}
+
+    if isinstance(parameters, Sequence) and not isinstance(parameters, (str, bytes)):
+        return [f"<{type(value).__name__}>" for value in parameters]
+
+    return [f"<{type(parameters).__name__}>"]
+
+
+class SlowQueryLog:
+    """Writes statements slower than `threshold` to a dedicated rotating log.
+
+    With `explain` on, the plan of slow SELECT statements is captured on the
+    same connection through a raw DBAPI cursor, which keeps the EXPLAIN itself
+    out of the engine events.
+
+    With a `queue_size`, the file handler is moved behind a bounded queue and
+    a listener thread like the application loggers, so slow statements do
+    not add file I/O to the executor thread that ran them.
+    """
+
+    def __init__(self, log_path: str, threshold: float, explain: bool = False, queue_size: int | None = None) -> None:
+        self.threshold: float = threshold
+        self.explain: bool = explain
+
+        self.logger: logging.Logger = logging.getLogger("chatinterface_server.slow_queries")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+
+        self.handler: logging.Handler = logging.handlers.RotatingFileHandler(
+            log_path, maxBytes=5 * 1024 * 1024, backupCount=3
+        )
+
+        # Same queue and listener thread setup as `install_queue_logging`, for this handler only.
+        # The logger is shared with the log being replaced, which is closed after this one is set up
+        self.listener: logging.handlers.QueueListener | None = None
+        self.entry_handler: logging.Handler = self.handler
+        if queue_size is not None:
+            log_queue: queue.Queue = queue.Queue(queue_size)
+            self.listener = logging.handlers.QueueListener(log_queue, self.handler, respect_handler_level=True)
+            self.entry_handler = DroppingQueueHandler(log_queue)
+            self.listener.start()
+
+        self.logger.addHandler(self.entry_handler)
+
+        self.explained_at: OrderedDict[str, float] = OrderedDict()
+        self.lock: threading.Lock = threading.Lock()
+
+    def close(self) -> None:
+        self.logger.removeHandler(self.entry_handler)
+
+        # Writes out queued entries before the file is closed
+        if self.listener is not None:
+            self.listener.stop()
+
+        self.handler.close()
+
+    def record(self, conn, statement: str, parameters, duration: float, executemany: bool) -> None:
+        if duration < self.threshold:
+            return
+
+        entry: dict = {
+            'time': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'duration_ms': round(duration * 1000, 3),
+            'statement': statement,
+            'parameters': None if executemany else redact_parameters(parameters),
+            'executemany': executemany
+        }
+
+        if self.explain and not executemany and self._should_explain(statement):
+            entry['plan'] = self._run_explain(conn, statement, parameters)
+
+        self.logger.info(json.dumps(entry, default=str))
+
+    def _should_explain(self, statement: str) -> bool:
+        if not statement.lstrip().upper().startswith('SELECT'):
+            return False
+
+        now: float = time.monotonic()
+        with self.lock:
+            last: float | None = self.explained_at.get(statement)
+            if last is not None and now - last < EXPLAIN_INTERVAL:
+                return False
+
+            self.explained_at[statement] = now
+            self.explained_at.move_to_end(statement)
+
+            if len(self.explained_at) > EXPLAINED_STATEMENTS_LIMIT:
+                self.explained_at.popitem(last=False)
+
+            return True
+
+    def _run_explain(self, conn, statement: str, parameters) -> list[list] | str | None:
+        prefix: str | None = EXPLAIN_PREFIXES.get(conn.dialect.name)
+        if prefix is None:
+            return None
+
+        try:
+            cursor = conn.connection.dbapi_connection.cursor()
+            try:
+                cursor.execute(prefix + statement, parameters or ())
+                return [list(row) for row in cursor.fetchall()]
+            finally:
+                cursor.close()
+        except Exception as exc:
+            return f"EXPLAIN failed: {exc}"
@@ -0,0 +1,102 @@
+import sqlite3
+import threading
+
+from sqlalchemy import Engine, create_engine, event
+from sqlalchemy.exc import OperationalError
+
+READ_PREFIXES: tuple[str, ...] = ('SELECT', 'PRAGMA', 'EXPLAIN')
+
+
+def is_write_statement(statement: str) -> bool:
+    return not statement.lstrip().upper().startswith(READ_PREFIXES)
+
+
+def apply_pragmas(dbapi_connection, pragmas: dict[str, str | int]) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+class WriterLock:
+    """Lets one connection of the engine write at a time.
+
+    SQLite allows a single writer, concurrent writers otherwise spin on
+    `busy_timeout` and can still fail with `database is locked`. The lock is
+    taken at the first write statement of a checkout and released when the
+    connection goes back to the pool, after its commit or rollback.
+    With WAL, readers are never blocked by it.
+
+    Waiting for the lock is bounded by `timeout` seconds, the same as
+    `busy_timeout`, and fails like SQLite does with `database is locked`.
+    A thread that writes on a second connection while its first one holds
+    the lock gets that error instead of deadlocking. Connections that are
+    invalidated or closed release the lock as well, their record loses its
+    info before the next checkout.
+    """
+
+    def __init__(self, engine: Engine, timeout: float) -> None:
+        self.lock: threading.Lock = threading.Lock()
+        self.timeout: float = timeout
+
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine.pool, 'checkin', self._on_checkin)
+        event.listen(engine.pool, 'invalidate', self._on_invalidate)
+        event.listen(engine.pool, 'close', self._on_checkin)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        record_info: dict = conn.connection.info
+        if record_info.get('holds_writer_lock') or not is_write_statement(statement):
+            return
+
+        if not self.lock.acquire(timeout=self.timeout):
+            raise OperationalError(
+                statement, parameters,
+                sqlite3.OperationalError(f"database is locked, no writer lock after {self.timeout}s")
+            )
+
+        record_info['holds_writer_lock'] = True
+
+    def _on_checkin(self, dbapi_connection, connection_record) -> None:
+        if connection_record is None or not connection_record.info.pop('holds_writer_lock', False):
+            return
+
+        self.lock.release()
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception) -> None:
+        self._on_checkin(dbapi_connection, connection_record)
+
+
+def create_sqlite_engine(
+        uri: str,
+        synchronous: str = 'NORMAL',
+        cache_size_kib: int = 65536,
+        mmap_size: int = 256 * 1024 * 1024,
+        busy_timeout_ms: int = 5000,
+        **engine_kwargs
+) -> Engine:
+    """SQLite engine in WAL mode with tuned pragmas and a single writer."""
+    engine: Engine = create_engine(
+        uri,
+        connect_args={'check_same_thread': False, 'timeout': busy_timeout_ms / 1000},
+        **engine_kwargs
+    )
+    pragmas: dict[str, str | int] = {
+        'journal_mode': 'WAL',
+        'synchronous': synchronous,
+        'cache_size': -cache_size_kib,  # negative values are KiB instead of pages
+        'mmap_size': mmap_size,
+        'busy_timeout': busy_timeout_ms,
+        'temp_store': 'MEMORY',
+        'foreign_keys': 'ON'
+    }
+
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        apply_pragmas(dbapi_connection, pragmas)
+
+    # Kept alive by its event listeners
+    WriterLock(engine, busy_timeout_ms / 1000)
+    return engine
@@ -0,0 +1,60 @@
+import uuid
+
+from collections.abc import Iterable
+
+from sqlalchemy import update
+from sqlmodel import Session, select
+from starlette.responses import Response
+
+from ..models.dbtables import Conversations, Users
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == '*':
+        return True
+
+    return etag in (tag.strip() for tag in if_none_match.split(','))
+
+
+def user_etag(user_id: uuid.UUID, change_version: int) -> str:
+    """ETag of everything a user can list, the user ID keeps a recreated username from matching."""
+    return f'W/"{user_id.hex}-{change_version}"'
+
+
+def set_etag(res: Response, etag: str, from_replica: bool) -> None:
+    """Sets the caching headers of a listing, without the ETag if a replica served its body.
+
+    The version was read from the primary, a lagging replica could pair it
+    with an older body that clients would then keep revalidating as fresh.
+    """
+    res.headers['Cache-Control'] = 'private, no-cache'
+    if not from_replica:
+        res.headers['ETag'] = etag
+
+
+def bump_users(session: Session, user_ids: Iterable[uuid.UUID]) -> None:
+    """Moves the change version of each user forward.
+
+    Runs in the transaction of the write that changed their recipients,
+    conversations or messages, so every worker process sees the new
+    version as soon as the write is visible.
+    """
+    session.execute(
+        update(Users)
+        .where(Users.user_id.in_(set(user_ids)))
+        .values(change_version=Users.change_version + 1)
+    )
+
+
+def bump_peers(session: Session, user_id: uuid.UUID) -> None:
+    """Moves the change version of everyone with a conversation with `user_id` forward."""
+    session.execute(
+        update(Users)
+        .where(Users.user_id.in_(
+            select(Conversations.user_id).where(Conversations.peer_id == user_id)
+        ))
+        .values(change_version=Users.change_version + 1)
+    )
@@ -1,8 +1,11 @@
 import asyncio
 import logging
+import time
 
 from fastapi import WebSocket, WebSocketDisconnect, status
 
+from . import metrics
+
 logger: logging.Logger = logging.getLogger("chatinterface_server")
 
 
@@ -23,6 +26,13 @@ class WebsocketClients:
 
         session_dict[token].append(websocket)
 
+    def connection_count(self) -> int:
+        return sum(
+            len(ws_list)
+            for session_dict in self.clients.values()
+            for ws_list in session_dict.values()
+        )
+
     def check_client_disconnected(self, websocket: WebSocket):
         return websocket in self.dropped_clients
 
@@ -48,8 +58,12 @@ class WebsocketClients:
         }
         session_dict = self.clients[username]
 
+        fanout: int = 0
+        broadcast_start: float = time.perf_counter()
+
         for token, ws_list in session_dict.items():
             for ws in ws_list:
+                fanout += 1
                 connecting_host: str = f"{ws.client.host}:{ws.client.port}"
                 try:
                     await ws.send_json(broadcasted_message)
@@ -59,6 +73,9 @@ class WebsocketClients:
                         connecting_host, token, exc_info=e
                     )
                     continue
+
+        metrics.broadcast_fanout.observe(fanout)
+        metrics.broadcast_duration.observe(time.perf_counter() - broadcast_start)
     
     async def disconnect_clients_by_token(
             self, username: str, token: str,
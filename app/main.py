@@ -1,33 +1,43 @@
+import atexit
 import logging
 
 from contextlib import asynccontextmanager
 from collections.abc import AsyncIterator
 
-from fastapi import FastAPI, APIRouter
-from fastapi.responses import RedirectResponse
+from fastapi import FastAPI, APIRouter, Request
+from fastapi.responses import RedirectResponse, PlainTextResponse, JSONResponse
 
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
 from .internal.config import ConfigManager, settings
-from .internal.database import database
+from .internal.constants import DBReturnCodes, WebsocketMessages
+from .internal.database import database, LazySession
+from .internal.executor import ExecutorOverloaded
+from .internal.loopmonitor import LoopLagMonitor
+from .internal import metrics
+from .internal.middleware import RequestInstrumentation
 from .internal.ws import WebsocketClients
 
 from .models.common import AppState
-from .routers import auth, chats, frontend, ws, users
+from .models.chats import ReadState
+from .routers import auth, chats, frontend, ws, users, stats
 
 from .version import __version__
 
 config: ConfigManager = ConfigManager()
 config.setup_logging()
 
+# Listener threads are daemons, stopping them flushes what is still queued
+atexit.register(config.stop_logging)
+
 logger: logging.Logger = logging.getLogger("chatinterface_server")
 
 
 @asynccontextmanager
 async def app_lifespan(app: FastAPI) -> AsyncIterator[AppState]:
     try:
-        await database.setup()
+        await database.setup(config)
     except Exception:
         logger.exception("Database connection setup failed:")
         raise
@@ -35,6 +45,27 @@ async def app_lifespan(app: FastAPI) -> AsyncIterator[AppState]:
     templates = Jinja2Templates(directory=settings.TEMPLATES_DIR)
     ws_clients: WebsocketClients = WebsocketClients()
 
+    async def broadcast_read_states(states: list[tuple[str, ReadState]]) -> None:
+        for username, state in states:
+            await ws_clients.broadcast_message(
+                username, WebsocketMessages.READ_UPDATE,
+                state.model_dump(mode='json')
+            )
+
+    database.messages.read_markers.listeners.append(broadcast_read_states)
+
+    # Deletions interrupted by the last shutdown continue where they stopped
+    for user_id in await database.users.get_pending_deletions(LazySession()):
+        database.users.deletions.submit(user_id)
+
+    loop_monitor: LoopLagMonitor | None = None
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor = LoopLagMonitor(
+            settings.LOOP_MONITOR_INTERVAL_MS / 1000,
+            settings.LOOP_MONITOR_THRESHOLD_MS / 1000
+        )
+        loop_monitor.start()
+
     app.mount("/static", StaticFiles(directory=settings.STATIC_DIR), name="static")
     logger.info("Application started, running version '%s'" , __version__)
 
@@ -45,6 +76,12 @@ async def app_lifespan(app: FastAPI) -> AsyncIterator[AppState]:
     }
     yield app_state
 
+    if loop_monitor is not None:
+        await loop_monitor.stop()
+
+    await database.messages.read_markers.close()
+    await database.users.deletions.close()
+
     try:
         database.close()
     except Exception:
@@ -79,11 +116,58 @@ api_routers.include_router(chats.router)
 api_routers.include_router(ws.router) 
 
 api_routers.include_router(users.router)
+api_routers.include_router(stats.router)
 
 app.include_router(api_routers)
 app.include_router(frontend.router)
 
 
+@app.exception_handler(ExecutorOverloaded)
+async def executor_overloaded_handler(request: Request, exc: ExecutorOverloaded) -> JSONResponse:
+    logger.warning("Rejected request to %s: %s", request.url.path, exc)
+    return JSONResponse(
+        status_code=503,
+        content={'detail': "Server busy, try again later"},
+        headers={'Retry-After': str(settings.DB_OVERLOAD_RETRY_AFTER)}
+    )
+
+
+async def is_first_user(request: Request) -> bool:
+    token: str | None = request.cookies.get('x_auth_cookie')
+    if not token:
+        return False
+
+    session_info: dict | str = await database.users.get_session_info(LazySession(), token)
+
+    if session_info == DBReturnCodes.INVALID_SESSION or session_info['expired']:
+        return False
+
+    return session_info['username'] == settings.FIRST_USER_NAME
+
+
+app.add_middleware(
+    RequestInstrumentation,
+    config=config,
+    can_profile=is_first_user,
+    query_headers=settings.ENVIRONMENT == 'local' or settings.QUERY_DEBUG_HEADERS
+)
+
+
 @app.get('/')
 async def root_path():
     return RedirectResponse('/frontend')
+
+
+if settings.ENVIRONMENT == 'local' or settings.METRICS_ENABLED:
+    @app.get('/metrics', include_in_schema=False)
+    async def get_metrics(req: Request) -> PlainTextResponse:
+        state: AppState = req.state
+
+        metrics.websocket_connections.set(state.ws_clients.connection_count())
+        metrics.update_pool_metrics(database.engine.pool)
+        metrics.db_executor_pending.set(database.executor.pending)
+
+        if database.message_cache is not None:
+            metrics.update_cache_metrics(database.message_cache.stats())
+
+        return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
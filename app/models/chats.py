@@ -1,6 +1,6 @@
 import uuid
-from typing import Annotated
-from pydantic import BaseModel, Field
+from typing import Annotated, NamedTuple
+from pydantic import BaseModel, Field, NonNegativeInt
 from .common import UsernameField
 
 MessageDataField = Annotated[str, Field(max_length=2000, min_length=1)]
@@ -25,3 +25,48 @@ class MessagesGetPublic(BaseModel):
     message_data: MessageDataField
     send_date: Annotated[str, Field(description="Datetime in YYYY-MM-DD H:M:S.ffffff format.")] 
     message_id: uuid.UUID
+
+
+class MessageContext(BaseModel):
+    messages: Annotated[list[MessagesGetPublic], Field(description="Newest first, including the requested message.")]
+    older_cursor: Annotated[uuid.UUID | None, Field(description="Pass as `before` to /messages for older messages.")]
+    newer_cursor: Annotated[uuid.UUID | None, Field(description="Pass as `after` to /messages for newer messages.")]
+
+
+class ConversationPublic(BaseModel):
+    peer_name: UsernameField
+    last_message_id: uuid.UUID
+    last_sender_name: UsernameField
+    last_message_preview: str
+    last_message_date: Annotated[str, Field(description="Datetime in YYYY-MM-DD H:M:S format.")]
+    unread_count: NonNegativeInt
+    last_read_message_id: uuid.UUID | None
+
+
+class MarkRead(BaseModel):
+    peer: UsernameField
+    message_id: Annotated[uuid.UUID, Field(description="Newest message the user has seen in the conversation.")]
+
+
+class ReadState(BaseModel):
+    peer_name: UsernameField
+    last_read_message_id: uuid.UUID
+    unread_count: NonNegativeInt
+
+
+class MessageSearchResult(MessagesGetPublic):
+    snippet: str
+    highlights: Annotated[list[tuple[int, int]], Field(description="Start and end offsets of matched terms in the snippet.")]
+    score: float
+
+
+class MessageSearchPage(BaseModel):
+    results: list[MessageSearchResult]
+    next_cursor: str | None
+
+
+# Returned by the message write methods, read before commit so nothing is reloaded afterwards
+class MessageWriteResult(NamedTuple):
+    message_id: uuid.UUID
+    sender_name: str
+    recipient_name: str
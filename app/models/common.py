@@ -1,4 +1,6 @@
 import typing
+import uuid
+
 from typing import Annotated, NamedTuple
 from pydantic import BaseModel, Field
 
@@ -11,7 +13,9 @@ if typing.TYPE_CHECKING:
 UsernameField = Annotated[str, Field(max_length=20, min_length=1)]
 
 class UserInfo(BaseModel):
+    user_id: uuid.UUID
     username: str
+    change_version: int
     created_at: str
     expired: bool
     token: str
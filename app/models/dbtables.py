@@ -2,29 +2,75 @@ import uuid
 import secrets
 
 from datetime import datetime
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.mysql import BINARY
 from sqlmodel import Relationship, SQLModel, Field
 
+from ..internal.uuids import uuid7
+
+
+class BinaryUUID(sa.TypeDecorator):
+    """UUID stored as BINARY(16) on MariaDB, uses the generic `sa.Uuid` type elsewhere.
+
+    `sa.Uuid` is stored as CHAR(32) on MariaDB, which doubles the size of the
+    primary key and of every secondary index that carries it.
+    """
+    impl = sa.Uuid
+    cache_ok = True
+
+    def _is_mysql(self, dialect: sa.Dialect) -> bool:
+        return dialect.name in ('mysql', 'mariadb')
+
+    def load_dialect_impl(self, dialect: sa.Dialect):
+        if self._is_mysql(dialect):
+            return dialect.type_descriptor(BINARY(16))
+
+        return dialect.type_descriptor(sa.Uuid())
+
+    def process_bind_param(self, value, dialect: sa.Dialect):
+        if value is None or not self._is_mysql(dialect):
+            return value
+
+        if not isinstance(value, uuid.UUID):
+            value = uuid.UUID(str(value))
+
+        return value.bytes
+
+    def process_result_value(self, value, dialect: sa.Dialect):
+        if value is None or not self._is_mysql(dialect):
+            return value
+
+        return uuid.UUID(bytes=value)
+
 
 class UserBase(SQLModel, table=False):
     user_id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     username: str = Field(max_length=20, nullable=False, unique=True, index=True)
     hashed_password: str = Field(max_length=100, nullable=False)
 
+    # Set when deletion starts, the row stays until its messages are deleted in the background
+    disabled: bool = Field(default=False, sa_column_kwargs={'server_default': sa.false()})
+
+    # Bumped by every write that changes what the user can list, used for ETags
+    change_version: int = Field(default=0, sa_column_kwargs={'server_default': '0'})
+
 
 class Users(UserBase, table=True):
+    # Loaded on access only, eager loading pulled every session and message with each user lookup
     sessions: list['UserSessions'] = Relationship(
         back_populates='user', 
-        sa_relationship_kwargs={'lazy': 'selectin'},
+        sa_relationship_kwargs={'lazy': 'select'},
         passive_deletes='all'
     )
     sender_messages: list['Messages']= Relationship(
         back_populates='sender', 
-        sa_relationship_kwargs={'lazy': 'selectin', 'foreign_keys': '[Messages.sender_id]'},
+        sa_relationship_kwargs={'lazy': 'select', 'foreign_keys': '[Messages.sender_id]'},
         passive_deletes='all'
     )
     recipient_messages: list['Messages']= Relationship(
         back_populates='recipient', 
-        sa_relationship_kwargs={'lazy': 'selectin', 'foreign_keys': '[Messages.recipient_id]'},
+        sa_relationship_kwargs={'lazy': 'select', 'foreign_keys': '[Messages.recipient_id]'},
         passive_deletes='all'
     )
 
@@ -48,7 +94,13 @@ class UserSessions(SQLModel, table=True):
 
 # Uses two foreign keys tied to the Users table
 class Messages(SQLModel, table=True):
-    message_id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    # Covers every query scoped to one conversation, newest message last
+    __table_args__ = (
+        sa.Index('ix_messages_conversation', 'sender_id', 'recipient_id', 'message_id'),
+    )
+
+    # Time-ordered so inserts append to the clustered index, also used as the pagination cursor
+    message_id: uuid.UUID = Field(default_factory=uuid7, primary_key=True, sa_type=BinaryUUID)
     sender_id: uuid.UUID = Field(foreign_key='users.user_id', ondelete='CASCADE')
 
     recipient_id: uuid.UUID = Field(foreign_key='users.user_id', ondelete='CASCADE')
@@ -64,3 +116,30 @@ class Messages(SQLModel, table=True):
         back_populates='recipient_messages',
         sa_relationship_kwargs={'lazy': 'selectin', 'foreign_keys': '[Messages.recipient_id]'},
     )
+
+
+# One row per user and peer, kept current by every message write so listing
+# conversations never scans messages
+class Conversations(SQLModel, table=True):
+    __table_args__ = (
+        sa.Index('ix_conversations_recent', 'user_id', 'last_message_id'),
+    )
+
+    user_id: uuid.UUID = Field(foreign_key='users.user_id', primary_key=True, ondelete='CASCADE')
+    peer_id: uuid.UUID = Field(foreign_key='users.user_id', primary_key=True, ondelete='CASCADE')
+
+    last_message_id: uuid.UUID = Field(sa_type=BinaryUUID)
+    unread_count: int = Field(default=0)
+
+    # Newest message the user has seen, None until they read or reply
+    last_read_message_id: uuid.UUID | None = Field(default=None, sa_type=BinaryUUID, nullable=True)
+
+
+# Progress of background user deletions, kept after the user row is gone
+class UserDeletions(SQLModel, table=True):
+    user_id: uuid.UUID = Field(primary_key=True)
+    username: str = Field(max_length=20, index=True)
+
+    requested_at: datetime = Field(default_factory=datetime.now)
+    finished_at: datetime | None = Field(default=None, nullable=True)
+    messages_deleted: int = Field(default=0)
@@ -1,8 +1,16 @@
 from typing import Annotated
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, NonNegativeInt
 from .common import UsernameField
 
 
 class AddUser(BaseModel):
     username: UsernameField
     password: Annotated[str, Field(max_length=100, min_length=1)]
+
+
+class UserDeletionStatus(BaseModel):
+    username: UsernameField
+    requested_at: Annotated[str, Field(description="Datetime in YYYY-MM-DD H:M:S format.")]
+    finished_at: Annotated[str | None, Field(description="Datetime in YYYY-MM-DD H:M:S format, None while running.")]
+    messages_deleted: NonNegativeInt
+    conversations_remaining: Annotated[NonNegativeInt, Field(description="Conversations that still have messages to delete.")]
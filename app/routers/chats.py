@@ -4,41 +4,97 @@ import uuid
 from typing import Annotated
 from datetime import datetime
 
-from fastapi import APIRouter, HTTPException, Request, Query
+from fastapi import APIRouter, Header, HTTPException, Request, Response, Query
 from pydantic import NonNegativeInt, PositiveInt
 
-from ..models.dbtables import Users
 from ..models.common import AppState
-from ..models.chats import ComposeMessage, EditMessage, SendMessage, MessagesGetPublic
+from ..models.chats import (
+    ComposeMessage, EditMessage, SendMessage, ConversationPublic,
+    MarkRead, MessageContext, MessagesGetPublic, MessageSearchPage, MessageWriteResult
+)
 from ..models.ws import MessageDelete, MessageUpdate
 
 from ..dependencies import HttpAuthDep, SessionDep
 from ..internal.database import database
 from ..internal.constants import WebsocketMessages, DBReturnCodes
+from ..internal.replicas import track_reads
+from ..internal.versions import etag_matches, set_etag, user_etag
+from ..internal.search import decode_cursor, query_terms
 
 router = APIRouter(prefix="/chats", tags=['chats'])
 logger: logging.Logger = logging.getLogger("chatinterface_server")
 
 
 @router.get("/recipients")
-async def get_chat_relations(user: HttpAuthDep, session: SessionDep) -> set[str]:
-    recipients: set[str] = await database.messages.get_chat_relations(session, user.username)
+async def get_chat_relations(
+    user: HttpAuthDep, session: SessionDep, res: Response,
+    if_none_match: Annotated[str | None, Header()] = None
+) -> set[str]:
+    # Version was read with the session before querying, a write during the query makes the next request refetch
+    etag: str = user_etag(user.user_id, user.change_version)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': 'private, no-cache'})
+
+    with track_reads() as reads:
+        recipients: set[str] = await database.messages.get_chat_relations(session, user.username)
+
+    set_etag(res, etag, reads.replica)
     return recipients
 
 
+@router.get("/conversations")
+async def get_conversations(
+    user: HttpAuthDep, session: SessionDep, res: Response,
+    amount: int = Query(50, ge=1, le=200, description="Amount of conversations to fetch, most recent first"),
+    before: uuid.UUID | None = Query(None, description="Only fetch conversations last active before this message ID"),
+    if_none_match: Annotated[str | None, Header()] = None
+) -> list[ConversationPublic]:
+    etag: str = user_etag(user.user_id, user.change_version)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': 'private, no-cache'})
+
+    with track_reads() as reads:
+        conversations: list[ConversationPublic] = await database.messages.get_conversations(
+            session, user.username, 
+            amount=amount, before=before
+        )
+
+    set_etag(res, etag, reads.replica)
+    return conversations
+
+
+@router.post("/read", status_code=202)
+async def mark_read(data: MarkRead, user: HttpAuthDep) -> dict:
+    if data.peer == user.username:
+        raise HTTPException(status_code=400, detail="Cannot mark own messages as read")
+
+    # Coalesced and written in the background, the new state is broadcast as read.update
+    database.messages.mark_read(user.username, data.peer, data.message_id)
+    return {'success': True}
+
+
 @router.get("/messages")
 async def get_previous_messages(
-    user: HttpAuthDep, session: SessionDep,
+    user: HttpAuthDep, session: SessionDep, res: Response,
     recipient: Annotated[str, Query(description="Recipient username", max_length=20, strict=True)],
 
     amount: PositiveInt = Query(100, description="Amount of messages to fetch (fetches latest messages)"),
-    offset: NonNegativeInt = Query(0, description="Offset of messages starting from latest")
+    offset: NonNegativeInt = Query(0, description="Offset of messages starting from latest"),
+    before: uuid.UUID | None = Query(None, description="Only fetch messages older than this message ID"),
+    after: uuid.UUID | None = Query(None, description="Only fetch messages newer than this message ID, the ones right after it"),
+    if_none_match: Annotated[str | None, Header()] = None
 ) -> list[MessagesGetPublic]:
-    result: list[MessagesGetPublic] | str = await database.messages.get_messages(
-        session, user.username,
-        recipient, amount=amount, 
-        offset=offset
-    )
+    etag: str = user_etag(user.user_id, user.change_version)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': 'private, no-cache'})
+
+    with track_reads() as reads:
+        result: list[MessagesGetPublic] | str = await database.messages.get_messages(
+            session, user.username,
+            recipient, amount=amount, 
+            offset=offset, before=before, 
+            after=after
+        )
     match result:
         case list():
             pass
@@ -48,9 +104,29 @@ async def get_previous_messages(
             logger.error("Unexpected data while fetching messages: %s", result)
             raise HTTPException(status_code=500, detail="Server error")
 
+    set_etag(res, etag, reads.replica)
     return result
 
 
+@router.get('/search')
+async def search_messages(
+    user: HttpAuthDep, session: SessionDep,
+    q: Annotated[str, Query(description="Words to search for, every word has to match", min_length=1, max_length=200)],
+    amount: int = Query(20, ge=1, le=100, description="Amount of results to return"),
+    cursor: str | None = Query(None, description="next_cursor of the previous page")
+) -> MessageSearchPage:
+    terms: list[str] = query_terms(q)
+    if not terms:
+        raise HTTPException(status_code=422, detail="Search query has no searchable words")
+
+    try:
+        decoded_cursor: tuple[float, uuid.UUID] | None = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid search cursor")
+
+    return await database.messages.search_messages(session, user.username, terms, amount, decoded_cursor)
+
+
 @router.get('/user_exists')
 async def check_user_exists(
     username: Annotated[str, Query(description="Username to check", max_length=20, strict=True)],
@@ -195,35 +271,60 @@ async def get_message(message_id: uuid.UUID, user: HttpAuthDep, session: Session
     return message_data
 
 
+@router.get('/message/{message_id}/context')
+async def get_message_context(
+    message_id: uuid.UUID, user: HttpAuthDep, session: SessionDep,
+    amount: int = Query(25, ge=1, le=100, description="Amount of messages to fetch on each side of the message")
+) -> MessageContext:
+    result: str | MessageContext = await database.messages.get_message_context(
+        session, user.username, 
+        message_id, amount=amount
+    )
+
+    match result:
+        case MessageContext():
+            pass
+        case DBReturnCodes.INVALID_MESSAGE:
+            raise HTTPException(status_code=404, detail="Invalid message ID provided")
+        case _:
+            logger.error(
+                "Fetching context of message ID [%s] failed due to unexpected result: %s",
+                message_id, result
+            )
+            raise HTTPException(status_code=500, detail="Server error")
+
+    return result
+
+
 @router.delete('/message/{message_id}')
 async def delete_message(
     message_id: uuid.UUID, req: Request,
     user: HttpAuthDep, session: SessionDep
 ) -> dict:
     state: AppState = req.state
-    recipient: str | Users = await database.messages.delete_message(session, user.username, message_id)
+    result: str | MessageWriteResult = await database.messages.delete_message(session, user.username, message_id)
 
-    match recipient:
-        case Users():
+    match result:
+        case MessageWriteResult():
             pass
         case DBReturnCodes.INVALID_MESSAGE:
             raise HTTPException(status_code=404, detail="Invalid message ID or not message owner")
         case _: 
             logger.error(
                 "Deleting message ID [%s] failed due to unexpected result: %s", 
-                message_id, recipient
+                message_id, result
             )
             raise HTTPException(status_code=500, detail="Server error")
 
     model_payload: MessageDelete = MessageDelete(
         sender_name=user.username,
-        recipient_name=recipient.username,
+        recipient_name=result.recipient_name,
         message_id=str(message_id)
     )
     dumped_model = model_payload.model_dump(mode='json')
 
     await state.ws_clients.broadcast_message(
-        recipient.username, WebsocketMessages.MESSAGE_DELETE,
+        result.recipient_name, WebsocketMessages.MESSAGE_DELETE,
         dumped_model
     )
     await state.ws_clients.broadcast_message(
@@ -240,31 +341,31 @@ async def edit_message(
     session: SessionDep
 ) -> dict:
     state: AppState = req.state
-    recipient: str | Users = await database.messages.edit_message(
+    result: str | MessageWriteResult = await database.messages.edit_message(
         session, user.username, 
         message_id, data.message_data
     )
 
-    match recipient:
-        case Users():
+    match result:
+        case MessageWriteResult():
             pass
         case DBReturnCodes.INVALID_MESSAGE:
             raise HTTPException(status_code=404, detail="Invalid message ID provided")
         case _: 
-            logger.error("Editing message ID [%s] failed due to unexpected result: %s", message_id, recipient)
+            logger.error("Editing message ID [%s] failed due to unexpected result: %s", message_id, result)
             raise HTTPException(status_code=500, detail="Server error")
 
     # seems too much for just one item but this is to make it easier to expand next time
     model_payload: MessageUpdate = MessageUpdate(
         message_data=data.message_data,
         sender_name=user.username,
-        recipient_name=recipient.username,
+        recipient_name=result.recipient_name,
         message_id=str(message_id)
     )
     dumped_model = model_payload.model_dump(mode='json')
 
     await state.ws_clients.broadcast_message(
-        recipient.username, WebsocketMessages.MESSAGE_UPDATE,
+        result.recipient_name, WebsocketMessages.MESSAGE_UPDATE,
         dumped_model
     )
     await state.ws_clients.broadcast_message(
@@ -0,0 +1,35 @@
+import logging
+from fastapi import APIRouter, HTTPException
+
+from ..dependencies import HttpAuthDep
+from ..internal.config import settings
+from ..internal.database import database
+from ..internal import metrics
+
+router = APIRouter(prefix="/stats", tags=['stats'])
+logger: logging.Logger = logging.getLogger('chatinterface_server')
+
+
+@router.get('/executor')
+async def get_executor_stats(user: HttpAuthDep) -> dict:
+    if user.username != settings.FIRST_USER_NAME:
+        logger.warning("Unauthorized access attempted by user %s", user.username)
+        raise HTTPException(status_code=401, detail="Session token invalid")
+
+    wait_totals: dict = metrics.db_executor_wait.totals()
+    run_totals: dict = metrics.db_executor_run.totals()
+
+    functions: dict[str, dict] = {}
+    for (func_name,), (calls, wait_sum) in sorted(wait_totals.items()):
+        _, run_sum = run_totals.get((func_name,), (0, 0.0))
+        functions[func_name] = {
+            'calls': calls,
+            'avg_wait_ms': round(wait_sum / calls * 1000, 3),
+            'avg_run_ms': round(run_sum / calls * 1000, 3)
+        }
+
+    return {
+        **database.executor.stats(),
+        'pool': database.engine.pool.status(),
+        'functions': functions
+    }
@@ -7,7 +7,7 @@ from ..internal.database import database
 from ..internal.constants import WebsocketMessages, DBReturnCodes
 
 from ..models.common import AppState, UsernameField
-from ..models.users import AddUser
+from ..models.users import AddUser, UserDeletionStatus
 
 router = APIRouter(prefix="/users", tags=['users'])
 logger: logging.Logger = logging.getLogger('chatinterface_server')
@@ -34,7 +34,7 @@ async def add_user(
     return {'success': True}
 
 
-@router.delete('/{username}')
+@router.delete('/{username}', status_code=202)
 async def delete_user(username: UsernameField, user: HttpAuthDep, req: Request, session: SessionDep) -> dict:
     state: AppState = req.state
     # may change to roles in the future
@@ -61,6 +61,24 @@ async def delete_user(username: UsernameField, user: HttpAuthDep, req: Request,
     return {'success': True}
 
 
+@router.get('/{username}/deletion')
+async def get_deletion_status(username: UsernameField, user: HttpAuthDep, session: SessionDep) -> UserDeletionStatus:
+    if user.username != settings.FIRST_USER_NAME:
+        logger.warning("Unauthorized access attempted by user %s", user.username)
+        raise HTTPException(status_code=401, detail="Session token invalid")
+
+    status: str | UserDeletionStatus = await database.users.get_deletion_status(session, username)
+    match status:
+        case UserDeletionStatus():
+            pass
+        case DBReturnCodes.NO_USER:
+            raise HTTPException(status_code=404, detail="No deletion found for user")
+        case _:
+            raise HTTPException(status_code=500, detail="Server error")
+
+    return status
+
+
 @router.get('/')
 async def get_users(user: HttpAuthDep, session: SessionDep) -> list[str]:
     if user.username != settings.FIRST_USER_NAME:
@@ -8,8 +8,10 @@ from pydantic import ValidationError
 
 from ..models.common import UserInfo, AppState
 from ..models.ws import MessageData
+from ..models.chats import MarkRead
 
 from ..dependencies import get_session_info_ws
+from ..internal.database import database
 
 router: APIRouter = APIRouter(prefix="/ws", tags=['websocket'])
 logger: logging.Logger = logging.getLogger("chatinterface_server")
@@ -55,6 +57,18 @@ async def create_websocket(websocket: WebSocket, session: Annotated[UserInfo, De
                 })
                 continue
 
+            if loaded_msg.message == 'read.mark':
+                try:
+                    marker: MarkRead = MarkRead(**loaded_msg.data)
+                except ValidationError:
+                    await websocket.close(code=1008, reason="INVALID_DATA")
+                    return
+
+                if marker.peer != session.username:
+                    database.messages.mark_read(session.username, marker.peer, marker.message_id)
+
+                continue
+
             await websocket.close(code=1008, reason="SEND_UNSUPPORTED")
     except WebSocketDisconnect as e:
         code: int = e.code
@@ -0,0 +1,299 @@
+"""Micro-benchmarks for every public coroutine on `UserMethods` and `ChatMethods`.
+
+Each call is timed and its SQL statements are counted against a file-backed
+SQLite database (the same `override_engine` approach `tests/conftest.py`
+uses), at several dataset sizes. Not collected by the normal test run,
+start it explicitly:
+
+    pytest benchmarks/bench_database.py
+
+Environment variables:
+    BENCH_SAVE=1          write the results as the new baseline
+    BENCH_BASELINE=path   baseline file (default benchmarks/baselines/database.json)
+    BENCH_TIMING=1        also fail on slower medians, off by default
+    BENCH_THRESHOLD=0.25  allowed relative slowdown of the median
+    BENCH_MIN_MS=2.0      slowdowns below this many milliseconds never fail
+    BENCH_ROUNDS=10       calls per benchmark
+
+Any increase in the query count of a call fails against the baseline.
+Timings depend on the host and sub-millisecond medians are mostly noise,
+so they are only compared with BENCH_TIMING=1, against a baseline saved
+on the same host.
+"""
+import json
+import os
+import statistics
+import uuid
+
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+import sqlalchemy as sa
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.internal import conversations
+from app.internal.config import ConfigManager
+from app.internal.database import MainDatabase
+from app.internal.uuids import uuid7_from_datetime
+from app.models.dbtables import Messages, Users
+
+from .common import QueryCounter, Timer
+
+SIZES: list[int] = [100, 1_000, 10_000]
+ROUNDS: int = int(os.environ.get('BENCH_ROUNDS', 10))
+THRESHOLD: float = float(os.environ.get('BENCH_THRESHOLD', 0.25))
+MIN_SLOWDOWN_MS: float = float(os.environ.get('BENCH_MIN_MS', 2.0))
+CHECK_TIMING: bool = os.environ.get('BENCH_TIMING') == '1'
+
+BASELINE_PATH: Path = Path(os.environ.get('BENCH_BASELINE', 'benchmarks/baselines/database.json'))
+SAVE_BASELINE: bool = os.environ.get('BENCH_SAVE') == '1'
+
+RESULTS: dict[str, dict] = {}
+BASELINE: dict[str, dict] = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.is_file() else {}
+
+pytestmark = pytest.mark.anyio
+
+
+@dataclass
+class BenchContext:
+    database: MainDatabase
+    engine: sa.Engine
+    size: int
+
+    token: str = ''
+    revoke_token: str = ''
+    message_ids: list[uuid.UUID] = field(default_factory=list)
+    received_id: uuid.UUID | None = None
+
+
+@dataclass
+class BenchCase:
+    name: str
+    call: Callable[[BenchContext, Session, int], Awaitable]
+    
+    # Runs outside the measurement, for calls that consume rows
+    prepare: Callable[[BenchContext, Session, int], Awaitable] | None = None
+
+
+@pytest.fixture(scope='module')
+def anyio_backend():
+    return 'asyncio'
+
+
+@pytest.fixture(scope='module', params=SIZES, ids=lambda size: f"{size}msgs")
+async def bench_context(request, tmp_path_factory) -> BenchContext:
+    size: int = request.param
+    tmp_dir: Path = tmp_path_factory.mktemp(f"bench_{size}")
+
+    engine: sa.Engine = create_engine(f"sqlite:///{tmp_dir / 'bench.db'}")
+    SQLModel.metadata.create_all(engine)
+
+    database: MainDatabase = MainDatabase(engine)
+    await database.setup(ConfigManager(str(tmp_dir / 'config')))
+
+    # Every get_messages call runs its queries, a cache hit would hide the SQL path
+    database.message_cache = database.messages.cache = None
+
+    context: BenchContext = BenchContext(database, engine, size)
+    with Session(engine) as session:
+        for username in ('bench_alice', 'bench_bob'):
+            await database.users.add_user(session, username, username)
+
+        user_ids: dict[str, uuid.UUID] = dict(session.exec(sa.select(Users.username, Users.user_id)).all())
+        start: datetime = datetime.now() - timedelta(days=30)
+
+        rows: list[dict] = []
+        for i in range(size):
+            send_date: datetime = start + timedelta(seconds=i * 10)
+            sender, recipient = ('bench_alice', 'bench_bob') if i % 2 else ('bench_bob', 'bench_alice')
+
+            rows.append({
+                'message_id': uuid7_from_datetime(send_date),
+                'sender_id': user_ids[sender],
+                'recipient_id': user_ids[recipient],
+                'send_date': send_date,
+                'message_data': f"Message {i}"
+            })
+
+        session.execute(sa.insert(Messages), rows)
+        conversations.rebuild(session.connection(), 5000)
+        session.commit()
+
+        expires_on: str = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S")
+        context.token = await database.users.create_session(session, 'bench_alice', expires_on)
+
+    yield context
+
+    database.close()
+
+
+@pytest.fixture(scope='module', autouse=True)
+def write_results():
+    yield
+
+    results_path: Path = Path('benchmarks/results/database.json')
+    results_path.parent.mkdir(parents=True, exist_ok=True)
+    results_path.write_text(json.dumps(RESULTS, indent=4))
+
+    if SAVE_BASELINE:
+        BASELINE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        BASELINE_PATH.write_text(json.dumps(RESULTS, indent=4))
+
+
+def expires_tomorrow() -> str:
+    return (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+async def store_own_message(ctx: BenchContext, session: Session, i: int) -> uuid.UUID:
+    message_id: uuid.UUID = await ctx.database.messages.store_message(session, 'bench_alice', 'bench_bob', f"Own {i}")
+    ctx.message_ids.append(message_id)
+
+    return message_id
+
+
+CASES: list[BenchCase] = [
+    # UserMethods
+    BenchCase('add_user', lambda ctx, s, i: ctx.database.users.add_user(s, f"bench_new_{i}", 'password')),
+    BenchCase(
+        'delete_user', 
+        lambda ctx, s, i: ctx.database.users.delete_user(s, f"bench_del_{i}"),
+        prepare=lambda ctx, s, i: ctx.database.users.add_user(s, f"bench_del_{i}", 'password')
+    ),
+    BenchCase('get_users', lambda ctx, s, i: ctx.database.users.get_users(s)),
+    BenchCase('verify_user', lambda ctx, s, i: ctx.database.users.verify_user(s, 'bench_alice', 'bench_alice')),
+    BenchCase('create_session', lambda ctx, s, i: ctx.database.users.create_session(s, 'bench_alice', expires_tomorrow())),
+    BenchCase('check_user_exists', lambda ctx, s, i: ctx.database.users.check_user_exists(s, 'bench_bob')),
+    BenchCase(
+        'revoke_session',
+        lambda ctx, s, i: ctx.database.users.revoke_session(s, ctx.revoke_token),
+        prepare=lambda ctx, s, i: _prepare_revoke(ctx, s)
+    ),
+    BenchCase('get_session_info', lambda ctx, s, i: ctx.database.users.get_session_info(s, ctx.token)),
+    BenchCase('check_session_expired', lambda ctx, s, i: ctx.database.users.check_session_expired(s, ctx.token)),
+    BenchCase('get_pending_deletions', lambda ctx, s, i: ctx.database.users.get_pending_deletions(s)),
+    BenchCase(
+        'get_deletion_status',
+        lambda ctx, s, i: ctx.database.users.get_deletion_status(s, 'bench_status'),
+        prepare=lambda ctx, s, i: _ensure_deletion(ctx, s)
+    ),
+
+    # ChatMethods
+    BenchCase('get_chat_relations', lambda ctx, s, i: ctx.database.messages.get_chat_relations(s, 'bench_alice')),
+    BenchCase('has_chat_relation', lambda ctx, s, i: ctx.database.messages.has_chat_relation(s, 'bench_alice', 'bench_bob')),
+    BenchCase('get_conversations', lambda ctx, s, i: ctx.database.messages.get_conversations(s, 'bench_alice')),
+    BenchCase('store_message', store_own_message),
+    BenchCase('get_messages', lambda ctx, s, i: ctx.database.messages.get_messages(s, 'bench_alice', 'bench_bob')),
+    BenchCase(
+        'get_messages_offset', 
+        lambda ctx, s, i: ctx.database.messages.get_messages(s, 'bench_alice', 'bench_bob', offset=ctx.size // 2)
+    ),
+    BenchCase(
+        'get_message', 
+        lambda ctx, s, i: ctx.database.messages.get_message(s, 'bench_alice', ctx.message_ids[0]),
+        prepare=lambda ctx, s, i: _ensure_own_message(ctx, s)
+    ),
+    BenchCase(
+        'get_message_context',
+        lambda ctx, s, i: ctx.database.messages.get_message_context(s, 'bench_alice', ctx.message_ids[0]),
+        prepare=lambda ctx, s, i: _ensure_own_message(ctx, s)
+    ),
+    BenchCase(
+        'search_messages',
+        lambda ctx, s, i: ctx.database.messages.search_messages(s, 'bench_alice', ['message'])
+    ),
+    # `mark_read` only queues the marker, this is the flush that writes it
+    BenchCase(
+        'apply_read_markers',
+        lambda ctx, s, i: ctx.database.messages.apply_read_markers(s, [('bench_alice', 'bench_bob', ctx.received_id)]),
+        prepare=lambda ctx, s, i: _receive_message(ctx, s, i)
+    ),
+    BenchCase(
+        'edit_message', 
+        lambda ctx, s, i: ctx.database.messages.edit_message(s, 'bench_alice', ctx.message_ids[0], f"Edited {i}"),
+        prepare=lambda ctx, s, i: _ensure_own_message(ctx, s)
+    ),
+    BenchCase(
+        'delete_message', 
+        lambda ctx, s, i: ctx.database.messages.delete_message(s, 'bench_alice', ctx.message_ids.pop()),
+        prepare=store_own_message
+    ),
+]
+
+
+async def _prepare_revoke(ctx: BenchContext, session: Session) -> None:
+    ctx.revoke_token = await ctx.database.users.create_session(session, 'bench_alice', expires_tomorrow())
+
+
+async def _ensure_own_message(ctx: BenchContext, session: Session) -> None:
+    if not ctx.message_ids:
+        await store_own_message(ctx, session, 0)
+
+
+async def _receive_message(ctx: BenchContext, session: Session, i: int) -> None:
+    # Every call moves the read marker forward to a new message
+    ctx.received_id = await ctx.database.messages.store_message(session, 'bench_bob', 'bench_alice', f"Reply {i}")
+
+
+async def _ensure_deletion(ctx: BenchContext, session: Session) -> None:
+    if await ctx.database.users.check_user_exists(session, 'bench_status'):
+        return
+
+    # Queued without starting the background batches, their queries would land in the measurement
+    await ctx.database.users.add_user(session, 'bench_status', 'password')
+    await ctx.database.users.disable_user(session, 'bench_status')
+
+
+@pytest.mark.parametrize('case', CASES, ids=lambda case: case.name)
+async def test_database_call(bench_context: BenchContext, case: BenchCase):
+    counter: QueryCounter = QueryCounter(bench_context.engine)
+    timings: list[float] = []
+    query_counts: list[int] = []
+
+    for i in range(ROUNDS):
+        # Fresh session per call, like a request
+        with Session(bench_context.engine) as session:
+            if case.prepare is not None:
+                await case.prepare(bench_context, session, i)
+
+        with Session(bench_context.engine) as session:
+            with counter, Timer() as timer:
+                await case.call(bench_context, session, i)
+
+        # delete_user leaves batches running in the background, they must not count towards later calls
+        deletions_task = bench_context.database.users.deletions.task
+        if deletions_task is not None:
+            await deletions_task
+
+        timings.append(timer.elapsed)
+        query_counts.append(counter.count)
+
+    counter.close()
+
+    key: str = f"{case.name}[{bench_context.size}]"
+    # Worst case query count, so a cache miss on the first call still counts
+    result: dict = {
+        'median_ms': round(statistics.median(timings) * 1000, 3),
+        'min_ms': round(min(timings) * 1000, 3),
+        'queries': max(query_counts)
+    }
+    RESULTS[key] = result
+
+    baseline: dict | None = BASELINE.get(key)
+    if baseline is None or SAVE_BASELINE:
+        return
+
+    assert result['queries'] <= baseline['queries'], (
+        f"{key} now runs {result['queries']} queries per call, baseline is {baseline['queries']}"
+    )
+
+    if not CHECK_TIMING:
+        return
+
+    allowed_ms: float = max(baseline['median_ms'] * (1 + THRESHOLD), baseline['median_ms'] + MIN_SLOWDOWN_MS)
+    assert result['median_ms'] <= allowed_ms, (
+        f"{key} median {result['median_ms']} ms is over {allowed_ms:.3f} ms "
+        f"(baseline {baseline['median_ms']} ms + {THRESHOLD:.0%}, at least {MIN_SLOWDOWN_MS} ms)"
+    )
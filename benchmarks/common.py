@@ -0,0 +1,95 @@
+import json
+import platform
+import time
+
+from datetime import datetime
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+
+    ordered: list[float] = sorted(samples)
+    index: int = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+
+    return ordered[index]
+
+
+def summarize(samples: list[float]) -> dict[str, float | int]:
+    """Latency summary in milliseconds, `samples` are in seconds."""
+    return {
+        'count': len(samples),
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p95_ms': round(percentile(samples, 95) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3),
+        'max_ms': round(max(samples, default=0.0) * 1000, 3)
+    }
+
+
+def write_results(path: str, name: str, config: dict, results: dict) -> None:
+    with open(path, 'w') as file:
+        json.dump({
+            'benchmark': name,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'host': platform.node(),
+            'python': platform.python_version(),
+            'config': config,
+            'results': results
+        }, file, indent=4)
+
+
+def compare_results(baseline_path: str, results: dict[str, dict]) -> list[str]:
+    """Lines describing how each p95 moved compared to a previous results file."""
+    with open(baseline_path, 'r') as file:
+        baseline: dict[str, dict] = json.load(file)['results']
+
+    lines: list[str] = []
+    for name, summary in results.items():
+        if name not in baseline or 'p95_ms' not in summary:
+            continue
+
+        old_p95: float = baseline[name]['p95_ms']
+        change: float = (summary['p95_ms'] - old_p95) / old_p95 * 100 if old_p95 else 0.0
+
+        lines.append(f"{name:40} p95 {old_p95:9.2f} -> {summary['p95_ms']:9.2f} ms ({change:+.1f}%)")
+
+    return lines
+
+
+class Timer:
+    def __enter__(self) -> 'Timer':
+        self.start: float = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.elapsed: float = time.perf_counter() - self.start
+
+
+class QueryCounter:
+    """Counts statements sent through an engine while active."""
+
+    def __init__(self, engine) -> None:
+        from sqlalchemy import event
+
+        self.engine = engine
+        self.count: int = 0
+        self.active: bool = False
+
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def close(self) -> None:
+        from sqlalchemy import event
+
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args) -> None:
+        if self.active:
+            self.count += 1
+
+    def __enter__(self) -> 'QueryCounter':
+        self.count = 0
+        self.active = True
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.active = False
@@ -22,6 +22,21 @@ from app.models.dbtables import SQLModel  # noqa
 from app.internal.config import settings # noqa
 
 target_metadata = SQLModel.metadata
+
+# Created with raw DDL by the search index migrations, autogenerate would drop them otherwise.
+# messages_fts also covers the FTS5 shadow tables and messages_fts_ids
+FULLTEXT_TABLE_PREFIX: str = 'messages_fts'
+FULLTEXT_INDEXES: set[str] = {'ix_messages_message_data_fulltext'}
+
+
+def include_object(object, name, type_, reflected, compare_to) -> bool:
+    if not reflected or compare_to is not None:
+        return True
+
+    if type_ == 'table' and name.startswith(FULLTEXT_TABLE_PREFIX):
+        return False
+
+    return not (type_ == 'index' and name in FULLTEXT_INDEXES)
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -46,6 +61,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -70,8 +86,11 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
+        # SQLite can only alter tables by copying them
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            render_as_batch=connection.dialect.name == 'sqlite',
+            include_object=include_object
         )
 
         with context.begin_transaction():
@@ -0,0 +1,112 @@
+"""Time-ordered message IDs
+
+Revision ID: 7f3a91c2d4e8
+Revises: 2cde6b73ab54
+Create Date: 2026-10-19 10:12:41.207315
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+from app.internal.uuids import uuid7_from_datetime
+from app.models.dbtables import BinaryUUID
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f3a91c2d4e8'
+down_revision: Union[str, None] = '2cde6b73ab54'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE: int = 5000
+
+
+def _backfill_ids(id_column: str) -> None:
+    """Writes a version 7 UUID derived from `send_date` into `id_column` for every message.
+
+    Messages are read in keyset pages on the old ID, so memory is bounded by
+    BATCH_SIZE instead of the table size.
+    """
+    bind = op.get_bind()
+    columns: list[sa.ColumnClause] = [
+        sa.column('message_id', sa.Uuid()),
+        sa.column('send_date', sa.DateTime())
+    ]
+    if id_column != 'message_id':
+        columns.append(sa.column(id_column, BinaryUUID()))
+
+    messages = sa.table('messages', *columns)
+    update_statement = (
+        sa.update(messages)
+        .where(messages.c.message_id == sa.bindparam('old_id'))
+        .values({id_column: sa.bindparam('new_id')})
+    )
+    page_statement = (
+        sa.select(messages.c.message_id, messages.c.send_date)
+        .order_by(messages.c.message_id)
+        .limit(BATCH_SIZE)
+    )
+    last_id = None
+
+    while True:
+        statement = page_statement
+        if last_id is not None:
+            statement = statement.where(messages.c.message_id > last_id)
+
+        rows = bind.execute(statement).all()
+        if not rows:
+            return
+
+        last_id = rows[-1][0]
+
+        # Rewritten in place, an ID can move ahead of the page and be read again
+        batch = [
+            {'old_id': message_id, 'new_id': uuid7_from_datetime(send_date)}
+            for message_id, send_date in rows
+            if id_column != 'message_id' or message_id.version != 7
+        ]
+        if batch:
+            bind.execute(update_statement, batch)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name not in ('mysql', 'mariadb'):
+        # CHAR(32) is kept on other backends, only the IDs need rewriting
+        _backfill_ids('message_id')
+        return
+
+    op.add_column('messages', sa.Column('new_message_id', mysql.BINARY(16), nullable=True))
+    _backfill_ids('new_message_id')
+
+    # Rebuild the primary key on the binary column in one table copy
+    op.execute(
+        "ALTER TABLE messages "
+        "DROP PRIMARY KEY, "
+        "DROP COLUMN message_id, "
+        "CHANGE COLUMN new_message_id message_id BINARY(16) NOT NULL FIRST, "
+        "ADD PRIMARY KEY (message_id)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name not in ('mysql', 'mariadb'):
+        # Version 7 UUIDs are still valid UUIDs, nothing to convert back
+        return
+
+    op.add_column('messages', sa.Column('old_message_id', mysql.CHAR(32), nullable=True))
+    op.execute("UPDATE messages SET old_message_id = LOWER(HEX(message_id))")
+
+    op.execute(
+        "ALTER TABLE messages "
+        "DROP PRIMARY KEY, "
+        "DROP COLUMN message_id, "
+        "CHANGE COLUMN old_message_id message_id CHAR(32) NOT NULL FIRST, "
+        "ADD PRIMARY KEY (message_id)"
+    )
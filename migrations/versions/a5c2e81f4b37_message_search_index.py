@@ -0,0 +1,74 @@
+"""Message search index
+
+Revision ID: a5c2e81f4b37
+Revises: 7f3a91c2d4e8
+Create Date: 2026-10-19 14:27:09.481652
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from app.internal.search import MARIADB_FULLTEXT_DDL, sqlite_has_fts5
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a5c2e81f4b37'
+down_revision: Union[str, None] = '7f3a91c2d4e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The first version of the SQLite index, keyed on the implicit rowid of messages.
+# Kept here as it was, later revisions replace it
+SQLITE_FTS_DDL: list[str] = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5("
+    "message_data, content='messages', content_rowid='rowid')",
+
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN "
+    "INSERT INTO messages_fts(rowid, message_data) VALUES (new.rowid, new.message_data); END",
+
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN "
+    "INSERT INTO messages_fts(messages_fts, rowid, message_data) "
+    "VALUES ('delete', old.rowid, old.message_data); END",
+
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF message_data ON messages BEGIN "
+    "INSERT INTO messages_fts(messages_fts, rowid, message_data) "
+    "VALUES ('delete', old.rowid, old.message_data); "
+    "INSERT INTO messages_fts(rowid, message_data) VALUES (new.rowid, new.message_data); END"
+]
+SQLITE_FTS_REBUILD: str = "INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+
+    if bind.dialect.name in ('mysql', 'mariadb'):
+        op.execute(MARIADB_FULLTEXT_DDL)
+        return
+
+    # Without FTS5 the server falls back to its in-memory index
+    if bind.dialect.name != 'sqlite' or not sqlite_has_fts5(bind):
+        return
+
+    for statement in SQLITE_FTS_DDL:
+        op.execute(statement)
+
+    op.execute(SQLITE_FTS_REBUILD)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+
+    if bind.dialect.name in ('mysql', 'mariadb'):
+        op.execute("ALTER TABLE messages DROP INDEX ix_messages_message_data_fulltext")
+        return
+
+    if bind.dialect.name != 'sqlite':
+        return
+
+    for trigger in ('messages_fts_insert', 'messages_fts_delete', 'messages_fts_update'):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+
+    op.execute("DROP TABLE IF EXISTS messages_fts")
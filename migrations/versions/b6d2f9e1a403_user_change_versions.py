@@ -0,0 +1,29 @@
+"""User change versions
+
+Revision ID: b6d2f9e1a403
+Revises: f4b8d61c3a27
+Create Date: 2026-10-19 22:14:09.318402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d2f9e1a403'
+down_revision: Union[str, None] = 'f4b8d61c3a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('change_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('change_version')
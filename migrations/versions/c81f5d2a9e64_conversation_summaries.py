@@ -0,0 +1,126 @@
+"""Conversation summaries
+
+Revision ID: c81f5d2a9e64
+Revises: a5c2e81f4b37
+Create Date: 2026-10-19 16:02:51.730218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql, sqlite
+
+from app.models.dbtables import BinaryUUID
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c81f5d2a9e64'
+down_revision: Union[str, None] = 'a5c2e81f4b37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE: int = 5000
+
+
+def _upsert_statement(conversations: sa.TableClause, dialect_name: str, rows: list[dict]):
+    """Insert that keeps the newer last message when the other direction already made the row."""
+    if dialect_name == 'sqlite':
+        statement = sqlite.insert(conversations).values(rows)
+        new = statement.excluded
+    else:
+        statement = mysql.insert(conversations).values(rows)
+        new = statement.inserted
+
+    values: dict = {
+        'last_message_id': sa.case(
+            (new.last_message_id > conversations.c.last_message_id, new.last_message_id),
+            else_=conversations.c.last_message_id
+        )
+    }
+    if dialect_name == 'sqlite':
+        return statement.on_conflict_do_update(index_elements=['user_id', 'peer_id'], set_=values)
+
+    return statement.on_duplicate_key_update(values)
+
+
+def _backfill_conversations() -> None:
+    """One row per user and peer pointing at the newest message between them, nothing unread.
+
+    Directed pairs are read in keyset pages through ix_messages_conversation,
+    so only one page is held in memory at a time.
+    """
+    bind = op.get_bind()
+    messages = sa.table(
+        'messages',
+        sa.column('message_id', BinaryUUID()),
+        sa.column('sender_id', sa.Uuid()),
+        sa.column('recipient_id', sa.Uuid())
+    )
+    conversations = sa.table(
+        'conversations',
+        sa.column('user_id', sa.Uuid()),
+        sa.column('peer_id', sa.Uuid()),
+        sa.column('last_message_id', BinaryUUID()),
+        sa.column('unread_count', sa.Integer())
+    )
+
+    statement = (
+        sa.select(messages.c.sender_id, messages.c.recipient_id, sa.func.max(messages.c.message_id))
+        .group_by(messages.c.sender_id, messages.c.recipient_id)
+        .order_by(messages.c.sender_id, messages.c.recipient_id)
+        .limit(BATCH_SIZE)
+    )
+    last: tuple | None = None
+
+    while True:
+        page_statement = statement
+        if last is not None:
+            page_statement = statement.where(sa.or_(
+                messages.c.sender_id > last[0],
+                sa.and_(messages.c.sender_id == last[0], messages.c.recipient_id > last[1])
+            ))
+
+        groups = bind.execute(page_statement).all()
+        if not groups:
+            return
+
+        newest: dict[tuple, object] = {}
+        for sender_id, recipient_id, message_id in groups:
+            for key in ((sender_id, recipient_id), (recipient_id, sender_id)):
+                if key not in newest or message_id > newest[key]:
+                    newest[key] = message_id
+
+        values: list[dict] = [
+            {'user_id': user_id, 'peer_id': peer_id, 'last_message_id': message_id, 'unread_count': 0}
+            for (user_id, peer_id), message_id in newest.items()
+        ]
+        bind.execute(_upsert_statement(conversations, bind.dialect.name, values))
+
+        last = groups[-1][0], groups[-1][1]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_messages_conversation', 'messages', ['sender_id', 'recipient_id', 'message_id'], unique=False)
+
+    op.create_table('conversations',
+    sa.Column('user_id', sa.Uuid(), nullable=False),
+    sa.Column('peer_id', sa.Uuid(), nullable=False),
+    sa.Column('last_message_id', BinaryUUID(), nullable=False),
+    sa.Column('unread_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['peer_id'], ['users.user_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'peer_id')
+    )
+    op.create_index('ix_conversations_recent', 'conversations', ['user_id', 'last_message_id'], unique=False)
+
+    _backfill_conversations()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_conversations_recent', table_name='conversations')
+    op.drop_table('conversations')
+
+    op.drop_index('ix_messages_conversation', table_name='messages')
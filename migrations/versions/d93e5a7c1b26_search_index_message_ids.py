@@ -0,0 +1,72 @@
+"""Key the message search index on message IDs
+
+Revision ID: d93e5a7c1b26
+Revises: b6d2f9e1a403
+Create Date: 2026-10-19 23:02:37.845120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from app.internal.search import SQLITE_FTS_DDL, SQLITE_FTS_REBUILD, SQLITE_FTS_TRIGGERS, sqlite_has_fts5
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd93e5a7c1b26'
+down_revision: Union[str, None] = 'b6d2f9e1a403'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Index created by a5c2e81f4b37, restored on downgrade
+PREVIOUS_SQLITE_FTS_DDL: list[str] = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5("
+    "message_data, content='messages', content_rowid='rowid')",
+
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN "
+    "INSERT INTO messages_fts(rowid, message_data) VALUES (new.rowid, new.message_data); END",
+
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN "
+    "INSERT INTO messages_fts(messages_fts, rowid, message_data) "
+    "VALUES ('delete', old.rowid, old.message_data); END",
+
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF message_data ON messages BEGIN "
+    "INSERT INTO messages_fts(messages_fts, rowid, message_data) "
+    "VALUES ('delete', old.rowid, old.message_data); "
+    "INSERT INTO messages_fts(rowid, message_data) VALUES (new.rowid, new.message_data); END",
+
+    "INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')"
+]
+
+
+def _drop_sqlite_index() -> None:
+    for trigger in SQLITE_FTS_TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+
+    op.execute("DROP TABLE IF EXISTS messages_fts")
+    op.execute("DROP TABLE IF EXISTS messages_fts_ids")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+
+    # MariaDB keeps its FULLTEXT index on the table itself
+    if bind.dialect.name != 'sqlite' or not sqlite_has_fts5(bind):
+        return
+
+    # The old table used the implicit rowid of messages, which VACUUM renumbers
+    _drop_sqlite_index()
+    for statement in SQLITE_FTS_DDL + SQLITE_FTS_REBUILD:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite' or not sqlite_has_fts5(bind):
+        return
+
+    _drop_sqlite_index()
+    for statement in PREVIOUS_SQLITE_FTS_DDL:
+        op.execute(statement)
@@ -0,0 +1,37 @@
+"""Read markers
+
+Revision ID: e29b7c4d1f58
+Revises: c81f5d2a9e64
+Create Date: 2026-10-19 17:48:13.062497
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.models.dbtables import BinaryUUID
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e29b7c4d1f58'
+down_revision: Union[str, None] = 'c81f5d2a9e64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('conversations', sa.Column('last_read_message_id', BinaryUUID(), nullable=True))
+
+    # Conversations without unread messages were read up to their newest message
+    op.execute(
+        "UPDATE conversations SET last_read_message_id = last_message_id "
+        "WHERE unread_count = 0"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('conversations') as batch_op:
+        batch_op.drop_column('last_read_message_id')
@@ -0,0 +1,43 @@
+"""Background user deletion
+
+Revision ID: f4b8d61c3a27
+Revises: e29b7c4d1f58
+Create Date: 2026-10-19 19:21:37.604815
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4b8d61c3a27'
+down_revision: Union[str, None] = 'e29b7c4d1f58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('disabled', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+    op.create_table('userdeletions',
+    sa.Column('user_id', sa.Uuid(), nullable=False),
+    sa.Column('username', sqlmodel.sql.sqltypes.AutoString(length=20), nullable=False),
+    sa.Column('requested_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('messages_deleted', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_index(op.f('ix_userdeletions_username'), 'userdeletions', ['username'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_userdeletions_username'), table_name='userdeletions')
+    op.drop_table('userdeletions')
+
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('disabled')
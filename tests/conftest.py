@@ -1,16 +1,18 @@
 import pytest
 
+from contextlib import contextmanager
 from pathlib import Path
 
 from asgi_lifespan import LifespanManager
 from httpx import AsyncClient, ASGITransport
-from sqlmodel import SQLModel, Session, create_engine, text
+from sqlalchemy import event
+from sqlmodel import SQLModel, Session, create_engine
 
 from app.main import app as fastapi_app
-from app.dependencies import get_session
 
 from app.internal.database import database
 from app.internal.config import settings
+from app.internal.querystats import count_queries
 
 
 @pytest.fixture(scope='session')
@@ -24,14 +26,16 @@ async def override_database():
         "sqlite:///testing.db",
         echo=False
     )
+
+    # Requests use their own connections, so the pragma is set on every one
+    @event.listens_for(engine, 'connect')
+    def enable_foreign_keys(dbapi_connection, connection_record):
+        dbapi_connection.execute("PRAGMA foreign_keys=ON;")
+
     database.override_engine(engine)
 
     # Tests dont need alembic
     SQLModel.metadata.create_all(engine)
-    with Session(engine) as session:
-        statement = text("PRAGMA foreign_keys=ON;")
-        session.exec(statement)
-    
     return engine
 
 
@@ -50,15 +54,10 @@ def session(testing_engine):
 
 
 @pytest.fixture(scope='session')
-async def get_lifespan_app(session: Session):
-    async def session_override():
-        return session
-
+async def get_lifespan_app(testing_engine):
+    # Requests open their own sessions on the overridden engine
     async with LifespanManager(fastapi_app) as manager:
-        fastapi_app.dependency_overrides[get_session] = session_override
         yield manager
-    
-    fastapi_app.dependency_overrides.clear()
 
 
 @pytest.fixture(scope='session')
@@ -91,3 +90,16 @@ async def first_user_cookies(client_factory):
 
     await client.aclose()
     return res.cookies
+
+
+@pytest.fixture
+def max_queries():
+    @contextmanager
+    def inner(limit: int):
+        with count_queries() as stats:
+            yield stats
+
+        statements: str = '\n'.join(stats.statements)
+        assert stats.count <= limit, f"{stats.count} queries ran, expected at most {limit}:\n{statements}"
+
+    return inner
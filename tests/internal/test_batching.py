@@ -0,0 +1,38 @@
+import asyncio
+import uuid
+
+import pytest
+from sqlmodel import Session
+
+from app.internal.config import settings
+from app.internal.database import MessageBatchWriter, database
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_batch_writer_stores_messages(get_lifespan_app, session: Session):
+    created = await database.users.add_user(session, 'test_batch_user', 'test_batch_user')
+    assert isinstance(created, bool) and created
+
+    writer = MessageBatchWriter(database, window_ms=20, max_rows=10)
+    message_ids: list[uuid.UUID] = await asyncio.gather(*(
+        writer.submit(settings.FIRST_USER_NAME, 'test_batch_user', f'Batched {i}')
+        for i in range(25)
+    ))
+
+    assert len(set(message_ids)) == 25
+
+    stored = await database.messages.get_messages(session, settings.FIRST_USER_NAME, 'test_batch_user')
+    assert {message.message_id for message in stored} == set(message_ids)
+
+
+async def test_batch_writer_invalid_recipient(get_lifespan_app):
+    writer = MessageBatchWriter(database, window_ms=20, max_rows=10)
+    valid, invalid = await asyncio.gather(
+        writer.submit(settings.FIRST_USER_NAME, 'test_batch_user', 'Batched valid'),
+        writer.submit(settings.FIRST_USER_NAME, 'invalid_user', 'Batched invalid'),
+        return_exceptions=True
+    )
+
+    assert isinstance(valid, uuid.UUID)
+    assert isinstance(invalid, ValueError)
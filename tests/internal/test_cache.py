@@ -0,0 +1,70 @@
+from app.internal.cache import ConversationCache, MESSAGE_OVERHEAD_BYTES
+from app.internal.uuids import uuid7
+from app.models.chats import MessagesGetPublic
+
+
+def make_message(sender: str, recipient: str, message_data: str = 'Hello') -> MessagesGetPublic:
+    return MessagesGetPublic(
+        sender_name=sender,
+        recipient_name=recipient,
+        message_data=message_data,
+        send_date='2026-01-01 00:00:00',
+        message_id=uuid7()
+    )
+
+
+def test_cache_serves_updates():
+    cache = ConversationCache(size=3, max_bytes=1024 * 1024)
+    assert cache.get('alice', 'bob', 3) is None
+
+    cache.fill('alice', 'bob', cache.begin_fill('alice', 'bob'), [], exhaustive=True)
+    first, second = make_message('alice', 'bob'), make_message('bob', 'alice')
+
+    cache.add(first)
+    cache.add(second)
+    assert cache.get('bob', 'alice', 100) == [second, first]
+
+    cache.update('alice', 'bob', first.message_id, 'Edited')
+    cache.remove('alice', 'bob', second.message_id)
+
+    cached: list[MessagesGetPublic] = cache.get('alice', 'bob', 100)
+    assert [message.message_data for message in cached] == ['Edited']
+
+    stats: dict = cache.stats()
+    assert stats['hits'] == 2 and stats['misses'] == 1
+
+
+def test_cache_rejects_stale_fill():
+    cache = ConversationCache(size=3, max_bytes=1024 * 1024)
+
+    version: int = cache.begin_fill('alice', 'bob')
+    cache.add(make_message('alice', 'bob'))
+
+    # A write happened while the "query" ran, the result must not be cached
+    cache.fill('alice', 'bob', version, [], exhaustive=True)
+    assert cache.get('alice', 'bob', 1) is None
+
+
+def test_cache_lru_eviction():
+    message_size: int = len('Hello') + MESSAGE_OVERHEAD_BYTES
+    cache = ConversationCache(size=10, max_bytes=message_size * 2)
+
+    for peer in ('bob', 'carol', 'dave'):
+        version: int = cache.begin_fill('alice', peer)
+        cache.fill('alice', peer, version, [make_message('alice', peer)], exhaustive=True)
+
+    assert cache.get('alice', 'bob', 1) is None
+    assert cache.get('alice', 'dave', 1) is not None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_cache_partial_buffer_misses():
+    cache = ConversationCache(size=2, max_bytes=1024 * 1024)
+    messages = [make_message('alice', 'bob'), make_message('alice', 'bob')]
+
+    cache.fill('alice', 'bob', cache.begin_fill('alice', 'bob'), messages, exhaustive=False)
+    cache.remove('alice', 'bob', messages[0].message_id)
+
+    # Only one message left but the conversation has older ones
+    assert cache.get('alice', 'bob', 1) is not None
+    assert cache.get('alice', 'bob', 2) is None
@@ -0,0 +1,59 @@
+import asyncio
+import uuid
+import pytest
+
+from app.internal import deletions
+from app.internal.deletions import UserDeletionQueue
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_batches_run_until_finished():
+    calls: list[uuid.UUID] = []
+    first, second = uuid.uuid4(), uuid.uuid4()
+
+    async def run_batch(user_id):
+        calls.append(user_id)
+        return calls.count(user_id) == 3
+
+    queue = UserDeletionQueue(run_batch, interval=0)
+    queue.submit(first)
+    queue.submit(second)
+    queue.submit(first)
+
+    await asyncio.wait_for(queue.task, 1)
+
+    assert calls == [first] * 3 + [second] * 3
+    assert queue.batches == 6 and queue.finished == 2
+    assert not queue.pending
+
+
+async def test_failed_batch_is_retried(monkeypatch):
+    monkeypatch.setattr(deletions, 'FAILURE_DELAY', 0)
+    attempts: list[int] = []
+
+    async def run_batch(user_id):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("database went away")
+
+        return True
+
+    queue = UserDeletionQueue(run_batch, interval=0)
+    queue.submit(uuid.uuid4())
+
+    await asyncio.wait_for(queue.task, 1)
+    assert len(attempts) == 2 and queue.finished == 1
+
+
+async def test_close_stops_running_jobs():
+    async def run_batch(user_id):
+        return False
+
+    queue = UserDeletionQueue(run_batch, interval=0.01)
+    queue.submit(uuid.uuid4())
+
+    await asyncio.sleep(0.05)
+    await queue.close()
+
+    assert queue.task.done() and len(queue.pending) == 1
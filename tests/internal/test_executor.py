@@ -0,0 +1,39 @@
+import threading
+
+import pytest
+
+from app.internal.executor import BoundedExecutor, ExecutorOverloaded
+
+
+def test_executor_rejects_past_limit():
+    executor = BoundedExecutor(max_workers=1, max_pending=2)
+    release = threading.Event()
+
+    try:
+        first = executor.submit(release.wait)
+        second = executor.submit(release.wait)
+
+        with pytest.raises(ExecutorOverloaded):
+            executor.submit(release.wait)
+
+        stats: dict = executor.stats()
+        assert stats['pending'] == 2 and stats['rejected'] == 1
+
+        release.set()
+        first.result(timeout=5)
+        second.result(timeout=5)
+    finally:
+        release.set()
+        executor.shutdown()
+
+    stats = executor.stats()
+    assert stats['pending'] == 0 and stats['completed'] == 2
+
+
+def test_executor_without_limit():
+    executor = BoundedExecutor(max_workers=1, max_pending=0)
+
+    futures = [executor.submit(pow, 2, i) for i in range(10)]
+    assert [future.result(timeout=5) for future in futures] == [2 ** i for i in range(10)]
+
+    executor.shutdown()
@@ -0,0 +1,37 @@
+from app.internal import config, hashing
+from app.internal.config import ConfigManager, settings
+
+
+def fake_timings(monkeypatch, per_pass_ms: float) -> None:
+    monkeypatch.setattr(hashing, '_measure_verify', lambda hasher: hasher.time_cost * per_pass_ms)
+
+
+def test_calibration_picks_closest_time_cost(monkeypatch):
+    # 2 passes land 10 ms under, 3 passes 50 ms over
+    fake_timings(monkeypatch, 60)
+    params = hashing.calibrate_argon2(130, hashing.MIN_MEMORY_COST, 1)
+    assert params['time_cost'] == 2 and params['measured_ms'] == 120
+
+    # 2 passes land 30 ms under, 3 passes 15 ms over
+    fake_timings(monkeypatch, 45)
+    params = hashing.calibrate_argon2(120, hashing.MIN_MEMORY_COST, 1)
+    assert params['time_cost'] == 3 and params['measured_ms'] == 135
+
+
+def test_calibration_stops_at_max_time_cost(monkeypatch):
+    fake_timings(monkeypatch, 1)
+    params = hashing.calibrate_argon2(1000, hashing.MIN_MEMORY_COST, 1)
+    assert params['time_cost'] == hashing.MAX_TIME_COST
+
+
+def test_pinned_parameters_skip_calibration(monkeypatch, tmp_path):
+    def fail(*args):
+        raise AssertionError("calibrated with pinned parameters")
+
+    monkeypatch.setattr(config, 'calibrate_argon2', fail)
+    monkeypatch.setattr(settings, 'ARGON2_TIME_COST', 3)
+    monkeypatch.setattr(settings, 'ARGON2_MEMORY_COST', 32768)
+    monkeypatch.setattr(settings, 'ARGON2_PARALLELISM', 2)
+
+    params = ConfigManager(str(tmp_path)).load_argon2_params()
+    assert params == {'time_cost': 3, 'memory_cost': 32768, 'parallelism': 2}
@@ -0,0 +1,49 @@
+import json
+import logging
+import queue
+
+from app.internal.logqueue import DroppingQueueHandler, JsonFormatter, install_queue_logging
+
+
+class ListHandler(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.records: list[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+
+def test_queue_logging_delivers_records():
+    logger = logging.getLogger('chatinterface_server.test_queue')
+    target = ListHandler()
+    logger.addHandler(target)
+
+    listeners = install_queue_logging(['chatinterface_server.test_queue'], maxsize=100)
+    try:
+        assert isinstance(logger.handlers[0], DroppingQueueHandler)
+        logger.warning("queued %s", 'record')
+    finally:
+        for listener in listeners:
+            listener.stop()
+
+        logger.handlers.clear()
+
+    assert [record.getMessage() for record in target.records] == ['queued record']
+
+
+def test_full_queue_drops_records():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    record = logging.makeLogRecord({'msg': 'hello'})
+
+    handler.handle(record)
+    handler.handle(record)
+
+    assert handler.dropped == 1
+
+
+def test_json_formatter_fields():
+    record = logging.makeLogRecord({'msg': 'GET /', 'levelname': 'INFO', 'fields': {'status': 200}})
+    entry: dict = json.loads(JsonFormatter().format(record))
+
+    assert entry['message'] == 'GET /' and entry['status'] == 200
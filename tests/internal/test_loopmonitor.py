@@ -0,0 +1,25 @@
+import asyncio
+import logging
+import time
+
+import pytest
+
+from app.internal.loopmonitor import LoopLagMonitor
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_monitor_reports_blocked_loop(caplog):
+    monitor = LoopLagMonitor(interval=0.01, threshold=0.05)
+    monitor.start()
+
+    with caplog.at_level(logging.WARNING, logger='chatinterface_server'):
+        await asyncio.sleep(0.05)
+        time.sleep(0.3)  # blocks the event loop on purpose
+
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+    assert monitor.stalls == 1
+    assert 'Event loop blocked' in caplog.text
+    assert 'test_monitor_reports_blocked_loop' in caplog.text
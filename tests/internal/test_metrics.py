@@ -0,0 +1,55 @@
+import pytest
+
+from app.internal.metrics import Counter, Gauge, Histogram, Registry
+
+
+def test_render_exposition_format():
+    registry = Registry()
+    requests = registry.register(Counter('requests_total', "Requests.", ('route',)))
+    sockets = registry.register(Gauge('sockets', "Open sockets."))
+
+    requests.inc(route='/a')
+    requests.inc(2, route='/b "quoted"')
+    sockets.set(3)
+
+    assert registry.render() == (
+        '# HELP requests_total Requests.\n'
+        '# TYPE requests_total counter\n'
+        'requests_total{route="/a"} 1\n'
+        'requests_total{route="/b \\"quoted\\""} 2\n'
+        '# HELP sockets Open sockets.\n'
+        '# TYPE sockets gauge\n'
+        'sockets 3\n'
+    )
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.register(Histogram('latency_seconds', "Latency.", buckets=(0.1, 1.0)))
+
+    for value in (0.05, 0.5, 0.5, 5.0):
+        latency.observe(value)
+
+    lines: list[str] = registry.render().splitlines()
+    assert lines[2:] == [
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        'latency_seconds_sum 6.05',
+        'latency_seconds_count 4'
+    ]
+
+
+def test_metric_labels_must_match():
+    counter = Counter('labelled_total', "Labelled.", ('route',))
+
+    with pytest.raises(ValueError):
+        counter.inc(status='200')
+
+
+def test_counter_totals_never_decrease():
+    counter = Counter('copied_total', "Copied.")
+
+    counter.set_total(5)
+    counter.set_total(3)
+    assert counter.render()[-1] == 'copied_total 5'
@@ -0,0 +1,27 @@
+import pytest
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.internal import metrics
+from app.internal.pool import TimedQueuePool
+
+
+def test_pool_records_checkout_waits_and_timeouts(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=TimedQueuePool, pool_size=1,
+        max_overflow=0, pool_timeout=0.05
+    )
+    waits_before: int = sum(count for count, _ in metrics.db_pool_checkout_wait.totals().values())
+    timeouts_before: float = metrics.db_pool_timeouts.values.get((), 0)
+
+    with engine.connect():
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+
+    engine.dispose()
+
+    waits_after: int = sum(count for count, _ in metrics.db_pool_checkout_wait.totals().values())
+    assert waits_after - waits_before == 2
+    assert metrics.db_pool_timeouts.values[()] - timeouts_before == 1
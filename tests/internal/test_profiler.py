@@ -0,0 +1,39 @@
+import contextvars
+import threading
+import time
+
+from app.internal.profiler import SamplingProfiler, current_profile, profiled_thread
+
+
+def busy_wait(seconds: float) -> None:
+    end: float = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def run_profiled_call() -> None:
+    with profiled_thread('executor:run_profiled_call'):
+        busy_wait(0.1)
+
+
+def test_profiler_samples_registered_threads():
+    profile = SamplingProfiler(interval=0.001)
+    token = current_profile.set(profile)
+
+    try:
+        profile.start()
+
+        # Same as async_threaded, the worker runs in a copy of the caller's context
+        context: contextvars.Context = contextvars.copy_context()
+        thread = threading.Thread(target=context.run, args=(run_profiled_call,))
+
+        thread.start()
+        thread.join()
+    finally:
+        profile.stop()
+        current_profile.reset(token)
+
+    collapsed: str = profile.collapsed()
+    assert 'executor:run_profiled_call;' in collapsed
+    assert 'busy_wait (test_profiler.py:' in collapsed
+    assert thread.ident not in profile.threads
@@ -0,0 +1,27 @@
+import time
+
+import pytest
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app.internal.querystats import count_queries
+
+
+def test_failed_statements_do_not_skew_durations():
+    engine = create_engine('sqlite://')
+
+    with engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT * FROM missing_table"))
+
+        time.sleep(0.05)
+
+        with count_queries() as stats:
+            conn.execute(text("SELECT 1"))
+
+        assert stats.count == 1
+        assert stats.duration < 0.05
+        assert 'query_start_time' not in conn.info
+
+    engine.dispose()
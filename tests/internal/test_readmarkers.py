@@ -0,0 +1,52 @@
+import asyncio
+import pytest
+
+from app.internal.readmarkers import ReadMarkerBuffer
+from app.internal.uuids import uuid7
+from app.models.chats import ReadState
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_markers_are_coalesced():
+    applied: list[list] = []
+    broadcast: list[list] = []
+
+    async def apply(markers):
+        applied.append(markers)
+        return [
+            (username, ReadState(peer_name=peer, last_read_message_id=message_id, unread_count=0))
+            for username, peer, message_id in markers
+        ]
+
+    async def listener(states):
+        broadcast.append(states)
+
+    buffer = ReadMarkerBuffer(apply, interval=0.01)
+    buffer.listeners.append(listener)
+
+    older, newer = uuid7(), uuid7()
+    buffer.submit('alice', 'bob', older)
+    buffer.submit('alice', 'bob', newer)
+    buffer.submit('alice', 'bob', older)
+    buffer.submit('alice', 'carol', older)
+
+    await asyncio.sleep(0.05)
+
+    assert applied == [[('alice', 'bob', newer), ('alice', 'carol', older)]]
+    assert len(broadcast) == 1 and len(broadcast[0]) == 2
+    assert buffer.submitted == 4 and buffer.written == 2
+
+
+async def test_close_flushes_pending():
+    applied: list[list] = []
+
+    async def apply(markers):
+        applied.append(markers)
+        return []
+
+    buffer = ReadMarkerBuffer(apply, interval=60)
+    buffer.submit('alice', 'bob', uuid7())
+
+    await buffer.close()
+    assert len(applied) == 1 and buffer.pending == {}
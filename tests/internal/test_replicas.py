@@ -0,0 +1,76 @@
+from sqlalchemy import create_engine
+from sqlmodel import Session
+
+from app.internal.database import call_with_replicas
+from app.internal.replicas import ReplicaRouter, read_only, track_reads, writes_as
+
+
+class FakeMethods:
+    def __init__(self, replicas: ReplicaRouter) -> None:
+        self.replicas: ReplicaRouter = replicas
+
+    @read_only
+    def read_bind(self, session: Session, username: str) -> str:
+        session.connection()  # fails on an unreachable replica
+        return str(session.get_bind().url)
+
+    @writes_as('username')
+    def write(self, session: Session, username: str) -> None:
+        pass
+
+    def lookup(self, session: Session, session_id: str) -> None:
+        pass
+
+
+def test_reads_go_to_replica_until_user_writes(tmp_path):
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+
+    methods = FakeMethods(ReplicaRouter([replica], sticky_seconds=60, retry_seconds=60))
+
+    with Session(primary) as session:
+        assert call_with_replicas(FakeMethods.read_bind, methods, session, 'alice').endswith('replica.db')
+
+        call_with_replicas(FakeMethods.write, methods, session, 'alice')
+        assert call_with_replicas(FakeMethods.read_bind, methods, session, 'alice').endswith('primary.db')
+
+        # Stickiness only applies to the user that wrote
+        assert call_with_replicas(FakeMethods.read_bind, methods, session, 'bob').endswith('replica.db')
+
+        call_with_replicas(FakeMethods.write, methods, session, username='carol')
+        assert call_with_replicas(FakeMethods.read_bind, methods, session, 'carol').endswith('primary.db')
+
+        # Only methods that name their writers make anyone sticky
+        call_with_replicas(FakeMethods.lookup, methods, session, 'dave')
+        assert call_with_replicas(FakeMethods.read_bind, methods, session, 'dave').endswith('replica.db')
+        assert set(methods.replicas.recent_writes) == {'alice', 'carol'}
+
+
+def test_track_reads_records_replica_reads(tmp_path):
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+
+    methods = FakeMethods(ReplicaRouter([replica], sticky_seconds=60, retry_seconds=60))
+    methods.replicas.mark_write('alice')
+
+    with Session(primary) as session:
+        with track_reads() as reads:
+            call_with_replicas(FakeMethods.read_bind, methods, session, 'alice')
+        assert not reads.replica
+
+        with track_reads() as reads:
+            call_with_replicas(FakeMethods.read_bind, methods, session, 'bob')
+        assert reads.replica
+
+
+def test_failed_replica_falls_back_to_primary(tmp_path):
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    broken = create_engine(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+
+    router = ReplicaRouter([broken], sticky_seconds=60, retry_seconds=60)
+    methods = FakeMethods(router)
+
+    with Session(primary) as session:
+        assert call_with_replicas(FakeMethods.read_bind, methods, session, 'alice').endswith('primary.db')
+
+    assert router.pick('alice') is None
@@ -0,0 +1,223 @@
+import uuid
+
+from datetime import datetime
+from types import SimpleNamespace
+
+from sqlalchemy import insert, text, update
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.internal import search
+from app.internal.database import ChatMethods
+from app.internal.search import (
+    InvertedIndex, decode_cursor, encode_cursor, make_snippet, query_terms
+)
+from app.internal.uuids import uuid7
+from app.models.dbtables import Messages, Users
+
+
+def make_index(messages: list[tuple[str, str, str]]) -> tuple[InvertedIndex, list[uuid.UUID]]:
+    index = InvertedIndex()
+    index.ready = True
+
+    message_ids: list[uuid.UUID] = []
+    for sender, recipient, message_data in messages:
+        message_id: uuid.UUID = uuid7()
+        index.add(message_id, sender, recipient, message_data)
+        message_ids.append(message_id)
+
+    return index, message_ids
+
+
+def test_query_terms():
+    assert query_terms("Hello, hello_World! 42") == ['hello', 'world', '42']
+    assert query_terms("?!") == []
+
+
+def test_cursor_round_trip():
+    message_id: uuid.UUID = uuid7()
+    assert decode_cursor(encode_cursor(1.25, message_id)) == (1.25, message_id)
+
+    for invalid in ('not-a-cursor', encode_cursor(1.0, message_id)[:-4], 'W10'):
+        try:
+            decode_cursor(invalid)
+        except ValueError:
+            continue
+
+        assert False, f"{invalid} was accepted"
+
+
+def test_make_snippet_highlights_terms():
+    text: str = 'x ' * 200 + 'Hello world ' + 'y ' * 200
+    snippet, highlights = make_snippet(text, ['hello', 'world'])
+
+    assert len(snippet) <= 160
+    assert [snippet[start:end] for start, end in highlights] == ['Hello', 'world']
+
+
+def test_index_ranks_and_filters():
+    index, message_ids = make_index([
+        ('alice', 'bob', 'lunch today'),
+        ('alice', 'bob', 'lunch lunch lunch today'),
+        ('bob', 'carol', 'lunch today'),
+        ('alice', 'bob', 'dinner today')
+    ])
+
+    ranked = index.search('alice', ['lunch', 'today'], 10, None)
+    assert [message_id for message_id, _, _ in ranked] == [message_ids[1], message_ids[0]]
+
+    # The cursor continues strictly after the last result
+    last_id, last_score, _ = ranked[0]
+    assert [item[0] for item in index.search('alice', ['lunch', 'today'], 10, (last_score, last_id))] == [message_ids[0]]
+
+    index.remove(message_ids[1])
+    index.add(message_ids[3], 'alice', 'bob', 'lunch instead')
+    assert {item[0] for item in index.search('alice', ['lunch'], 10, None)} == {message_ids[0], message_ids[3]}
+
+    index.remove_user('bob')
+    assert index.search('alice', ['lunch'], 10, None) == []
+    assert index.total_length == 0
+
+
+class PagedResult:
+    def __init__(self, rows: list) -> None:
+        self.rows: list = rows
+
+    def all(self) -> list:
+        return self.rows
+
+
+class PagedSession:
+    """Returns one page per query and runs `on_page` first, like a write landing mid-build."""
+
+    def __init__(self, pages: list[list], on_page) -> None:
+        self.pages: list[list] = pages
+        self.on_page = on_page
+
+    def exec(self, statement) -> PagedResult:
+        self.on_page()
+        return PagedResult(self.pages.pop(0))
+
+
+def test_build_keeps_writes_made_during_build(monkeypatch):
+    monkeypatch.setattr(search, 'BUILD_BATCH_SIZE', 1)
+    edited_id, deleted_id, new_id = uuid7(), uuid7(), uuid7()
+
+    index = InvertedIndex()
+    writes: list = [
+        # Runs while the lock is free, a held lock would deadlock here
+        lambda: index.add(edited_id, 'alice', 'bob', 'edited text'),
+        lambda: index.remove(deleted_id),
+        lambda: index.add(new_id, 'alice', 'bob', 'new text')
+    ]
+    session = PagedSession(
+        [
+            [(edited_id, 'alice', 'bob', 'original text')],
+            [(deleted_id, 'alice', 'bob', 'deleted text')],
+            []
+        ],
+        lambda: writes.pop(0)()
+    )
+    index.build(session)
+
+    assert index.ready and not index.building
+    assert {item[0] for item in index.search('alice', ['text'], 10, None)} == {edited_id, new_id}
+    assert index.search('alice', ['original'], 10, None) == []
+
+
+def make_fts_database(tmp_path) -> tuple:
+    engine = create_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    SQLModel.metadata.create_all(engine)
+
+    alice, bob = uuid.uuid4(), uuid.uuid4()
+    with Session(engine) as session:
+        session.execute(insert(Users), [
+            {'user_id': alice, 'username': 'alice', 'hashed_password': 'x'},
+            {'user_id': bob, 'username': 'bob', 'hashed_password': 'x'}
+        ])
+        session.commit()
+
+    return engine, alice, bob
+
+
+def store(session: Session, sender_id: uuid.UUID, recipient_id: uuid.UUID, message_data: str) -> uuid.UUID:
+    message_id: uuid.UUID = uuid7()
+    session.execute(insert(Messages).values(
+        message_id=message_id, sender_id=sender_id, recipient_id=recipient_id,
+        send_date=datetime.now(), message_data=message_data
+    ))
+    session.commit()
+
+    return message_id
+
+
+def test_fulltext_index_survives_vacuum(tmp_path):
+    engine, alice, bob = make_fts_database(tmp_path)
+
+    with Session(engine) as session:
+        message_ids: list[uuid.UUID] = [store(session, alice, bob, f"filler {i}") for i in range(20)]
+        wanted: uuid.UUID = store(session, alice, bob, 'the giraffe')
+
+        # Deleting rows leaves rowid gaps that VACUUM closes
+        session.execute(text("DELETE FROM messages WHERE message_id IN (:a, :b)"), {
+            'a': message_ids[0].hex, 'b': message_ids[1].hex
+        })
+        session.commit()
+
+    with engine.connect() as connection:
+        connection.exec_driver_sql("VACUUM")
+
+    with Session(engine) as session:
+        hits = search.search_fulltext(session, 'alice', ['giraffe'], 10, None)
+        assert [hit.message_id for hit in hits] == [wanted]
+
+        # Users being deleted drop out of the results
+        session.execute(update(Users).where(Users.user_id == bob).values(disabled=True))
+        session.commit()
+        assert search.search_fulltext(session, 'alice', ['giraffe'], 10, None) == []
+
+    engine.dispose()
+
+
+def test_repair_restores_dropped_triggers(tmp_path):
+    engine, alice, bob = make_fts_database(tmp_path)
+
+    with engine.begin() as connection:
+        assert not search.repair_sqlite_index(connection)
+
+        for trigger in search.SQLITE_FTS_TRIGGERS:
+            connection.exec_driver_sql(f"DROP TRIGGER {trigger}")
+
+    with Session(engine) as session:
+        missed: uuid.UUID = store(session, alice, bob, 'written without triggers')
+
+    with engine.begin() as connection:
+        assert search.repair_sqlite_index(connection)
+
+    with Session(engine) as session:
+        assert [hit.message_id for hit in search.search_fulltext(session, 'bob', ['triggers'], 10, None)] == [missed]
+        added: uuid.UUID = store(session, bob, alice, 'triggers are back')
+
+        found = {hit.message_id for hit in search.search_fulltext(session, 'bob', ['triggers'], 10, None)}
+        assert found == {missed, added}
+
+    engine.dispose()
+
+
+def test_in_memory_index_builds_from_primary(tmp_path):
+    primary, alice, bob = make_fts_database(tmp_path)
+
+    # An empty replica, as if the messages had not been replicated yet
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    SQLModel.metadata.create_all(replica)
+
+    with Session(primary) as session:
+        message_id: uuid.UUID = store(session, alice, bob, 'replicated later')
+
+    methods = SimpleNamespace(search_index=InvertedIndex(), engine=primary)
+    with Session(replica) as replica_session:
+        ChatMethods._search_in_memory(methods, replica_session, 'alice', ['replicated'], 10, None)
+
+    assert [item[0] for item in methods.search_index.search('alice', ['replicated'], 10, None)] == [message_id]
+
+    primary.dispose()
+    replica.dispose()
@@ -0,0 +1,57 @@
+import json
+
+from sqlalchemy import create_engine, text
+
+from app.internal import querystats
+from app.internal import slowlog
+from app.internal.slowlog import SlowQueryLog, redact_parameters
+
+
+def test_redact_parameters():
+    assert redact_parameters(('secret', 5)) == ['<str>', '<int>']
+    assert redact_parameters({'password': 'secret'}) == {'password': '<str>'}
+    assert redact_parameters(None) is None
+
+
+def test_slow_query_logged_with_plan(tmp_path):
+    log_path = tmp_path / 'slow_queries.log'
+    engine = create_engine('sqlite://')
+
+    querystats.set_slow_query_log(SlowQueryLog(str(log_path), threshold=0, explain=True))
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("CREATE TABLE notes (id INTEGER PRIMARY KEY, body TEXT)"))
+            conn.execute(text("SELECT body FROM notes WHERE body = :body"), {'body': 'private text'})
+    finally:
+        querystats.set_slow_query_log(None)
+        engine.dispose()
+
+    log_text: str = log_path.read_text()
+    assert 'private text' not in log_text
+
+    entries: list[dict] = [json.loads(line) for line in log_text.splitlines()]
+    select_entry: dict = next(entry for entry in entries if entry['statement'].startswith('SELECT'))
+
+    assert select_entry['parameters'] == ['<str>']
+    assert 'SCAN notes' in json.dumps(select_entry['plan'])
+
+
+def test_slow_query_log_through_queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(slowlog, 'EXPLAINED_STATEMENTS_LIMIT', 2)
+    log_path = tmp_path / 'slow_queries.log'
+    engine = create_engine('sqlite://')
+
+    slow_query_log = SlowQueryLog(str(log_path), threshold=0, explain=True, queue_size=100)
+    querystats.set_slow_query_log(slow_query_log)
+    try:
+        with engine.connect() as conn:
+            for i in range(5):
+                conn.execute(text(f"SELECT {i}"))
+
+        assert list(slow_query_log.explained_at) == ['SELECT 3', 'SELECT 4']
+    finally:
+        querystats.set_slow_query_log(None)
+        engine.dispose()
+
+    statements: list[str] = [json.loads(line)['statement'] for line in log_path.read_text().splitlines()]
+    assert statements == [f"SELECT {i}" for i in range(5)]
@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.internal.sqlite import create_sqlite_engine, is_write_statement
+
+
+def test_write_statement_detection():
+    assert is_write_statement("INSERT INTO messages VALUES (?)")
+    assert is_write_statement("  delete from messages")
+    assert not is_write_statement("SELECT 1")
+    assert not is_write_statement("PRAGMA journal_mode")
+
+
+def test_engine_applies_pragmas(tmp_path):
+    engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'pragmas.db'}", cache_size_kib=1024)
+
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == 'wal'
+        assert conn.execute(text("PRAGMA foreign_keys")).scalar() == 1
+        assert conn.execute(text("PRAGMA cache_size")).scalar() == -1024
+
+    engine.dispose()
+
+
+def test_concurrent_writers_do_not_fail(tmp_path):
+    engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'writers.db'}", busy_timeout_ms=100)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE counter (id INTEGER PRIMARY KEY, value INTEGER)"))
+
+    errors: list[Exception] = []
+
+    def write_rows(worker: int):
+        try:
+            for i in range(50):
+                with engine.begin() as conn:
+                    conn.execute(text("SELECT COUNT(*) FROM counter")).scalar()
+                    conn.execute(text("INSERT INTO counter (value) VALUES (:value)"), {'value': worker * 100 + i})
+
+                    # Holds the write transaction open, long enough to exhaust busy_timeout without the lock
+                    time.sleep(0.001)
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=write_rows, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM counter")).scalar() == 400
+
+    engine.dispose()
+    assert not errors
+
+
+def test_nested_writer_times_out(tmp_path):
+    engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'nested.db'}", busy_timeout_ms=100)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE counter (id INTEGER PRIMARY KEY, value INTEGER)"))
+
+    with engine.begin() as outer:
+        outer.execute(text("INSERT INTO counter (value) VALUES (1)"))
+
+        # A second connection on the same thread would wait for the first one forever
+        with pytest.raises(OperationalError, match='database is locked'):
+            with engine.begin() as inner:
+                inner.execute(text("INSERT INTO counter (value) VALUES (2)"))
+
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO counter (value) VALUES (3)"))
+
+    engine.dispose()
+
+
+def test_invalidated_connection_releases_lock(tmp_path):
+    engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'invalidated.db'}", busy_timeout_ms=100)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE counter (id INTEGER PRIMARY KEY, value INTEGER)"))
+
+    with engine.connect() as conn:
+        conn.execute(text("INSERT INTO counter (value) VALUES (1)"))
+        conn.invalidate()
+
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO counter (value) VALUES (2)"))
+        assert conn.execute(text("SELECT COUNT(*) FROM counter")).scalar() == 1
+
+    engine.dispose()
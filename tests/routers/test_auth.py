@@ -1,8 +1,12 @@
+import argon2
 import pytest
+
 from httpx import AsyncClient
+from sqlmodel import Session, select
 
-from app.internal.database import MainDatabase
+from app.internal.database import MainDatabase, database
 from app.internal.config import settings
+from app.models.dbtables import Users
 
 pytestmark = pytest.mark.anyio
 
@@ -45,3 +49,31 @@ async def test_check_session_token(client_factory, first_user_cookies):
     assert res.json()['username'] == settings.FIRST_USER_NAME
     
     await client.aclose()
+
+
+async def test_login_rehashes_outdated_password(client_factory, session: Session):
+    created = await database.users.add_user(session, 'test_rehash_user', 'test_rehash_user')
+    assert isinstance(created, bool) and created
+
+    # Simulate a hash made on a different host with cheaper parameters
+    old_hasher = argon2.PasswordHasher(time_cost=1, memory_cost=8, parallelism=1)
+    user: Users = session.exec(select(Users).where(Users.username == 'test_rehash_user')).one()
+
+    user.hashed_password = old_hasher.hash('test_rehash_user')
+    session.add(user)
+    session.commit()
+
+    client: AsyncClient = await client_factory()
+    auth_data: dict = {
+        'grant_type': 'password',
+        'username': 'test_rehash_user',
+        'password': 'test_rehash_user'
+    }
+    res = await client.post('/api/token/', data=auth_data)
+
+    assert res.status_code == 200
+
+    session.refresh(user)
+    assert not database.pw_hasher.check_needs_rehash(user.hashed_password)
+
+    await client.aclose()
@@ -2,10 +2,12 @@ import pytest
 import uuid
 
 from httpx import AsyncClient
-from sqlmodel import Session
+from sqlmodel import Session, select
 from pydantic import TypeAdapter, ValidationError
 
-from app.models.chats import MessagesGetPublic
+from app.models.chats import MessageContext, MessagesGetPublic
+from app.models.dbtables import Users
+from app.internal import versions
 from app.internal.config import settings
 from app.internal.database import database
 
@@ -157,6 +159,41 @@ async def test_get_recipients(client_factory, first_user_cookies):
     await client.aclose()
 
 
+async def test_get_recipients_not_modified(client_factory, first_user_cookies):
+    client: AsyncClient = await client_factory(first_user_cookies)
+
+    res = await client.get('/api/chats/recipients')
+    etag: str = res.headers.get('etag')
+
+    assert res.status_code == 200 and etag
+
+    res2 = await client.get('/api/chats/recipients', headers={'If-None-Match': etag})
+    assert res2.status_code == 304
+    assert res2.content == b''
+
+    await client.aclose()
+
+
+async def test_etag_changes_with_write_from_other_process(client_factory, first_user_cookies, session: Session):
+    client: AsyncClient = await client_factory(first_user_cookies)
+
+    res = await client.get('/api/chats/recipients')
+    etag: str = res.headers.get('etag')
+
+    assert res.status_code == 200 and etag
+
+    # Writes made by another worker only show up in the database
+    user_id = session.exec(select(Users.user_id).where(Users.username == settings.FIRST_USER_NAME)).one()
+    versions.bump_users(session, [user_id])
+    session.commit()
+
+    res2 = await client.get('/api/chats/recipients', headers={'If-None-Match': etag})
+    assert res2.status_code == 200
+    assert res2.headers.get('etag') != etag
+
+    await client.aclose()
+
+
 async def test_get_previous_messages(client_factory, first_user_cookies):
     client: AsyncClient = await client_factory(first_user_cookies)
     params = {'recipient': 'test_chat_user', 'amount': 100, 'offset': 0}
@@ -221,6 +258,96 @@ async def test_get_one_latest_message_with_one_offset(client_factory, first_user
     await client.aclose()
 
 
+async def test_get_messages_before_cursor(client_factory, first_user_cookies):
+    client: AsyncClient = await client_factory(first_user_cookies)
+    ta = TypeAdapter(list[MessagesGetPublic])
+
+    res = await client.get('/api/chats/messages', params={'recipient': 'test_chat_user', 'amount': 2})
+    assert res.status_code == 200
+
+    latest, second_latest = ta.validate_python(res.json())
+    assert latest.message_id > second_latest.message_id
+
+    params = {'recipient': 'test_chat_user', 'amount': 1, 'before': str(latest.message_id)}
+    res2 = await client.get('/api/chats/messages', params=params)
+
+    assert res2.status_code == 200
+    assert ta.validate_python(res2.json()) == [second_latest]
+
+    await client.aclose()
+
+
+async def test_get_messages_after_cursor(client_factory, first_user_cookies):
+    client: AsyncClient = await client_factory(first_user_cookies)
+    ta = TypeAdapter(list[MessagesGetPublic])
+
+    res = await client.get('/api/chats/messages', params={'recipient': 'test_chat_user', 'amount': 2})
+    assert res.status_code == 200
+
+    latest, second_latest = ta.validate_python(res.json())
+
+    params = {'recipient': 'test_chat_user', 'amount': 10, 'after': str(second_latest.message_id)}
+    res2 = await client.get('/api/chats/messages', params=params)
+
+    assert res2.status_code == 200
+    assert ta.validate_python(res2.json()) == [latest]
+
+    await client.aclose()
+
+
+async def test_get_message_context(client_factory, first_user_cookies):
+    client: AsyncClient = await client_factory(first_user_cookies)
+    ta = TypeAdapter(list[MessagesGetPublic])
+
+    for index in range(5):
+        post_data = {'recipient': 'test_chat_user', 'message_data': f'ContextMessage{index}'}
+        assert (await client.post('/api/chats/message', json=post_data)).status_code == 200
+
+    res = await client.get('/api/chats/messages', params={'recipient': 'test_chat_user', 'amount': 5})
+    assert res.status_code == 200
+    latest = ta.validate_python(res.json())
+
+    res2 = await client.get(f'/api/chats/message/{latest[2].message_id}/context', params={'amount': 1})
+    assert res2.status_code == 200
+
+    context = MessageContext(**res2.json())
+    assert context.messages == latest[1:4]
+    assert context.older_cursor == latest[3].message_id
+    assert context.newer_cursor == latest[1].message_id
+
+    # The newest message has nothing after it
+    res3 = await client.get(f'/api/chats/message/{latest[0].message_id}/context', params={'amount': 2})
+    context = MessageContext(**res3.json())
+
+    assert context.messages == latest[:3]
+    assert context.newer_cursor is None
+
+    res4 = await client.get(f'/api/chats/message/{uuid.uuid4()}/context')
+    assert res4.status_code == 404
+
+    await client.aclose()
+
+
+async def test_get_message_context_disabled_peer(client_factory, first_user_cookies, session: Session):
+    assert await database.users.add_user(session, 'test_context_peer', 'test_context_peer') is True
+    message_id = await database.messages.store_message(
+        session, settings.FIRST_USER_NAME, 'test_context_peer', 'ContextPeerMessage'
+    )
+
+    client: AsyncClient = await client_factory(first_user_cookies)
+    assert (await client.get(f'/api/chats/message/{message_id}/context')).status_code == 200
+
+    # Disabled but not deleted yet, the messages are still stored
+    user = session.exec(select(Users).where(Users.username == 'test_context_peer')).one()
+    user.disabled = True
+    session.add(user)
+    session.commit()
+
+    assert (await client.get(f'/api/chats/message/{message_id}/context')).status_code == 404
+
+    await client.aclose()
+
+
 async def test_get_previous_messages_invalid_user(client_factory, first_user_cookies):
     client: AsyncClient = await client_factory(first_user_cookies)
     params = {'recipient': 'invalid_user', 'amount': 100, 'offset': 0}
@@ -363,3 +490,175 @@ async def test_edit_latest_message_using_invalid_message_id(client_factory, firs
 
     assert res.status_code == 404
     await client.aclose()
+
+
+async def test_get_previous_messages_etag_changes(client_factory, first_user_cookies):
+    client: AsyncClient = await client_factory(first_user_cookies)
+    params = {'recipient': 'test_chat_user'}
+
+    res = await client.get('/api/chats/messages', params=params)
+    etag: str = res.headers.get('etag')
+
+    assert res.status_code == 200 and etag
+
+    res2 = await client.get('/api/chats/messages', params=params, headers={'If-None-Match': etag})
+    assert res2.status_code == 304
+
+    post_data = {'recipient': 'test_chat_user', 'message_data': 'HelloWorldEtag'}
+    res3 = await client.post('/api/chats/message', json=post_data)
+    assert res3.status_code == 200
+
+    res4 = await client.get('/api/chats/messages', params=params, headers={'If-None-Match': etag})
+    assert res4.status_code == 200
+    assert res4.headers.get('etag') != etag
+
+    await client.aclose()
+
+
+async def test_search_messages(client_factory, first_user_cookies, session: Session):
+    client: AsyncClient = await client_factory(first_user_cookies)
+
+    for message_data in ('Searchable giraffe', 'Another searchable giraffe note', 'Searchable elephant'):
+        res = await client.post('/api/chats/message', json={'recipient': 'test_chat_user', 'message_data': message_data})
+        assert res.status_code == 200
+
+    # Conversations the caller is not part of never show up
+    stored = await database.messages.store_message(session, 'test_chat_user', 'test_chat_user2', 'Hidden giraffe')
+    assert isinstance(stored, uuid.UUID)
+
+    res = await client.get('/api/chats/search', params={'q': 'GIRAFFE searchable', 'amount': 1})
+    assert res.status_code == 200
+
+    first_page: dict = res.json()
+    assert len(first_page['results']) == 1 and first_page['next_cursor']
+
+    result: dict = first_page['results'][0]
+    start, end = result['highlights'][0]
+    assert result['snippet'][start:end].lower() in ('giraffe', 'searchable')
+
+    res2 = await client.get('/api/chats/search', params={'q': 'giraffe searchable', 'cursor': first_page['next_cursor']})
+    assert res2.status_code == 200
+
+    second_page: dict = res2.json()
+    assert second_page['next_cursor'] is None
+
+    found: list[str] = [item['message_data'] for item in first_page['results'] + second_page['results']]
+    assert sorted(found) == ['Another searchable giraffe note', 'Searchable giraffe']
+
+    await client.aclose()
+
+
+async def test_search_messages_invalid_input(client_factory, first_user_cookies):
+    client: AsyncClient = await client_factory(first_user_cookies)
+
+    res = await client.get('/api/chats/search', params={'q': '!!'})
+    assert res.status_code == 422
+
+    res2 = await client.get('/api/chats/search', params={'q': 'giraffe', 'cursor': 'not-a-cursor'})
+    assert res2.status_code == 400
+
+    await client.aclose()
+
+
+async def test_get_conversations(client_factory, first_user_cookies, session: Session):
+    client: AsyncClient = await client_factory(first_user_cookies)
+
+    res = await client.post('/api/chats/message/compose', json={'recipient': 'test_chat_user2', 'message_data': 'Hi there'})
+    assert res.status_code == 200
+
+    res = await client.post('/api/chats/message', json={'recipient': 'test_chat_user', 'message_data': 'Newest ' * 50})
+    assert res.status_code == 200
+    newest_id: str = res.json()
+
+    res = await client.get('/api/chats/conversations', params={'amount': 1})
+    assert res.status_code == 200
+
+    first_page: list[dict] = res.json()
+    assert [item['peer_name'] for item in first_page] == ['test_chat_user']
+    assert first_page[0]['last_message_id'] == newest_id
+    assert first_page[0]['last_sender_name'] == settings.FIRST_USER_NAME
+    assert first_page[0]['last_message_preview'] == ('Newest ' * 50)[:100]
+    assert first_page[0]['unread_count'] == 0
+
+    res = await client.get('/api/chats/conversations', params={'before': newest_id})
+    assert res.json()[0]['peer_name'] == 'test_chat_user2'
+
+    # The peer has unread messages until they reply, then the first user does
+    peer_view = await database.messages.get_conversations(session, 'test_chat_user')
+    admin_conversation = next(item for item in peer_view if item.peer_name == settings.FIRST_USER_NAME)
+    assert admin_conversation.unread_count > 0
+
+    reply_id = await database.messages.store_message(session, 'test_chat_user', settings.FIRST_USER_NAME, 'Reply')
+    peer_view = await database.messages.get_conversations(session, 'test_chat_user')
+    assert peer_view[0].peer_name == settings.FIRST_USER_NAME and peer_view[0].unread_count == 0
+
+    res = await client.get('/api/chats/conversations')
+    assert res.json()[0]['unread_count'] == 1
+    assert res.json()[0]['last_message_id'] == str(reply_id)
+
+    await client.aclose()
+
+
+async def test_get_conversations_after_delete(client_factory, first_user_cookies):
+    client: AsyncClient = await client_factory(first_user_cookies)
+
+    res = await client.get('/api/chats/conversations')
+    previous_id: str = res.json()[0]['last_message_id']
+
+    res = await client.post('/api/chats/message', json={'recipient': 'test_chat_user', 'message_data': 'Deleted soon'})
+    message_id: str = res.json()
+
+    res = await client.delete(f'/api/chats/message/{message_id}')
+    assert res.status_code == 200
+
+    res = await client.get('/api/chats/conversations')
+    assert res.json()[0]['last_message_id'] == previous_id
+
+    await client.aclose()
+
+
+async def test_mark_read(client_factory, first_user_cookies, session: Session):
+    client: AsyncClient = await client_factory(first_user_cookies)
+    first_user: str = settings.FIRST_USER_NAME
+
+    message_ids: list[str] = []
+    for message_data in ('Unread one', 'Unread two', 'Unread three'):
+        res = await client.post('/api/chats/message', json={'recipient': 'test_chat_user', 'message_data': message_data})
+        message_ids.append(res.json())
+
+    async def peer_state():
+        peer_view = await database.messages.get_conversations(session, 'test_chat_user')
+        return next(item for item in peer_view if item.peer_name == first_user)
+
+    assert (await peer_state()).unread_count == 3
+
+    # Deleting an unread message takes it off the count
+    res = await client.delete(f'/api/chats/message/{message_ids.pop()}')
+    assert res.status_code == 200
+    assert (await peer_state()).unread_count == 2
+
+    # Markers are coalesced, only the newest one is written
+    database.messages.mark_read('test_chat_user', first_user, uuid.UUID(message_ids[0]))
+    database.messages.mark_read('test_chat_user', first_user, uuid.UUID(message_ids[1]))
+    database.messages.mark_read('test_chat_user', first_user, uuid.UUID(message_ids[0]))
+    await database.messages.read_markers.flush()
+
+    state = await peer_state()
+    assert state.unread_count == 0 and str(state.last_read_message_id) == message_ids[1]
+
+    reply_id = await database.messages.store_message(session, 'test_chat_user', first_user, 'Read it')
+    res = await client.get('/api/chats/conversations')
+    assert res.json()[0]['unread_count'] == 1
+
+    res = await client.post('/api/chats/read', json={'peer': 'test_chat_user', 'message_id': str(reply_id)})
+    assert res.status_code == 202
+    await database.messages.read_markers.flush()
+
+    res = await client.get('/api/chats/conversations')
+    assert res.json()[0]['unread_count'] == 0
+    assert res.json()[0]['last_read_message_id'] == str(reply_id)
+
+    res = await client.post('/api/chats/read', json={'peer': first_user, 'message_id': str(reply_id)})
+    assert res.status_code == 400
+
+    await client.aclose()
@@ -1,6 +1,14 @@
+import os
+import threading
+
 import pytest
 from httpx import AsyncClient
 
+from app.internal.config import settings
+from app.internal.database import database
+from app.internal.profiler import SamplingProfiler
+from app.main import config
+
 @pytest.mark.anyio
 async def test_main_redirection(client_factory, first_user_cookies):
     client: AsyncClient = await client_factory(first_user_cookies)
@@ -10,3 +18,108 @@ async def test_main_redirection(client_factory, first_user_cookies):
     assert res.headers.get('location') == '/frontend'
 
     await client.aclose()
+
+
+@pytest.mark.anyio
+async def test_metrics_endpoint(client_factory, first_user_cookies):
+    client: AsyncClient = await client_factory(first_user_cookies)
+    await client.get('/api/token/info')
+
+    res = await client.get('/metrics')
+    assert res.status_code == 200
+    assert res.headers['content-type'].startswith('text/plain; version=0.0.4')
+
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/token/info",status="200"}' in res.text
+    assert '# TYPE db_executor_wait_seconds histogram' in res.text
+    assert 'websocket_connections 0' in res.text
+    assert '# TYPE conversation_cache_hits_total counter' in res.text
+
+    await client.aclose()
+
+
+@pytest.mark.anyio
+async def test_executor_stats(client_factory, first_user_cookies):
+    client: AsyncClient = await client_factory(first_user_cookies)
+    res = await client.get('/api/stats/executor')
+
+    assert res.status_code == 200
+    res_json: dict = res.json()
+
+    assert res_json['pending'] == 0
+    assert res_json['functions']['get_session_info']['calls'] > 0
+
+    await client.aclose()
+
+
+@pytest.mark.anyio
+async def test_executor_overload_returns_503(client_factory, first_user_cookies, monkeypatch):
+    client: AsyncClient = await client_factory(first_user_cookies)
+    monkeypatch.setattr(database.executor, 'pending', database.executor.max_pending)
+
+    res = await client.get('/api/token/info')
+    assert res.status_code == 503
+    assert res.headers['retry-after'] == str(settings.DB_OVERLOAD_RETRY_AFTER)
+
+    await client.aclose()
+
+
+@pytest.mark.anyio
+async def test_profile_request_when_overloaded(client_factory, first_user_cookies, monkeypatch):
+    client: AsyncClient = await client_factory(first_user_cookies)
+    monkeypatch.setattr(database.executor, 'pending', database.executor.max_pending)
+
+    res = await client.get('/api/token/info', headers={'X-Profile': '1'})
+    assert res.status_code == 503
+    assert res.headers['retry-after'] == str(settings.DB_OVERLOAD_RETRY_AFTER)
+    assert 'x-profile-file' not in res.headers
+
+    await client.aclose()
+
+
+@pytest.mark.anyio
+async def test_profile_request(client_factory, first_user_cookies, monkeypatch, tmp_path):
+    # Profiles go to a temporary directory instead of the real config directory
+    monkeypatch.setattr(config, 'base_dir', str(tmp_path))
+
+    client: AsyncClient = await client_factory(first_user_cookies)
+    res = await client.get('/api/chats/recipients', headers={'X-Profile': '1'})
+
+    assert res.status_code == 200
+    file_name: str = res.headers['x-profile-file']
+
+    assert '-api_chats_recipients-' in file_name
+    assert os.path.isfile(os.path.join(config.base_dir, 'profiles', file_name))
+
+    await client.aclose()
+
+
+@pytest.mark.anyio
+async def test_profile_written_off_event_loop(client_factory, first_user_cookies, monkeypatch, tmp_path):
+    monkeypatch.setattr(config, 'base_dir', str(tmp_path))
+
+    writer_threads: list[int] = []
+    original_write = SamplingProfiler.write
+
+    def record_thread(profile: SamplingProfiler, path: str) -> None:
+        writer_threads.append(threading.get_ident())
+        original_write(profile, path)
+
+    monkeypatch.setattr(SamplingProfiler, 'write', record_thread)
+
+    client: AsyncClient = await client_factory(first_user_cookies)
+    res = await client.get('/api/token/info', headers={'X-Profile': '1'})
+
+    assert res.status_code == 200
+    assert 'x-query-count' in res.headers
+    assert writer_threads and threading.get_ident() not in writer_threads
+
+    await client.aclose()
+
+
+@pytest.mark.anyio
+async def test_profile_request_requires_login(client_factory):
+    client: AsyncClient = await client_factory()
+    res = await client.get('/', headers={'X-Profile': '1'})
+
+    assert 'x-profile-file' not in res.headers
+    await client.aclose()
@@ -0,0 +1,121 @@
+import pytest
+
+from httpx import AsyncClient
+
+from app.internal import metrics
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_auth_info_queries(client_factory, first_user_cookies, max_queries):
+    client: AsyncClient = await client_factory(first_user_cookies)
+
+    with max_queries(1):
+        res = await client.get('/api/token/info')
+
+    assert res.status_code == 200
+    await client.aclose()
+
+
+async def test_get_recipients_queries(client_factory, first_user_cookies, max_queries):
+    client: AsyncClient = await client_factory(first_user_cookies)
+
+    with max_queries(3):
+        res = await client.get('/api/chats/recipients')
+
+    assert res.status_code == 200
+    await client.aclose()
+
+
+async def test_get_messages_queries(client_factory, first_user_cookies, max_queries):
+    client: AsyncClient = await client_factory(first_user_cookies)
+    params: dict = {'recipient': 'test_chat_user', 'amount': 10, 'offset': 5}
+
+    with max_queries(4):
+        res = await client.get('/api/chats/messages', params=params)
+
+    assert res.status_code == 200
+    await client.aclose()
+
+
+async def test_send_message_queries(client_factory, first_user_cookies, max_queries):
+    client: AsyncClient = await client_factory(first_user_cookies)
+    post_data: dict = {'recipient': 'test_chat_user', 'message_data': 'query count'}
+
+    # The last two are the conversation summary upsert and the change version bump
+    with max_queries(9):
+        res = await client.post('/api/chats/message', json=post_data)
+
+    assert res.status_code == 200
+    await client.aclose()
+
+
+async def test_edit_and_delete_message_queries(client_factory, first_user_cookies, max_queries):
+    client: AsyncClient = await client_factory(first_user_cookies)
+    post_data: dict = {'recipient': 'test_chat_user', 'message_data': 'query count write'}
+
+    res = await client.post('/api/chats/message', json=post_data)
+    assert res.status_code == 200
+    message_id: str = res.json()
+
+    # Auth, sender lookup, recipient lookup, the write and the change version bump,
+    # nothing is reloaded after commit
+    with max_queries(5):
+        res = await client.patch(f'/api/chats/message/{message_id}', json={'message_data': 'edited'})
+
+    assert res.status_code == 200
+
+    # Plus finding the previous message and fixing the recipient's unread count
+    with max_queries(8):
+        res = await client.delete(f'/api/chats/message/{message_id}')
+
+    assert res.status_code == 200
+    await client.aclose()
+
+
+async def test_get_conversations_queries(client_factory, first_user_cookies, max_queries):
+    client: AsyncClient = await client_factory(first_user_cookies)
+
+    with max_queries(2):
+        res = await client.get('/api/chats/conversations')
+
+    assert res.status_code == 200 and res.json()
+    await client.aclose()
+
+
+async def test_get_message_context_queries(client_factory, first_user_cookies, max_queries):
+    client: AsyncClient = await client_factory(first_user_cookies)
+    post_data: dict = {'recipient': 'test_chat_user', 'message_data': 'query count context'}
+
+    res = await client.post('/api/chats/message', json=post_data)
+    assert res.status_code == 200
+    message_id: str = res.json()
+
+    # Auth, the message itself and one statement for both sides
+    with max_queries(3):
+        res = await client.get(f'/api/chats/message/{message_id}/context', params={'amount': 10})
+
+    assert res.status_code == 200
+    await client.aclose()
+
+
+async def test_query_debug_headers(client_factory, first_user_cookies):
+    client: AsyncClient = await client_factory(first_user_cookies)
+    res = await client.get('/api/token/info')
+
+    assert res.status_code == 200
+    assert res.headers['x-query-count'] == '1'
+    assert res.headers['server-timing'].startswith('db;dur=')
+
+    await client.aclose()
+
+
+async def test_request_without_queries_skips_pool(client_factory):
+    client: AsyncClient = await client_factory()
+    checkouts_before: float = metrics.db_pool_checkouts.values.get((), 0)
+
+    res = await client.get('/frontend/login')
+    assert res.status_code == 200
+
+    assert metrics.db_pool_checkouts.values.get((), 0) == checkouts_before
+    await client.aclose()
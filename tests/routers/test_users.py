@@ -0,0 +1,121 @@
+import asyncio
+import pytest
+
+from datetime import datetime
+
+from httpx import AsyncClient
+from sqlalchemy import insert
+from sqlmodel import Session, or_, select
+
+from app.internal.config import settings
+from app.internal.database import database
+from app.internal.uuids import uuid7
+from app.models.dbtables import Conversations, Messages, Users
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_delete_user_in_batches(client_factory, first_user_cookies, session: Session, monkeypatch):
+    monkeypatch.setattr(settings, 'USER_DELETE_BATCH_SIZE', 2)
+
+    created = await database.users.add_user(session, 'test_deleted_user', 'test_deleted_user')
+    assert created is True
+
+    user_id = session.exec(select(Users.user_id).where(Users.username == 'test_deleted_user')).one()
+
+    for index in range(5):
+        await database.messages.store_message(session, 'test_deleted_user', settings.FIRST_USER_NAME, f'Bye {index}')
+        await database.messages.store_message(session, settings.FIRST_USER_NAME, 'test_deleted_user', f'Bye {index}')
+
+    client: AsyncClient = await client_factory()
+    res = await client.post('/api/token/', data={
+        'grant_type': 'password',
+        'username': 'test_deleted_user',
+        'password': 'test_deleted_user'
+    })
+    assert res.status_code == 200
+    deleted_cookies = res.cookies
+    await client.aclose()
+
+    admin: AsyncClient = await client_factory(first_user_cookies)
+    res = await admin.delete('/api/users/test_deleted_user')
+    assert res.status_code == 202
+
+    # Disabled right away, before any message is deleted
+    deleted_client: AsyncClient = await client_factory(deleted_cookies)
+    assert (await deleted_client.get('/api/token/info')).status_code == 401
+    await deleted_client.aclose()
+
+    assert 'test_deleted_user' not in (await admin.get('/api/users/')).json()
+    assert (await admin.delete('/api/users/test_deleted_user')).status_code == 404
+
+    await asyncio.wait_for(database.users.deletions.task, 5)
+
+    res = await admin.get('/api/users/test_deleted_user/deletion')
+    assert res.status_code == 200
+
+    status: dict = res.json()
+    assert status['finished_at'] is not None
+    assert status['messages_deleted'] == 10 and status['conversations_remaining'] == 0
+    assert database.users.deletions.batches >= 6
+
+    session.expire_all()
+    assert session.get(Users, user_id) is None
+    assert not session.exec(
+        select(Messages).where(or_(Messages.sender_id == user_id, Messages.recipient_id == user_id))
+    ).all()
+    assert not session.exec(
+        select(Conversations).where(or_(Conversations.user_id == user_id, Conversations.peer_id == user_id))
+    ).all()
+
+    await admin.aclose()
+
+
+async def test_delete_user_without_summaries(client_factory, first_user_cookies, session: Session, monkeypatch):
+    monkeypatch.setattr(settings, 'USER_DELETE_BATCH_SIZE', 2)
+
+    created = await database.users.add_user(session, 'test_bulk_user', 'test_bulk_user')
+    assert created is True
+
+    user_id = session.exec(select(Users.user_id).where(Users.username == 'test_bulk_user')).one()
+    first_user_id = session.exec(select(Users.user_id).where(Users.username == settings.FIRST_USER_NAME)).one()
+
+    # Bulk loaded messages have no conversation rows
+    session.execute(insert(Messages), [
+        {
+            'message_id': uuid7(),
+            'sender_id': user_id if index % 2 else first_user_id,
+            'recipient_id': first_user_id if index % 2 else user_id,
+            'send_date': datetime.now(),
+            'message_data': f'Bulk {index}'
+        }
+        for index in range(5)
+    ])
+    session.commit()
+
+    admin: AsyncClient = await client_factory(first_user_cookies)
+    batches_before: int = database.users.deletions.batches
+
+    res = await admin.delete('/api/users/test_bulk_user')
+    assert res.status_code == 202
+
+    await asyncio.wait_for(database.users.deletions.task, 5)
+
+    status: dict = (await admin.get('/api/users/test_bulk_user/deletion')).json()
+    assert status['finished_at'] is not None and status['messages_deleted'] == 5
+
+    # Three batches of at most two messages, then the user row on its own
+    assert database.users.deletions.batches - batches_before == 4
+
+    session.expire_all()
+    assert session.get(Users, user_id) is None
+
+    await admin.aclose()
+
+
+async def test_deletion_status_unknown_user(client_factory, first_user_cookies):
+    admin: AsyncClient = await client_factory(first_user_cookies)
+    res = await admin.get('/api/users/never_deleted/deletion')
+
+    assert res.status_code == 404
+    await admin.aclose()